@@ -0,0 +1,132 @@
+"""
+Benchmark: concurrent booking throughput
+Threads of users book random slots from a shared pool at the same time, then
+the result is checked for double bookings and overlapping bookings per user.
+
+Usage (from backend/, against a migrated database):
+    python benchmarks/bench_booking.py --threads 16 --slots 2000 --attempts 200
+
+The benchmark needs committed rows visible to all threads; everything it
+creates is deleted at the end.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'calendar_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Count  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from bookings.models import Booking  # noqa: E402
+from bookings.services import book_time_slot, BookingError  # noqa: E402
+from events.models import Category, TimeSlot  # noqa: E402
+
+
+def create_data(slots, users):
+    """Slots of the three categories overlap each other, so users hit both guards"""
+    categories = [Category.objects.get_or_create(name=name)[0] for name, _ in Category.CATEGORY_CHOICES]
+    admin = User.objects.create(username='bench_admin', is_staff=True)
+    users = User.objects.bulk_create([User(username=f'bench_user_{i}') for i in range(users)])
+    base = timezone.now().replace(microsecond=0) + timedelta(days=30)
+    time_slots = TimeSlot.objects.bulk_create([
+        TimeSlot(
+            category=categories[i % 3],
+            start_time=base + timedelta(minutes=30 * (i // 3) + 10 * (i % 3)),
+            end_time=base + timedelta(minutes=30 * (i // 3) + 10 * (i % 3) + 30),
+            created_by=admin,
+        )
+        for i in range(slots)
+    ])
+    return users, [slot.id for slot in time_slots]
+
+
+def cleanup():
+    TimeSlot.objects.filter(created_by__username='bench_admin').delete()
+    User.objects.filter(username__startswith='bench_').delete()
+
+
+def check_invariants(users):
+    per_slot = Booking.objects.filter(user__in=users).values('time_slot_id').annotate(
+        count=Count('id')
+    ).filter(count__gt=1)
+    assert not per_slot.exists(), 'slot booked twice'
+
+    intervals = {}
+    for user_id, start, end in Booking.objects.filter(user__in=users).values_list(
+        'user_id', 'time_slot__start_time', 'time_slot__end_time'
+    ):
+        intervals.setdefault(user_id, []).append((start, end))
+    for user_intervals in intervals.values():
+        user_intervals.sort()
+        for (_, previous_end), (start, _) in zip(user_intervals, user_intervals[1:]):
+            assert start >= previous_end, 'overlapping bookings of one user'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--slots', type=int, default=2000)
+    parser.add_argument('--attempts', type=int, default=200, help='booking attempts per thread')
+    args = parser.parse_args()
+
+    cleanup()
+    # Two threads per user, so same-user requests contend on the advisory lock
+    users, slot_ids = create_data(args.slots, max(1, args.threads // 2))
+    results = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.threads)
+
+    def worker(index):
+        user = users[index % len(users)]
+        rng = random.Random(index)
+        local = Counter()
+        try:
+            barrier.wait()
+            for _ in range(args.attempts):
+                try:
+                    book_time_slot(user, rng.choice(slot_ids))
+                    local[201] += 1
+                except BookingError as e:
+                    local[e.status_code] += 1
+        finally:
+            connection.close()
+        with lock:
+            results.update(local)
+
+    try:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        check_invariants(users)
+        total = sum(results.values())
+        print(f'threads={args.threads} attempts={total} seconds={elapsed:.2f}')
+        print(f'throughput: {total / elapsed:.0f} attempts/s, {results[201] / elapsed:.0f} bookings/s')
+        print(f'created={results[201]} rejected={results[400]} conflicts={results[409]}')
+        print('no double bookings, no overlapping bookings per user')
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
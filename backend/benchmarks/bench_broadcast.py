@@ -0,0 +1,96 @@
+"""
+Benchmark: per-event CPU of a broadcast to many connections in one worker
+Compares encoding the event in every consumer (the old handlers called
+json.dumps on event['data'] per connection) with forwarding the frame the
+publisher encoded once. Consumers are driven directly, without a channel
+layer or sockets, so only the consumer side of the fan-out is measured.
+
+Usage (from backend/):
+    python benchmarks/bench_broadcast.py --connections 500 5000 --events 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from bench_serializers import create_data  # noqa: F401  sets up Django
+
+from django.utils import timezone  # noqa: E402
+
+from bookings.consumers import CalendarConsumer  # noqa: E402
+from bookings.websocket_utils import event_message  # noqa: E402
+from events.models import Category, TimeSlot  # noqa: E402
+
+
+async def discard(text_data=None, bytes_data=None, close=False):
+    pass
+
+
+def make_consumers(count):
+    consumers = []
+    for _ in range(count):
+        consumer = CalendarConsumer()
+        consumer.batch_window = 0
+        consumer.last_seq = None
+        consumer.send = discard
+        consumers.append(consumer)
+    return consumers
+
+
+def make_event():
+    start_time = timezone.now() + timedelta(days=1)
+    time_slot = TimeSlot(
+        id=1,
+        start_time=start_time,
+        end_time=start_time + timedelta(hours=1),
+        category=Category(id=1, name='Cat 1'),
+        created_at=timezone.now()
+    )
+    data = {
+        'id': time_slot.id,
+        'start_time': time_slot.start_time.isoformat(),
+        'end_time': time_slot.end_time.isoformat(),
+        'category': time_slot.category.name,
+        'is_available': True,
+        'created_at': time_slot.created_at.isoformat(),
+    }
+    return time_slot, data
+
+
+async def per_consumer_encoding(consumers, time_slot, data):
+    message = {'type': 'timeslot_created', 'data': data}
+    for consumer in consumers:
+        await consumer.send(text_data=json.dumps({'type': message['type'], 'data': message['data']}))
+
+
+async def pre_encoded(consumers, time_slot, data):
+    message = event_message(time_slot, 'timeslot_created', data, 1)
+    for consumer in consumers:
+        await consumer.timeslot_created(message)
+
+
+def measure(handler, consumers, events):
+    time_slot, data = make_event()
+    start = time.process_time()
+    for _ in range(events):
+        asyncio.run(handler(consumers, time_slot, data))
+    return (time.process_time() - start) / events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, nargs='+', default=[500, 5000])
+    parser.add_argument('--events', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f'{"connections":>11} {"mode":<14} {"ms/event":>9} {"us/conn":>8}')
+    for count in args.connections:
+        consumers = make_consumers(count)
+        for name, handler in (('per-consumer', per_consumer_encoding), ('pre-encoded', pre_encoded)):
+            seconds = measure(handler, consumers, args.events)
+            print(f'{count:>11} {name:<14} {seconds * 1000:>9.2f} {seconds / count * 1e6:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
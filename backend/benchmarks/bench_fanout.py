@@ -0,0 +1,111 @@
+"""
+Benchmark: Redis work and latency of a broadcast with each channel layer
+Simulates one ASGI worker holding many connections in one group and a relay
+sending events to that group. Compares the Redis channel layer, which keeps
+the group membership and message queues in Redis (WEBSOCKET_FANOUT=redis),
+with worker-local fan-out over pub/sub (WEBSOCKET_FANOUT=worker), which
+publishes once and fans out in-process.
+
+Redis ops are the commands Redis executed per event (INFO commandstats, Lua
+calls included) and Redis KB the bytes it read and wrote. channels_redis 4
+already sends one message per worker rather than per channel, but it reads
+the whole group membership and names every member channel in that message,
+so its traffic grows with the connections. Latency runs from group_send until
+the last connection got the event.
+
+Usage (from backend/, with Redis at REDIS_URL):
+    python benchmarks/bench_fanout.py --connections 1000 10000 50000 --events 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bench_serializers import create_data  # noqa: F401  sets up Django
+
+from channels_redis.core import RedisChannelLayer  # noqa: E402
+from channels_redis.pubsub import RedisPubSubChannelLayer  # noqa: E402
+from django.conf import settings  # noqa: E402
+from redis import asyncio as aioredis  # noqa: E402
+
+GROUP = 'bench_fanout'
+
+LAYERS = {
+    'redis': RedisChannelLayer,
+    'worker': RedisPubSubChannelLayer,
+}
+
+
+async def redis_counters(redis):
+    """(commands executed, bytes read and written) so far"""
+    commands = await redis.info('commandstats')
+    stats = await redis.info('stats')
+    return (
+        sum(value['calls'] for value in commands.values()),
+        stats['total_net_input_bytes'] + stats['total_net_output_bytes'],
+    )
+
+
+async def receive_all(layer, channels):
+    """Receive one message on every channel, return the receive times"""
+    async def receive(channel):
+        await layer.receive(channel)
+        return time.perf_counter()
+    return await asyncio.gather(*(receive(channel) for channel in channels))
+
+
+async def run(mode, connections, events, host):
+    layer_class = LAYERS[mode]
+    # The worker holding the connections and the relay are separate clients
+    worker = layer_class(hosts=[host], capacity=events + 1) if mode == 'redis' else layer_class(hosts=[host])
+    relay = layer_class(hosts=[host])
+    redis = aioredis.from_url(host)
+
+    channels = [await worker.new_channel() for _ in range(connections)]
+    for channel in channels:
+        await worker.group_add(GROUP, channel)
+    # Let the pub/sub subscriptions settle before measuring
+    await asyncio.sleep(0.5)
+
+    ops = []
+    traffic = []
+    latencies = []
+    message = {'type': 'timeslot_created', 'frame': '{"type": "timeslot_created"}', 'slot_id': 1}
+    for seq in range(events):
+        receiving = asyncio.ensure_future(receive_all(worker, channels))
+        await asyncio.sleep(0.1)
+        commands_before, bytes_before = await redis_counters(redis)
+        start = time.perf_counter()
+        await relay.group_send(GROUP, {**message, 'seq': seq})
+        received = await receiving
+        latencies.append(max(received) - start)
+        commands, total_bytes = await redis_counters(redis)
+        # Less the INFO calls of the first measurement
+        ops.append(commands - commands_before - 2)
+        traffic.append(total_bytes - bytes_before)
+
+    for channel in channels:
+        await worker.group_discard(GROUP, channel)
+    await worker.flush()
+    await relay.flush()
+    await redis.aclose()
+    return statistics.median(ops), statistics.median(traffic), statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--events', type=int, default=5)
+    parser.add_argument('--modes', nargs='+', choices=LAYERS, default=list(LAYERS))
+    args = parser.parse_args()
+    host = settings.CHANNEL_LAYERS['default']['CONFIG']['hosts'][0]
+
+    print(f'{"connections":>11} {"mode":<7} {"redis ops/event":>15} {"redis KB/event":>14} {"latency ms":>10}')
+    for count in args.connections:
+        for mode in args.modes:
+            ops, traffic, latency = asyncio.run(run(mode, count, args.events, host))
+            print(f'{count:>11} {mode:<7} {ops:>15.0f} {traffic / 1024:>14.1f} {latency * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
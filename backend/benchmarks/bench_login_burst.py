@@ -0,0 +1,115 @@
+"""
+Benchmark: calendar read latency during a login burst
+Fires --logins concurrent POST /api/auth/login/ requests through Django's
+ASGI handler while one client keeps reading GET /api/timeslots/, for each
+PASSWORD_HASHING_WORKERS value given. Many workers approximates the old
+unbounded hashing on request threads; few workers keeps cores free for reads.
+
+Usage (from backend/, against a migrated database):
+    python benchmarks/bench_login_burst.py --logins 80 --workers 2 64
+
+Every login in flight holds a database connection, keep --logins below the
+server's max_connections.
+
+The benchmark user is committed for the run (the ASGI handler serves
+requests from other threads) and deleted at the end.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'calendar_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from channels.testing import HttpCommunicator  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from users import password_hashing  # noqa: E402
+
+USERNAME = 'bench_login_burst'
+PASSWORD = 'bench-password'
+
+
+async def request(application, method, path, body=b'', headers=()):
+    headers = [(b'host', b'localhost'), *headers]
+    communicator = HttpCommunicator(application, method, path, body=body, headers=headers)
+    return await communicator.get_response(timeout=600)
+
+
+async def burst(logins, token):
+    """(read latencies in s, login status counts)"""
+    application = get_asgi_application()
+    read_headers = [(b'authorization', f'Token {token}'.encode())]
+    await request(application, 'GET', '/api/timeslots/', headers=read_headers)
+
+    body = json.dumps({'username': USERNAME, 'password': PASSWORD}).encode()
+    login_tasks = [
+        asyncio.ensure_future(request(
+            application, 'POST', '/api/auth/login/', body, [(b'content-type', b'application/json')]
+        ))
+        for _ in range(logins)
+    ]
+
+    timings = []
+    while not all(task.done() for task in login_tasks):
+        start = time.perf_counter()
+        response = await request(application, 'GET', '/api/timeslots/', headers=read_headers)
+        timings.append(time.perf_counter() - start)
+    assert response['status'] == 200
+
+    statuses = {}
+    for task in login_tasks:
+        code = task.result()['status']
+        statuses[code] = statuses.get(code, 0) + 1
+    return timings, statuses
+
+
+def run(workers, logins, token):
+    password_hashing._executor = None
+    # The burst is one user from one address, lift the rate limits
+    with override_settings(PASSWORD_HASHING_WORKERS=workers, PASSWORD_HASHING_QUEUE=logins,
+                           AUTH_RATE_LIMIT_IP='1000000/1', AUTH_RATE_LIMIT_USERNAME='1000000/1'):
+        timings, statuses = asyncio.run(burst(logins, token))
+        metrics = password_hashing.get_executor().metrics()
+    password_hashing._executor = None
+    timings.sort()
+    return timings, statuses, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=80)
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 64])
+    args = parser.parse_args()
+
+    User.objects.filter(username=USERNAME).delete()
+    user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+    token = Token.objects.create(user=user).key
+    try:
+        print(f'{"workers":>7} {"reads":>6} {"read median ms":>14} {"read p99 ms":>11} '
+              f'{"queue max ms":>12} {"logins":>12}')
+        for workers in args.workers:
+            timings, statuses, metrics = run(workers, args.logins, token)
+            print(f'{workers:>7} {len(timings):>6} {statistics.median(timings) * 1000:>14.2f} '
+                  f'{timings[int(len(timings) * 0.99)] * 1000:>11.2f} '
+                  f'{metrics["queue_time_max_ms"]:>12.1f} {statuses}')
+    finally:
+        User.objects.filter(username=USERNAME).delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark: ModelSerializer vs fast-path list serialization
+Measures per-row CPU time and peak Python memory for building and rendering
+the list payloads of the four list endpoints.
+
+Usage (from backend/, against a migrated database):
+    python benchmarks/bench_serializers.py --rows 10000
+
+All rows are created inside a transaction that is rolled back at the end.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'calendar_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.db.models import Prefetch  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from bookings.availability import BusyIntervals  # noqa: E402
+from bookings.models import Booking  # noqa: E402
+from events.models import Category, TimeSlot  # noqa: E402
+from users import fast_serializers as fast  # noqa: E402
+from users.serializers import (  # noqa: E402
+    TimeSlotSerializer, AdminTimeSlotSerializer, UserBookingSerializer, AdminBookingSerializer
+)
+
+
+def create_data(rows):
+    """Create rows non-overlapping slots, every other one booked"""
+    categories = [Category.objects.get_or_create(name=name)[0] for name, _ in Category.CATEGORY_CHOICES]
+    admin = User.objects.create(username='bench_admin', is_staff=True)
+    users = User.objects.bulk_create([
+        User(username=f'bench_user_{i}', email=f'bench_{i}@example.com') for i in range(50)
+    ])
+    viewer = users[0]
+
+    base = timezone.now().replace(microsecond=0) + timedelta(days=30)
+    slots = TimeSlot.objects.bulk_create([
+        TimeSlot(
+            category=categories[i % 3],
+            start_time=base + timedelta(minutes=15 * (i // 3)),
+            end_time=base + timedelta(minutes=15 * (i // 3) + 15),
+            created_by=admin,
+        )
+        for i in range(rows)
+    ])
+    Booking.objects.bulk_create([
+        # Half of the bookings belong to the viewer so the user list is large too
+        Booking(time_slot=slot, user=viewer if i % 4 == 0 else users[1 + i % 49])
+        for i, slot in enumerate(slots) if i % 2 == 0
+    ])
+    return viewer
+
+
+def measure(build, repeat):
+    """Best CPU time over repeat runs and peak traced memory of one run"""
+    best_cpu = None
+    for _ in range(repeat):
+        start = time.process_time()
+        row_count = len(build())
+        cpu = time.process_time() - start
+        best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+
+    tracemalloc.start()
+    build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return row_count, best_cpu, peak
+
+
+def run(rows, repeat):
+    renderer = JSONRenderer()
+    viewer = create_data(rows)
+    request = Request(APIRequestFactory().get('/'))
+    request.user = viewer
+
+    slots = TimeSlot.objects.order_by('start_time', 'id')
+    user_bookings = Booking.objects.filter(user=viewer).select_related('time_slot__category').order_by('-booked_at')
+    admin_bookings = Booking.objects.select_related('user', 'time_slot__category').order_by('-booked_at')
+    booking_prefetch = Prefetch('booking', queryset=Booking.objects.select_related('user'))
+
+    def reference_timeslots():
+        time_slots = list(slots.select_related('category').prefetch_related(booking_prefetch))
+        busy = BusyIntervals.for_slots(viewer, time_slots)
+        data = TimeSlotSerializer(time_slots, many=True, context={'request': request, 'busy_intervals': busy}).data
+        renderer.render(data)
+        return data
+
+    def fast_timeslots():
+        time_slots = list(fast.timeslot_values(slots))
+        data = fast.serialize_timeslots(time_slots, BusyIntervals.for_slots(viewer, time_slots))
+        renderer.render(data)
+        return data
+
+    def reference_admin_timeslots():
+        data = AdminTimeSlotSerializer(slots.select_related('category', 'created_by').prefetch_related(booking_prefetch), many=True).data
+        renderer.render(data)
+        return data
+
+    def fast_admin_timeslots():
+        data = fast.serialize_admin_timeslots(fast.admin_timeslot_values(slots))
+        renderer.render(data)
+        return data
+
+    def reference_user_bookings():
+        data = UserBookingSerializer(user_bookings, many=True).data
+        renderer.render(data)
+        return data
+
+    def fast_user_bookings():
+        data = fast.serialize_user_bookings(fast.user_booking_values(user_bookings))
+        renderer.render(data)
+        return data
+
+    def reference_admin_bookings():
+        data = AdminBookingSerializer(admin_bookings, many=True).data
+        renderer.render(data)
+        return data
+
+    def fast_admin_bookings():
+        data = fast.serialize_admin_bookings(fast.admin_booking_values(admin_bookings))
+        renderer.render(data)
+        return data
+
+    cases = [
+        ('timeslots', reference_timeslots, fast_timeslots),
+        ('admin timeslots', reference_admin_timeslots, fast_admin_timeslots),
+        ('user bookings', reference_user_bookings, fast_user_bookings),
+        ('admin bookings', reference_admin_bookings, fast_admin_bookings),
+    ]
+
+    print(f'{"endpoint":<16} {"path":<10} {"rows":>6} {"us/row":>8} {"peak KiB":>9} {"bytes/row":>9}')
+    for name, reference, fast_path in cases:
+        assert renderer.render(reference()) == renderer.render(fast_path()), f'{name}: output differs'
+        for label, build in (('serializer', reference), ('fast', fast_path)):
+            count, cpu, peak = measure(build, repeat)
+            print(
+                f'{name:<16} {label:<10} {count:>6} {cpu / count * 1e6:>8.1f} '
+                f'{peak / 1024:>9.0f} {peak / count:>9.0f}'
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000, help='number of time slots to create')
+    parser.add_argument('--repeat', type=int, default=3, help='timing runs per case (best is reported)')
+    args = parser.parse_args()
+
+    with transaction.atomic():
+        run(args.rows, args.repeat)
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: authenticated request latency per session engine
+Logs in once per engine and times GET /api/auth/user/, which loads the
+session and the user on every request, through the full middleware stack.
+
+Usage (from backend/, against a migrated database; set SESSION_CACHE_URL to
+measure against Redis instead of the local-memory stand-in):
+    SESSION_CACHE_URL=redis://localhost:6379/2 python benchmarks/bench_sessions.py --requests 2000
+
+All rows are created inside a transaction that is rolled back at the end.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'calendar_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}
+
+
+def run(engine, requests):
+    """Median and p99 latency in ms and queries per request"""
+    with override_settings(SESSION_ENGINE=ENGINES[engine]):
+        client = Client()
+        client.login(username='bench_sessions', password='bench-password')
+        # Warm up the handler and the session cache
+        client.get('/api/auth/user/')
+
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = client.get('/api/auth/user/')
+                timings.append(time.perf_counter() - start)
+        assert response.json()['user']['is_authenticated']
+        client.logout()
+
+    timings.sort()
+    return (
+        statistics.median(timings) * 1000,
+        timings[int(len(timings) * 0.99)] * 1000,
+        len(queries) / requests,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    args = parser.parse_args()
+
+    print(f'{"engine":<10} {"median ms":>9} {"p99 ms":>7} {"queries":>7}')
+    with transaction.atomic():
+        User.objects.create_user(username='bench_sessions', password='bench-password')
+        for engine in args.engines:
+            median, p99, queries = run(engine, args.requests)
+            print(f'{engine:<10} {median:>9.3f} {p99:>7.3f} {queries:>7.1f}')
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
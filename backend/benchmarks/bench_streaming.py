@@ -0,0 +1,53 @@
+"""
+Benchmark: buffered vs streamed admin list responses
+Measures peak Python memory for GET /api/admin/timeslots/ with and without
+?stream=true at growing result sizes.
+
+Usage (from backend/, against a migrated database):
+    python benchmarks/bench_streaming.py --rows 2000 10000 40000
+
+All rows are created inside a transaction that is rolled back at the end.
+"""
+import argparse
+import time
+import tracemalloc
+
+from bench_serializers import create_data  # sets up Django
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+
+def measure(client, url, params):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, params)
+    size = sum(len(part) for part in response.streaming_content) if response.streaming else len(response.content)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[2000, 10000, 40000])
+    args = parser.parse_args()
+
+    url = reverse('admin_timeslots_list_create')
+    print(f'{"rows":>6} {"mode":<9} {"body KiB":>9} {"seconds":>8} {"peak KiB":>9}')
+    for rows in args.rows:
+        with transaction.atomic():
+            create_data(rows)
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(User.objects.get(username='bench_admin'))
+            for mode, params in (('buffered', {}), ('streamed', {'stream': 'true'})):
+                size, elapsed, peak = measure(client, url, params)
+                print(f'{rows:>6} {mode:<9} {size / 1024:>9.0f} {elapsed:>8.2f} {peak / 1024:>9.0f}')
+            transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
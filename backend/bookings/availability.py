@@ -0,0 +1,61 @@
+"""
+Availability helpers
+Check many time slots against a user's bookings without a query per slot
+"""
+from bisect import bisect_left
+
+
+class BusyIntervals:
+    """
+    A user's booked intervals, sorted by start time.
+
+    Overlap checks are answered in memory: bookings that start before the
+    slot ends form a prefix of the sorted list, and one of them overlaps the
+    slot only if the latest end time within that prefix is after the slot start.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals)
+        self._starts = [start for start, _ in self.intervals]
+        self._max_ends = []
+        max_end = None
+        for _, end in self.intervals:
+            if max_end is None or end > max_end:
+                max_end = end
+            self._max_ends.append(max_end)
+
+    @classmethod
+    def for_user(cls, user, window_start, window_end):
+        """Load the user's bookings overlapping the window with a single query"""
+        from bookings.models import Booking
+
+        intervals = Booking.objects.filter(
+            user=user,
+            time_slot__start_time__lt=window_end,
+            time_slot__end_time__gt=window_start
+        ).values_list('time_slot__start_time', 'time_slot__end_time')
+        return cls(intervals)
+
+    @classmethod
+    def for_slots(cls, user, time_slots):
+        """
+        Load the user's bookings covering the span of the given slots.
+        Slots are TimeSlot instances or dicts with start_time and end_time.
+        """
+        if not time_slots:
+            return cls([])
+        if isinstance(time_slots[0], dict):
+            window_start = min(slot['start_time'] for slot in time_slots)
+            window_end = max(slot['end_time'] for slot in time_slots)
+        else:
+            window_start = min(slot.start_time for slot in time_slots)
+            window_end = max(slot.end_time for slot in time_slots)
+        return cls.for_user(user, window_start, window_end)
+
+    def overlaps(self, start, end):
+        """Check if any busy interval overlaps [start, end)"""
+        count = bisect_left(self._starts, end)
+        return count > 0 and self._max_ends[count - 1] > start
+
+    def __len__(self):
+        return len(self.intervals)
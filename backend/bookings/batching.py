@@ -0,0 +1,60 @@
+"""
+Outbound event batching for WebSocket connections
+A connection gathers the events of a short window in an EventBuffer and sends
+them as one frame. Events that cancel each other out for the same slot are
+dropped from the buffer before they are sent. Events arrive as frames encoded
+once by the publisher (see bookings.websocket_utils.event_message), so a batch
+is put together from them without encoding anything again.
+"""
+
+BATCH_MESSAGE = 'batch'
+# Events a resuming client missed, see CalendarConsumer.resume
+REPLAY_MESSAGE = 'replay'
+
+
+class EventBuffer:
+    """Pending events of one connection in arrival order"""
+
+    def __init__(self):
+        self.events = []
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event_type, slot_id, event_id, frame):
+        if self.cancels_pending(event_type, slot_id, event_id):
+            return
+        self.events.append((event_type, slot_id, event_id, frame))
+
+    def cancels_pending(self, event_type, slot_id, event_id):
+        """Drop pending events the new one undoes, True if it is dropped as well"""
+        if event_type == 'timeslot_deleted':
+            # A slot created and deleted within the window was never seen
+            if any(t == 'timeslot_created' and s == slot_id for t, s, _, _ in self.events):
+                self.events = [event for event in self.events if event[1] != slot_id]
+                return True
+        elif event_type == 'booking_cancelled':
+            # The booking was made within the window
+            for index, (pending_type, _, pending_id, _) in enumerate(self.events):
+                if pending_type == 'booking_created' and pending_id == event_id:
+                    del self.events[index]
+                    return True
+        return False
+
+    def drain(self):
+        """Encoded frames of the pending events, empties the buffer"""
+        frames = [event[3] for event in self.events]
+        self.events = []
+        return frames
+
+
+def wrap_frames(message_type, frames):
+    """Encoded frames as the data list of one message"""
+    return f'{{"type":"{message_type}","data":[{",".join(frames)}]}}'
+
+
+def batch_frame(frames):
+    """One frame as is, several wrapped in a batch message"""
+    if len(frames) == 1:
+        return frames[0]
+    return wrap_frames(BATCH_MESSAGE, frames)
@@ -1,10 +1,55 @@
+import asyncio
 import json
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 
+from events.models import Category
+from events.time_windows import TimeWindow
+from users.digests import reconcile
+from .batching import REPLAY_MESSAGE, EventBuffer, batch_frame, wrap_frames
+from .groups import (
+    LEGACY_GROUP, MAX_VIEW_PARTITIONS, format_week, parse_week, partition_group,
+    view_partitions, window_weeks
+)
+from .outbox import replay_events
+
+
+def parse_sequence(value):
+    """Номер события из resume_from"""
+    if isinstance(value, bool):
+        raise ValueError('resume_from must be a non-negative integer')
+    try:
+        sequence = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('resume_from must be a non-negative integer')
+    if sequence < 0:
+        raise ValueError('resume_from must be a non-negative integer')
+    return sequence
+
 
 class CalendarConsumer(AsyncWebsocketConsumer):
+    """
+    Календарные события для клиента.
+
+    Клиент получает события только просматриваемых партиций (категория и
+    ISO-неделя). Начальный вид можно задать в строке запроса:
+    /ws/calendar/?weeks=2025-W28,2025-W29&categories=1,2
+    и менять его сообщениями (см. receive). Пока вид не задан, клиент состоит
+    в общей группе со всеми событиями.
+
+    События копятся WEBSOCKET_BATCH_WINDOW секунд и уходят одним кадром
+    (см. bookings.batching).
+
+    Каждое событие несет номер seq в общем потоке. Переподключившийся клиент
+    передает последний полученный номер в resume_from (в строке запроса или
+    в сообщении subscribe) и получает пропущенные события одним кадром replay
+    или resync, если их уже нет в журнале и календарь надо загрузить заново.
+    """
+
     async def connect(self):
         """
         Подключение пользователя к WebSocket
@@ -14,67 +59,304 @@ class CalendarConsumer(AsyncWebsocketConsumer):
             # Отклоняем неавторизованных пользователей
             await self.close()
             return
-        
-        # Добавляем пользователя в общую группу календаря
-        self.calendar_group_name = "calendar_updates"
-        
-        await self.channel_layer.group_add(
-            self.calendar_group_name,
-            self.channel_name
-        )
-        
+
+        self.partitions = set()
+        self.in_legacy_group = False
+        self.categories = None
+        self.batch_window = settings.WEBSOCKET_BATCH_WINDOW
+        self.buffer = EventBuffer()
+        self.flush_task = None
+        # Последний номер, отправленный при возобновлении
+        self.last_seq = None
+
+        try:
+            partitions = await self.get_query_partitions()
+            resume_from = self.get_query_resume_from()
+        except ValueError:
+            # Некорректные параметры просмотра
+            await self.close()
+            return
+
+        if partitions is None:
+            self.in_legacy_group = True
+            await self.channel_layer.group_add(LEGACY_GROUP, self.channel_name)
+        else:
+            await self.set_partitions(partitions)
+
         await self.accept()
-    
+
+        if resume_from is not None:
+            await self.resume(resume_from)
+
     async def disconnect(self, close_code):
         """
         Отключение пользователя от WebSocket
         """
-        # Удаляем пользователя из группы
-        if hasattr(self, 'calendar_group_name'):
-            await self.channel_layer.group_discard(
-                self.calendar_group_name,
-                self.channel_name
-            )
-    
+        # Неотправленные события больше некому отправлять
+        if getattr(self, 'flush_task', None):
+            self.flush_task.cancel()
+
+        # Удаляем пользователя из групп
+        if getattr(self, 'in_legacy_group', False):
+            await self.channel_layer.group_discard(LEGACY_GROUP, self.channel_name)
+        for partition in getattr(self, 'partitions', ()):
+            await self.channel_layer.group_discard(partition_group(*partition), self.channel_name)
+
     async def receive(self, text_data):
         """
-        Получение сообщения от клиента (пока не используется)
+        Управляющие сообщения клиента:
+        {"type": "subscribe", "start_date": "2025-07-14", "end_date": "2025-07-20",
+         "categories": ["Cat 1", 2], "replace": true}
+            подписка на недели диапазона (start_date, end_date и tz как у
+            /api/timeslots/, end_date по умолчанию равен start_date) и
+            категории (имена или id, по умолчанию все); replace заменяет
+            текущую подписку вместо добавления; resume_from - см. resume
+        {"type": "unsubscribe", "start_date": ..., "end_date": ..., "categories": [...]}
+            отписка; без дат и категорий - от всего
+        {"type": "ping", "data": ...}
+            ответ {"type": "pong", "data": ...}
+        {"type": "reconcile", "start_date": ..., "end_date": ..., "categories": [...],
+         "digests": {"2025-07-14/1": "..."}}
+            сверка дайджестов, см. reconcile
+        Подписка и отписка отвечают {"type": "subscribed"/"unsubscribed"} с
+        текущим видом, ошибки - {"type": "error", "data": {"error": ...}}
         """
-        pass
-    
+        try:
+            message = json.loads(text_data)
+            if not isinstance(message, dict):
+                raise ValueError
+        except ValueError:
+            await self.send_message('error', {'error': 'Invalid message'})
+            return
+
+        message_type = message.get('type')
+        try:
+            if message_type == 'ping':
+                await self.send_message('pong', message.get('data'))
+                return
+            elif message_type == 'reconcile':
+                await self.reconcile(message)
+                return
+            elif message_type == 'subscribe':
+                resume_from = None
+                if 'resume_from' in message:
+                    resume_from = parse_sequence(message['resume_from'])
+                requested = await self.get_message_partitions(message)
+                if message.get('replace'):
+                    partitions = requested
+                else:
+                    partitions = self.partitions | requested
+            elif message_type == 'unsubscribe':
+                if any(key in message for key in ('start_date', 'end_date', 'categories')):
+                    partitions = self.partitions - await self.get_message_partitions(message)
+                else:
+                    partitions = set()
+            else:
+                raise ValueError(f'Unknown message type: {message_type}')
+            await self.set_partitions(partitions)
+        except ValueError as e:
+            await self.send_message('error', {'error': str(e)})
+            return
+
+        await self.send_message(f'{message_type}d', self.describe_view())
+        if message_type == 'subscribe' and resume_from is not None:
+            await self.resume(resume_from)
+
+    async def resume(self, after):
+        """
+        Отправить события текущего вида с номером больше after
+        """
+        partitions = None if self.in_legacy_group else self.partitions
+        frames, last = await database_sync_to_async(replay_events)(after, partitions)
+        if frames is None:
+            # Пропущенных событий уже нет в журнале
+            await self.send_message('resync', {'seq': last})
+        elif frames:
+            await self.send(text_data=wrap_frames(REPLAY_MESSAGE, frames))
+        # События до last клиент уже получил повтором или получит при загрузке
+        self.last_seq = last
+
+    async def set_partitions(self, partitions):
+        """
+        Перевести соединение ровно в эти партиции.
+        Новые группы добавляются до удаления старых, чтобы не пропустить события.
+        """
+        if len(partitions) > MAX_VIEW_PARTITIONS:
+            raise ValueError('Too many partitions requested')
+
+        for partition in partitions - self.partitions:
+            await self.channel_layer.group_add(partition_group(*partition), self.channel_name)
+        # Клиент задал вид - общая группа больше не нужна
+        if self.in_legacy_group:
+            await self.channel_layer.group_discard(LEGACY_GROUP, self.channel_name)
+            self.in_legacy_group = False
+        for partition in self.partitions - partitions:
+            await self.channel_layer.group_discard(partition_group(*partition), self.channel_name)
+        self.partitions = partitions
+
+    def describe_view(self):
+        return {
+            'weeks': sorted({format_week(year, week) for _, year, week in self.partitions}),
+            'categories': sorted({category_id for category_id, _, _ in self.partitions}),
+        }
+
+    async def get_query_partitions(self):
+        """Партиции из параметров weeks и categories, None если weeks не задан"""
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        weeks = [
+            parse_week(week)
+            for value in params.get('weeks', [])
+            for week in value.split(',') if week
+        ]
+        if not weeks:
+            return None
+
+        categories = [
+            int(category_id)
+            for value in params.get('categories', [])
+            for category_id in value.split(',') if category_id
+        ]
+        return view_partitions(await self.resolve_categories(categories), weeks)
+
+    def get_query_resume_from(self):
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        if 'resume_from' not in params:
+            return None
+        return parse_sequence(params['resume_from'][-1])
+
+    async def get_message_partitions(self, message):
+        """Партиции из start_date/end_date и categories сообщения"""
+        categories = message.get('categories') or []
+        if not isinstance(categories, list):
+            raise ValueError('categories must be a list')
+        category_ids = await self.resolve_categories(categories)
+
+        if 'start_date' not in message and 'end_date' not in message:
+            # Без дат - все подписанные недели этих категорий
+            return {partition for partition in self.partitions if partition[0] in category_ids}
+
+        window = self.get_message_window(message)
+        if window.start is None:
+            raise ValueError('start_date is required')
+        return view_partitions(category_ids, window_weeks(window))
+
+    def get_message_window(self, message):
+        """Окно из start_date/end_date и tz сообщения"""
+        params = {key: message[key] for key in ('start_date', 'end_date', 'tz') if key in message}
+        if not all(isinstance(value, str) for value in params.values()):
+            raise ValueError('Invalid date format. Use YYYY-MM-DD')
+        # Один день, если конец не указан
+        params.setdefault('end_date', params.get('start_date'))
+        return TimeWindow.from_params(params)
+
+    async def reconcile(self, message):
+        """
+        Сверка дайджестов по дням и категориям (см. users.digests):
+        ответ {"type": "reconcile", "data": {"buckets": [...]}} со слотами
+        только тех дней, дайджест которых отличается от клиентского
+        """
+        digests = message.get('digests', {})
+        if not isinstance(digests, dict):
+            raise ValueError('digests must be an object')
+        categories = message.get('categories') or []
+        if not isinstance(categories, list):
+            raise ValueError('categories must be a list')
+        category_ids = await self.resolve_categories(categories) if categories else None
+
+        window = self.get_message_window(message)
+        tz = TimeWindow.parse_timezone(message.get('tz'))
+        buckets = await database_sync_to_async(reconcile)(
+            window, tz, category_ids, digests, self.scope['user']
+        )
+        await self.send_message('reconcile', {'buckets': buckets})
+
+    async def resolve_categories(self, categories):
+        """id категорий по именам или id; пустой список - все категории"""
+        if self.categories is None:
+            self.categories = await self.load_categories()
+
+        if not categories:
+            return list(self.categories.values())
+
+        category_ids = []
+        known_ids = set(self.categories.values())
+        for category in categories:
+            if isinstance(category, str) and category in self.categories:
+                category_ids.append(self.categories[category])
+            elif isinstance(category, int) and not isinstance(category, bool) and category in known_ids:
+                category_ids.append(category)
+            else:
+                raise ValueError(f'Unknown category: {category}')
+        return category_ids
+
+    @database_sync_to_async
+    def load_categories(self):
+        return dict(Category.objects.values_list('name', 'id'))
+
+    async def send_message(self, message_type, data):
+        await self.send(text_data=json.dumps({
+            'type': message_type,
+            'data': data
+        }))
+
+    async def push_event(self, event):
+        """
+        Поставить событие в буфер; первое событие окна запускает отправку.
+        Кадр уже закодирован издателем (см. websocket_utils.event_message)
+        """
+        # Уже отправлено при возобновлении
+        if self.last_seq is not None and event['seq'] <= self.last_seq:
+            return
+
+        if not self.batch_window:
+            await self.send(text_data=event['frame'])
+            return
+
+        self.buffer.add(event['type'], event['slot_id'], event['event_id'], event['frame'])
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(self.batch_window)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """
+        Отправить накопленные события одним кадром
+        """
+        frames = self.buffer.drain()
+        # События могли взаимно уничтожиться
+        if frames:
+            await self.send(text_data=batch_frame(frames))
+
     # Обработчики событий от group_send
     async def booking_created(self, event):
         """
         Отправка уведомления о новом бронировании
         """
-        await self.send(text_data=json.dumps({
-            'type': 'booking_created',
-            'data': event['data']
-        }))
-    
+        await self.push_event(event)
+
     async def booking_cancelled(self, event):
         """
         Отправка уведомления об отмене бронирования
         """
-        await self.send(text_data=json.dumps({
-            'type': 'booking_cancelled',
-            'data': event['data']
-        }))
-    
+        await self.push_event(event)
+
     async def timeslot_created(self, event):
         """
         Отправка уведомления о новом временном слоте
         """
-        await self.send(text_data=json.dumps({
-            'type': 'timeslot_created',
-            'data': event['data']
-        }))
+        await self.push_event(event)
+
+    async def timeslot_updated(self, event):
+        """
+        Отправка уведомления об изменении временного слота
+        """
+        await self.push_event(event)
 
     async def timeslot_deleted(self, event):
         """
         Отправка уведомления о удалении временного слота
         """
-        await self.send(text_data=json.dumps({
-            'type': 'timeslot_deleted',
-            'data': event['data']
-        }))
+        await self.push_event(event)
@@ -0,0 +1,95 @@
+"""
+WebSocket group partitioning
+Calendar events are published to one group per category and ISO week, so a
+client only receives events for the part of the calendar it is viewing.
+Clients that do not say what they view stay in the legacy group, which
+receives every event.
+"""
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+# Every event is also sent here for clients without a view
+LEGACY_GROUP = 'calendar_updates'
+
+# Upper bound of partitions a single connection may join
+MAX_VIEW_PARTITIONS = 3 * 12
+
+
+def iso_week(value):
+    """(year, week) of an aware datetime in the server timezone"""
+    year, week, _ = timezone.localtime(value, timezone.get_default_timezone()).isocalendar()
+    return year, week
+
+
+def partition_group(category_id, year, week):
+    """Group name of a (category_id, year, week) partition"""
+    # Channels group names allow only ASCII letters, digits, '-', '_' and '.'
+    return f'cal.{category_id}.{year}-{week:02d}'
+
+
+def slot_partition(time_slot):
+    """(category_id, year, week) partition of time_slot"""
+    return (time_slot.category_id, *iso_week(time_slot.start_time))
+
+
+def event_partitions(time_slot, previous=None):
+    """
+    Partitions an event about time_slot belongs to; previous is the slot
+    before an update, a slot moved to another week or category is also
+    announced in the partition it left
+    """
+    partitions = [slot_partition(time_slot)]
+    if previous is not None and slot_partition(previous) not in partitions:
+        partitions.append(slot_partition(previous))
+    return partitions
+
+
+def event_groups(time_slot, previous=None):
+    """Groups an event about time_slot is published to"""
+    return [partition_group(*partition) for partition in event_partitions(time_slot, previous)] + [LEGACY_GROUP]
+
+
+def parse_week(value):
+    """Parse an ISO week like 2025-W28 into (year, week)"""
+    try:
+        year, week = value.split('-W')
+        year, week = int(year), int(week)
+        date.fromisocalendar(year, week, 1)
+    except ValueError:
+        raise ValueError(f'Invalid week: {value}. Use YYYY-Www')
+    return year, week
+
+
+def format_week(year, week):
+    return f'{year}-W{week:02d}'
+
+
+def window_weeks(window):
+    """(year, week) pairs of all weeks overlapping a bounded TimeWindow"""
+    if window.end - window.start > timedelta(weeks=MAX_VIEW_PARTITIONS):
+        raise ValueError('Too many partitions requested')
+    weeks = []
+    value = window.start
+    while value < window.end:
+        year, week = iso_week(value)
+        if not weeks or weeks[-1] != (year, week):
+            weeks.append((year, week))
+        value += timedelta(days=7)
+    # The window may end within a week the 7-day steps jumped over
+    last = iso_week(window.end - timedelta(microseconds=1))
+    if window.end > window.start and weeks[-1] != last:
+        weeks.append(last)
+    return weeks
+
+
+def view_partitions(category_ids, weeks):
+    """(category_id, year, week) partitions covering the categories and weeks"""
+    partitions = {
+        (category_id, year, week)
+        for category_id in category_ids
+        for year, week in weeks
+    }
+    if len(partitions) > MAX_VIEW_PARTITIONS:
+        raise ValueError('Too many partitions requested')
+    return partitions
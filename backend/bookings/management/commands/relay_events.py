@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from bookings.outbox import relay_pending, run_relay
+
+
+class Command(BaseCommand):
+    help = 'Publish calendar change events from the outbox table to WebSocket clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Events published per batch')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between checks when no NOTIFY arrives')
+        parser.add_argument('--once', action='store_true',
+                            help='Publish pending events and exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            total = relay_pending(options['batch_size'])
+            if total is None:
+                self.stdout.write(self.style.WARNING('Another relay is running, nothing published'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Published {total} events'))
+            return
+
+        self.stdout.write('Relaying calendar events...')
+        run_relay(batch_size=options['batch_size'], interval=options['interval'])
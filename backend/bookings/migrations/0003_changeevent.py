@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_alter_booking_time_slot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=32)),
+                ('slot_id', models.BigIntegerField()),
+                ('category_id', models.BigIntegerField()),
+                ('slot_start', models.DateTimeField()),
+                ('data', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('published_at__isnull', True)), fields=['id'], name='bookings_changeevent_pending')],
+            },
+        ),
+        # Wake the relay when new events are committed, see bookings.outbox
+        migrations.RunSQL(
+            sql="""
+                CREATE FUNCTION bookings_changeevent_notify() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify('calendar_events', '');
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER bookings_changeevent_notify
+                    AFTER INSERT ON bookings_changeevent
+                    FOR EACH STATEMENT EXECUTE FUNCTION bookings_changeevent_notify();
+            """,
+            reverse_sql="""
+                DROP TRIGGER bookings_changeevent_notify ON bookings_changeevent;
+                DROP FUNCTION bookings_changeevent_notify();
+            """,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_changeevent_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeevent',
+            name='previous_category_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='changeevent',
+            name='previous_slot_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,9 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
+from events.calendar_version import bump_calendar_version
+from events.models import TimeSlot
+
 
 class Booking(models.Model):
     """Booking model for time slot reservations"""
@@ -41,8 +44,12 @@ class Booking(models.Model):
             raise ValidationError("Cannot book time slots in the past")
     
     @classmethod
-    def can_book_slot(cls, user, time_slot):
-        """Check if user can book this time slot"""
+    def can_book_slot(cls, user, time_slot, busy_intervals=None):
+        """
+        Check if user can book this time slot.
+        busy_intervals - optional preloaded BusyIntervals for the user,
+        used instead of querying for conflicting bookings
+        """
         from django.utils import timezone
         
         # Check if slot is in the past
@@ -54,12 +61,15 @@ class Booking(models.Model):
             return False, "Time slot is already booked"
         
         # Check if user already has a booking at this time
-        user_bookings = cls.objects.filter(
-            user=user,
-            time_slot__start_time__lt=time_slot.end_time,
-            time_slot__end_time__gt=time_slot.start_time
-        )
-        if user_bookings.exists():
+        if busy_intervals is not None:
+            has_conflict = busy_intervals.overlaps(time_slot.start_time, time_slot.end_time)
+        else:
+            has_conflict = cls.objects.filter(
+                user=user,
+                time_slot__start_time__lt=time_slot.end_time,
+                time_slot__end_time__gt=time_slot.start_time
+            ).exists()
+        if has_conflict:
             return False, "You already have a booking at this time"
         
         return True, "Can book"
@@ -74,14 +84,65 @@ class Booking(models.Model):
         
         return True, "Can cancel"
     
-    def save(self, *args, **kwargs):
-        self.clean()
-        super().save(*args, **kwargs)
+    def save(self, *args, validate=True, **kwargs):
+        """
+        validate=False skips clean() for callers that have already checked
+        the booking rules, see bookings.services.book_time_slot
+        """
+        if validate:
+            self.clean()
+        # The change event is written on post_save, in the same transaction
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.user.username} - {self.time_slot}"
 
 
+class ChangeEvent(models.Model):
+    """
+    Append-only log of calendar changes (transactional outbox).
+    A row is written in the transaction of the change it describes and
+    published to the channel layer by the relay_events command, see
+    bookings.outbox. The last EVENT_REPLAY_SIZE published rows are kept for
+    clients resuming after a reconnect
+    """
+    event_type = models.CharField(max_length=32)
+    # Plain columns rather than foreign keys: the log outlives deleted slots
+    slot_id = models.BigIntegerField()
+    category_id = models.BigIntegerField()
+    slot_start = models.DateTimeField()
+    # Category and start before an update that moved the slot to another
+    # partition; the event also goes to the partition it left
+    previous_category_id = models.BigIntegerField(null=True, blank=True)
+    previous_slot_start = models.DateTimeField(null=True, blank=True)
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    # Position in the published stream, gapless and in publish order; set by the relay
+    sequence = models.BigIntegerField(null=True, blank=True, unique=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(published_at__isnull=True),
+                name='bookings_changeevent_pending'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.id} {self.event_type} {self.slot_id}"
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def bump_version_on_booking_change(sender, instance, **kwargs):
+    """Invalidate cached calendar data once the change is committed"""
+    transaction.on_commit(bump_calendar_version)
+
+
 @receiver(post_save, sender=Booking)
 def log_booking_created(sender, instance, created, **kwargs):
     """Log when a booking is created"""
@@ -99,3 +160,65 @@ def log_booking_cancelled(sender, instance, **kwargs):
     logger = logging.getLogger(__name__)
     
     logger.info(f"Booking cancelled: {instance.user.username} cancelled {instance.time_slot}")
+
+
+@receiver(pre_save, sender=TimeSlot)
+def remember_slot_partition(sender, instance, update_fields=None, **kwargs):
+    """Keep the category and start of an updated slot, its old group hears about a move"""
+    instance._previous_slot = None
+    if instance.pk is None or (update_fields is not None and not {'category', 'start_time'} & set(update_fields)):
+        return
+    instance._previous_slot = TimeSlot.objects.only('category', 'start_time').filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=TimeSlot)
+def record_timeslot_saved(sender, instance, created, **kwargs):
+    """Log the change event in the transaction of the save, see bookings.outbox"""
+    from .websocket_utils import send_timeslot_created_event, send_timeslot_updated_event
+
+    if created:
+        send_timeslot_created_event(instance)
+    else:
+        send_timeslot_updated_event(instance, getattr(instance, '_previous_slot', None))
+
+
+@receiver(post_delete, sender=TimeSlot)
+def record_timeslot_deleted(sender, instance, **kwargs):
+    """Log the change event in the transaction of the delete, cascades included"""
+    from .websocket_utils import send_timeslot_deleted_event
+
+    send_timeslot_deleted_event(instance)
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking(sender, instance, **kwargs):
+    """Keep the booking as it was before an update (e.g. in the Django admin)"""
+    instance._previous_booking = None
+    if instance.pk is not None:
+        instance._previous_booking = (
+            Booking.objects.select_related('user', 'time_slot__category').filter(pk=instance.pk).first()
+        )
+
+
+@receiver(post_save, sender=Booking)
+def record_booking_saved(sender, instance, created, **kwargs):
+    """
+    Log the change event in the transaction of the save; a booking moved to
+    another slot or user is cancelled for the old one and created for the new
+    """
+    from .websocket_utils import send_booking_cancelled_event, send_booking_created_event
+
+    if not created:
+        previous = getattr(instance, '_previous_booking', None)
+        if previous is None or (previous.time_slot_id, previous.user_id) == (instance.time_slot_id, instance.user_id):
+            return
+        send_booking_cancelled_event(previous)
+    send_booking_created_event(instance)
+
+
+@receiver(post_delete, sender=Booking)
+def record_booking_deleted(sender, instance, **kwargs):
+    """Log the change event in the transaction of the delete, cascades included"""
+    from .websocket_utils import send_booking_cancelled_event
+
+    send_booking_cancelled_event(instance)
@@ -0,0 +1,273 @@
+"""
+Transactional outbox for calendar events
+Changes record their WebSocket event as a ChangeEvent row in their own
+transaction, so an event exists exactly when its change is committed. The
+relay (manage.py relay_events) numbers pending rows, publishes them to the
+channel layer in batches and marks them published. A trigger on the table
+sends a NOTIFY on every insert, which wakes the relay as soon as the change
+commits. The numbered rows double as the replay buffer for clients that
+resume after a reconnect.
+"""
+import logging
+import select
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from events.models import TimeSlot
+from .groups import event_groups, event_partitions, slot_partition
+from .models import ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+# Channel of the NOTIFY sent by the bookings_changeevent_notify trigger
+OUTBOX_CHANNEL = 'calendar_events'
+
+# pg_advisory_lock namespace held by the running relay, see bookings.services
+RELAY_LOCK_NAMESPACE = 2
+
+
+def record_event(time_slot, event_type, data, previous=None):
+    """
+    Add an event about time_slot to the log, in the caller's transaction.
+    previous is the slot as it was before an update, see event_partitions
+    """
+    moved = previous is not None and slot_partition(previous) != slot_partition(time_slot)
+    return ChangeEvent.objects.create(
+        event_type=event_type,
+        slot_id=time_slot.id,
+        category_id=time_slot.category_id,
+        slot_start=time_slot.start_time,
+        previous_category_id=previous.category_id if moved else None,
+        previous_slot_start=previous.start_time if moved else None,
+        data=data,
+    )
+
+
+def event_slot(event):
+    """Unsaved TimeSlot with the fields the event groups are computed from"""
+    return TimeSlot(id=event.slot_id, category_id=event.category_id, start_time=event.slot_start)
+
+
+def event_previous_slot(event):
+    """Unsaved TimeSlot the event's slot was moved from, or None"""
+    if event.previous_slot_start is None:
+        return None
+    return TimeSlot(id=event.slot_id, category_id=event.previous_category_id, start_time=event.previous_slot_start)
+
+
+async def publish_events(events):
+    # websocket_utils records its events through this module
+    from .websocket_utils import event_message
+
+    channel_layer = get_channel_layer()
+    # One after another, so clients see the events of a slot in order
+    for event in events:
+        time_slot = event_slot(event)
+        message = event_message(time_slot, event.event_type, event.data, event.sequence)
+        for group in event_groups(time_slot, event_previous_slot(event)):
+            await channel_layer.group_send(group, message)
+
+
+def sequence_pending(batch_size):
+    """
+    Number up to batch_size new events in log order, after the last numbered one.
+    Numbers are committed before publishing, so a batch sent again after a
+    failure keeps its numbers
+    """
+    with transaction.atomic():
+        events = list(
+            ChangeEvent.objects.select_for_update()
+            .filter(sequence__isnull=True)
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return
+        last = ChangeEvent.objects.aggregate(last=Max('sequence'))['last'] or 0
+        for sequence, event in enumerate(events, last + 1):
+            event.sequence = sequence
+        ChangeEvent.objects.bulk_update(events, ['sequence'])
+
+
+def relay_batch(batch_size=100):
+    """
+    Publish up to batch_size pending events in sequence order.
+    Rows are marked published only after every event of the batch was sent;
+    if the channel layer fails, the batch stays pending and is sent again.
+    Published events older than the last EVENT_REPLAY_SIZE are deleted.
+    Returns the number of events published.
+    """
+    sequence_pending(batch_size)
+    events = list(
+        ChangeEvent.objects.filter(published_at__isnull=True, sequence__isnull=False)
+        .order_by('sequence')[:batch_size]
+    )
+    if not events:
+        return 0
+
+    async_to_sync(publish_events)(events)
+    with transaction.atomic():
+        ChangeEvent.objects.filter(id__in=[event.id for event in events]).update(
+            published_at=timezone.now()
+        )
+        ChangeEvent.objects.filter(
+            sequence__lte=events[-1].sequence - settings.EVENT_REPLAY_SIZE
+        ).delete()
+    return len(events)
+
+
+def numbered_after(after):
+    """
+    Queryset of the numbered events after sequence `after` and the last
+    sequence; the queryset is None when the events after `after` are not all
+    kept or `after` is ahead of the stream.
+    Numbered rather than published: the relay sends a batch before marking
+    it published, a client that joined its groups in between got only part
+    of the batch live. Events it also got live are dropped by their seq.
+    """
+    numbered = ChangeEvent.objects.filter(sequence__isnull=False)
+    bounds = numbered.aggregate(first=Min('sequence'), last=Max('sequence'))
+    last = bounds['last'] or 0
+    if after > last or (bounds['first'] is not None and after < bounds['first'] - 1):
+        return None, last
+    return numbered.filter(sequence__gt=after, sequence__lte=last), last
+
+
+def last_sequence():
+    """The last numbered sequence, 0 before the first event"""
+    return ChangeEvent.objects.filter(sequence__isnull=False).aggregate(last=Max('sequence'))['last'] or 0
+
+
+def replay_events(after, partitions=None):
+    """
+    Encoded frames of the numbered events after sequence `after`, limited to
+    a set of (category_id, year, week) partitions when given, and the last
+    sequence. Frames are None when events after `after` were deleted already
+    or `after` is not a sequence yet, the client has to load the calendar
+    again.
+    """
+    from .websocket_utils import event_message
+
+    events, last = numbered_after(after)
+    if events is None:
+        return None, last
+
+    frames = []
+    for event in events.order_by('sequence'):
+        time_slot = event_slot(event)
+        if partitions is None or not partitions.isdisjoint(event_partitions(time_slot, event_previous_slot(event))):
+            frames.append(event_message(time_slot, event.event_type, event.data, event.sequence)['frame'])
+    return frames, last
+
+
+def changed_slots(after, window=None, category_ids=None, user=None):
+    """
+    Ids of the time slots changed after sequence `after` and the last
+    sequence, or None and the last sequence like replay_events.
+    Events are limited to slot starts in window and to category_ids; updates
+    are kept regardless, a slot may have been moved out of the window. When
+    user booked or cancelled a slot, slots overlapping it are included too,
+    their can_book changed.
+    """
+    events, last = numbered_after(after)
+    if events is None:
+        return None, last
+
+    scoped = events
+    if window is not None:
+        scoped = window.apply(scoped, 'slot_start')
+    if category_ids is not None:
+        scoped = scoped.filter(category_id__in=category_ids)
+    slot_ids = set(
+        events.filter(Q(id__in=scoped.values('id')) | Q(event_type='timeslot_updated'))
+        .values_list('slot_id', flat=True)
+    )
+
+    if user is not None:
+        booked = events.filter(
+            event_type__in=('booking_created', 'booking_cancelled'), data__user__id=user.id
+        ).values_list('slot_id', flat=True)
+        overlaps = Q()
+        for start_time, end_time in TimeSlot.objects.filter(id__in=booked).values_list('start_time', 'end_time'):
+            overlaps |= Q(start_time__lt=end_time, end_time__gt=start_time)
+        if overlaps:
+            overlapping = TimeSlot.objects.filter(overlaps)
+            if window is not None:
+                overlapping = window.apply(overlapping, 'start_time')
+            if category_ids is not None:
+                overlapping = overlapping.filter(category_id__in=category_ids)
+            slot_ids.update(overlapping.values_list('id', flat=True))
+    return slot_ids, last
+
+
+def take_over():
+    """Wait until no other relay runs, then listen for new events"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s, 0)', [RELAY_LOCK_NAMESPACE])
+        cursor.execute(f'LISTEN {OUTBOX_CHANNEL}')
+
+
+def relay_pending(batch_size=100):
+    """
+    Publish all pending events unless another relay holds the relay lock.
+    Returns the number of events published, None when the lock is taken
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s, 0)', [RELAY_LOCK_NAMESPACE])
+        if not cursor.fetchone()[0]:
+            return None
+    try:
+        total = 0
+        while True:
+            published = relay_batch(batch_size)
+            total += published
+            if published < batch_size:
+                return total
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s, 0)', [RELAY_LOCK_NAMESPACE])
+
+
+def wait_for_events(timeout):
+    """Wait up to timeout seconds for a NOTIFY, True if one arrived"""
+    pg_connection = connection.connection
+    if pg_connection.notifies:
+        pg_connection.notifies.clear()
+        return True
+    if select.select([pg_connection], [], [], timeout) == ([], [], []):
+        return False
+    pg_connection.poll()
+    notified = bool(pg_connection.notifies)
+    pg_connection.notifies.clear()
+    return notified
+
+
+def run_relay(batch_size=100, interval=5.0, stop=None):
+    """
+    Publish events until stop() returns True.
+    Only one relay publishes at a time, so events go out in log order; a
+    second relay waits on the advisory lock and takes over when the first exits.
+    interval bounds the wait for a NOTIFY, as a fallback for missed ones.
+    """
+    stop = stop or (lambda: False)
+    take_over()
+
+    while not stop():
+        # The lock and LISTEN belong to the connection, a new one takes them again
+        if connection.connection is None:
+            take_over()
+        try:
+            published = relay_batch(batch_size)
+        except Exception:
+            logger.exception('Failed to publish calendar events, retrying in %s s', interval)
+            connection.close_if_unusable_or_obsolete()
+            time.sleep(interval)
+            continue
+        # A full batch means more events are probably waiting
+        if published < batch_size:
+            wait_for_events(interval)
@@ -0,0 +1,147 @@
+"""
+Booking service
+Creates bookings in one short transaction with a fixed set of statements:
+a per-user advisory lock, one check query and the insert.
+Cancels bookings with one joined read and one DELETE.
+"""
+from django.contrib.auth.models import User
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import pre_delete, post_delete
+from django.utils import timezone
+from psycopg2 import errorcodes
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from events.models import Category, TimeSlot
+from .models import Booking
+
+# First key of the two-key advisory lock, keeps booking locks apart from other users of
+# pg_advisory_xact_lock; the second key is the user id
+BOOKING_LOCK_NAMESPACE = 1
+
+
+class BookingError(Exception):
+    """Booking rejected by the booking rules"""
+    status_code = 400
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class BookingConflict(BookingError):
+    """Booking lost a race against a concurrent write"""
+    status_code = 409
+
+
+def lock_user_bookings(user):
+    """
+    Serialize booking transactions of one user until commit.
+    Without it two requests of the same user could both pass the overlap check.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [BOOKING_LOCK_NAMESPACE, user.pk])
+
+
+def book_time_slot(user, time_slot_id):
+    """
+    Book a time slot for user.
+    The slot itself is protected by the unique time_slot_id of Booking: when
+    two users race for it the second insert fails and raises BookingConflict.
+    """
+    try:
+        with transaction.atomic():
+            lock_user_bookings(user)
+
+            # Slot, its booking state and the user's overlapping bookings in one query
+            time_slot = TimeSlot.objects.select_related('category').annotate(
+                already_booked=Exists(Booking.objects.filter(time_slot=OuterRef('pk'))),
+                user_conflict=Exists(Booking.objects.filter(
+                    user=user,
+                    time_slot__start_time__lt=OuterRef('end_time'),
+                    time_slot__end_time__gt=OuterRef('start_time')
+                )),
+            ).filter(pk=time_slot_id).first()
+
+            # Same rules and messages as Booking.can_book_slot
+            if time_slot is None:
+                raise BookingError(
+                    PrimaryKeyRelatedField.default_error_messages['does_not_exist'].format(pk_value=time_slot_id)
+                )
+            if time_slot.start_time < timezone.now():
+                raise BookingError("Time slot is in the past")
+            if time_slot.already_booked:
+                raise BookingError("Time slot is already booked")
+            if time_slot.user_conflict:
+                raise BookingError("You already have a booking at this time")
+
+            booking = Booking(user=user, time_slot=time_slot)
+            booking.save(validate=False)
+    except IntegrityError as e:
+        if getattr(e.__cause__, 'pgcode', None) == errorcodes.UNIQUE_VIOLATION:
+            raise BookingConflict("Time slot is already booked") from e
+        # The slot was deleted after the check
+        raise BookingConflict("Time slot is no longer available") from e
+
+    # The slot is known to be booked by this booking, no need to query it again
+    time_slot.booking = booking
+    return booking
+
+
+CANCEL_VALUES = (
+    'id', 'user_id', 'user__username', 'time_slot_id',
+    'time_slot__start_time', 'time_slot__end_time',
+    'time_slot__category_id', 'time_slot__category__name',
+)
+
+
+def booking_from_row(row):
+    """
+    Unsaved Booking with its user, time slot and category cached, for
+    signal receivers of a booking that was deleted without loading it
+    """
+    category = Category(id=row['time_slot__category_id'], name=row['time_slot__category__name'])
+    time_slot = TimeSlot(
+        id=row['time_slot_id'],
+        start_time=row['time_slot__start_time'],
+        end_time=row['time_slot__end_time'],
+        category=category,
+    )
+    user = User(id=row['user_id'], username=row['user__username'])
+    return Booking(id=row['id'], user=user, time_slot=time_slot)
+
+
+def cancel_booking(booking_id, user=None, allow_past=False):
+    """
+    Delete a booking and return it, with user, time slot and category loaded.
+    user - only cancel the booking if it belongs to this user
+    allow_past - skip the rule that past bookings cannot be cancelled (admins)
+    Raises Booking.DoesNotExist or BookingError.
+    """
+    queryset = Booking.objects.filter(id=booking_id)
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    row = queryset.values(*CANCEL_VALUES).first()
+    if row is None:
+        raise Booking.DoesNotExist
+
+    # Same rule as Booking.can_cancel
+    if not allow_past and row['time_slot__start_time'] < timezone.now():
+        raise BookingError("Cannot cancel past bookings")
+
+    # Nothing references bookings, so the DELETE has no cascades to run;
+    # only the signals of Model.delete() are sent, with the row preloaded
+    booking = booking_from_row(row)
+    # The receivers log the change event, in the transaction of the DELETE
+    with transaction.atomic(savepoint=False):
+        pre_delete.send(sender=Booking, instance=booking, using=connection.alias, origin=booking)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(Booking._meta.db_table)} WHERE id = %s RETURNING id',
+                [booking_id]
+            )
+            if cursor.fetchone() is None:
+                # Cancelled by a concurrent request after the read
+                raise Booking.DoesNotExist
+        post_delete.send(sender=Booking, instance=booking, using=connection.alias, origin=booking)
+    return booking
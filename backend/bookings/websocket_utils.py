@@ -1,14 +1,37 @@
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from datetime import datetime
 
+from calendar_project.renderers import dumps
+from .outbox import record_event
+
+
+def event_message(time_slot, event_type, data, seq):
+    """
+    Сообщение для group_send.
+    Кадр кодируется здесь один раз, потребители отправляют его как есть;
+    slot_id и event_id нужны им для схлопывания событий (см. bookings.batching),
+    seq - номер события в общем потоке для возобновления после переподключения
+    """
+    return {
+        "type": event_type,
+        "frame": dumps({"type": event_type, "seq": seq, "data": data}).decode(),
+        "slot_id": time_slot.id,
+        "event_id": data['id'],
+        "seq": seq,
+    }
+
+
+def publish_event(time_slot, event_type, data, previous=None):
+    """
+    Записывает событие в журнал изменений в текущей транзакции; в группы
+    слота его отправляет relay_events (см. bookings.outbox)
+    """
+    record_event(time_slot, event_type, data, previous)
+
 
 def send_booking_created_event(booking):
     """
     Отправляет WebSocket событие о создании нового бронирования
     """
-    channel_layer = get_channel_layer()
-    
     # Подготавливаем данные для отправки
     booking_data = {
         'id': booking.id,
@@ -25,40 +48,45 @@ def send_booking_created_event(booking):
         },
         'created_at': booking.booked_at.isoformat(),
     }
-    
-    # Отправляем событие всем подключенным клиентам
-    async_to_sync(channel_layer.group_send)(
-        "calendar_updates",
-        {
-            "type": "booking_created",
-            "data": booking_data
-        }
-    )
+
+    publish_event(booking.time_slot, "booking_created", booking_data)
+
+
+def booking_cancelled_data(booking):
+    """
+    Данные события об отмене бронирования
+    booking - удаленное бронирование с загруженными user и time_slot.category
+    """
+    time_slot = booking.time_slot
+    return {
+        'id': booking.id,
+        'timeslot_id': time_slot.id,
+        'user': {
+            'id': booking.user.id,
+            'username': booking.user.username,
+        },
+        'timeslot': {
+            'id': time_slot.id,
+            'date': time_slot.start_time.date().isoformat(),
+            'start_time': time_slot.start_time.strftime('%H:%M'),
+            'end_time': time_slot.end_time.strftime('%H:%M'),
+            'category': time_slot.category.name,
+        },
+    }
 
 
-def send_booking_cancelled_event(booking_data):
+def send_booking_cancelled_event(booking):
     """
     Отправляет WebSocket событие об отмене бронирования
-    booking_data - данные удаленного бронирования (объект может быть уже удален)
+    booking - удаленное бронирование (см. bookings.services.cancel_booking)
     """
-    channel_layer = get_channel_layer()
-    
-    # Отправляем событие всем подключенным клиентам
-    async_to_sync(channel_layer.group_send)(
-        "calendar_updates",
-        {
-            "type": "booking_cancelled",
-            "data": booking_data
-        }
-    )
+    publish_event(booking.time_slot, "booking_cancelled", booking_cancelled_data(booking))
 
 
 def send_timeslot_created_event(timeslot):
     """
     Отправляет WebSocket событие о создании нового временного слота
     """
-    channel_layer = get_channel_layer()
-    
     # Подготавливаем данные для отправки
     timeslot_data = {
         'id': timeslot.id,
@@ -68,23 +96,31 @@ def send_timeslot_created_event(timeslot):
         'is_available': True,  # Новый слот всегда доступен
         'created_at': timeslot.created_at.isoformat(),
     }
-    
-    # Отправляем событие всем подключенным клиентам
-    async_to_sync(channel_layer.group_send)(
-        "calendar_updates",
-        {
-            "type": "timeslot_created",
-            "data": timeslot_data
-        }
-    )
+
+    publish_event(timeslot, "timeslot_created", timeslot_data)
+
+
+def send_timeslot_updated_event(timeslot, previous=None):
+    """
+    Отправляет WebSocket событие об изменении временного слота
+    previous - слот до изменения: если его перенесли в другую неделю или
+    категорию, событие получит и прежняя группа
+    """
+    timeslot_data = {
+        'id': timeslot.id,
+        'start_time': timeslot.start_time.isoformat(),
+        'end_time': timeslot.end_time.isoformat(),
+        'category': timeslot.category.name,
+        'is_available': not hasattr(timeslot, 'booking'),
+    }
+
+    publish_event(timeslot, "timeslot_updated", timeslot_data, previous)
 
 
 def send_timeslot_deleted_event(timeslot):
     """
     Отправляет WebSocket событие об удалении временного слота
     """
-    channel_layer = get_channel_layer()
-    
     # Подготавливаем данные для отправки
     timeslot_data = {
         'id': timeslot.id,
@@ -93,12 +129,5 @@ def send_timeslot_deleted_event(timeslot):
         'category': timeslot.category.name,
         'deleted_at': datetime.now().isoformat(),
     }
-    
-    # Отправляем событие всем подключенным клиентам
-    async_to_sync(channel_layer.group_send)(
-        "calendar_updates",
-        {
-            "type": "timeslot_deleted",
-            "data": timeslot_data
-        }
-    )
+
+    publish_event(timeslot, "timeslot_deleted", timeslot_data)
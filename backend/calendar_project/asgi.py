@@ -10,7 +10,6 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'calendar_project.settings')
@@ -19,11 +18,13 @@ django_asgi_app = get_asgi_application()
 
 # Import routing from apps
 from bookings.routing import websocket_urlpatterns
+from users.ws_tickets import TicketAuthMiddlewareStack
 
 application = ProtocolTypeRouter({
     'http': django_asgi_app,
     'websocket': AllowedHostsOriginValidator(
-        AuthMiddlewareStack(
+        # Signed ticket from /api/auth/ws-ticket/, the session cookie otherwise
+        TicketAuthMiddlewareStack(
             URLRouter(
                 websocket_urlpatterns
             )
@@ -0,0 +1,38 @@
+"""
+JSON rendering with orjson
+orjson serializes datetimes, dates, UUIDs and dataclasses natively; anything
+else goes through DRF's encoder so the output matches JSONRenderer.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_drf_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """Encode data to compact JSON bytes, as JSONRenderer does by default"""
+    ret = orjson.dumps(data, default=_drf_encoder.default, option=ORJSON_OPTIONS)
+    # JSONRenderer escapes these for embedding in JavaScript, keep it identical
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return ret
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for JSONRenderer.
+    Indented output (?indent= in the Accept header) falls back to the stdlib
+    encoder, which is only used for debugging.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
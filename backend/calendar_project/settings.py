@@ -60,6 +60,7 @@ INSTALLED_APPS = [
     
     # Third party apps
     'rest_framework',
+    'rest_framework.authtoken',
     'drf_spectacular',
     'corsheaders',
     'channels',
@@ -180,16 +181,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Token requests skip the session and CSRF checks, token lookups are cached
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.SessionAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # The browsable API is only enabled for development
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
-    ],
+        'calendar_project.renderers.ORJSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
@@ -218,6 +220,8 @@ CORS_ALLOWED_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+# Version of the change log a full calendar load corresponds to
+CORS_EXPOSE_HEADERS = ['x-calendar-version']
 
 # Nginx proxy settings
 USE_X_FORWARDED_HOST = True
@@ -226,15 +230,93 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 FORCE_SCRIPT_NAME = None
 
 # Channel layers for WebSocket
+# 'redis': one Redis message per member channel, queued until received.
+# 'worker' (opt-in): group_send is one Redis PUBLISH; every ASGI worker
+# subscribes once per group and fans out to its own connections. Delivery is
+# at most once: an event lost on an open socket goes unnoticed until the
+# client reconnects with resume_from or reloads the calendar.
+WEBSOCKET_FANOUT = config('WEBSOCKET_FANOUT', default='redis')
+CHANNEL_LAYER_BACKENDS = {
+    'worker': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+    'redis': 'channels_redis.core.RedisChannelLayer',
+}
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'BACKEND': CHANNEL_LAYER_BACKENDS[WEBSOCKET_FANOUT],
         'CONFIG': {
             "hosts": [config('REDIS_URL', default='redis://localhost:6379/0')],
         },
     },
 }
 
+# Cache
+# Redis when CACHE_URL is set (docker-compose), local memory otherwise.
+# Sessions have their own cache, in another Redis database: clearing the
+# calendar cache must not log users out.
+CACHE_URL = config('CACHE_URL', default='')
+SESSION_CACHE_URL = config('SESSION_CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+if SESSION_CACHE_URL:
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': SESSION_CACHE_URL,
+    }
+else:
+    # Stand-in for tests and single-process development
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    }
+
+# Build list responses from .values() rows instead of ModelSerializers
+FAST_LIST_SERIALIZERS = True
+
+# Calendar week snapshots (seconds a cached week lives without being read)
+CALENDAR_SNAPSHOT_TIMEOUT = 60 * 60
+CALENDAR_SNAPSHOT_MAX_WEEKS = 6
+
+# Rows per server-side cursor fetch for ?stream=true list responses
+LIST_STREAM_CHUNK_SIZE = 2000
+
+# Seconds a WebSocket connection gathers events before sending them as one
+# frame; 0 sends every event on its own
+WEBSOCKET_BATCH_WINDOW = config('WEBSOCKET_BATCH_WINDOW', default=0.05, cast=float)
+
+# Published calendar events kept for clients resuming after a reconnect
+EVENT_REPLAY_SIZE = 10000
+
+# Seconds an API token and its user stay cached (users.authentication)
+TOKEN_CACHE_TIMEOUT = 60
+
+# Seconds a signed WebSocket ticket (/api/auth/ws-ticket/) stays valid
+WS_TICKET_MAX_AGE = config('WS_TICKET_MAX_AGE', default=300, cast=int)
+
+# Password hashing pool for login/registration (users.password_hashing):
+# threads hashing at once and hashes allowed to wait before the views answer 503
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=2, cast=int)
+PASSWORD_HASHING_QUEUE = config('PASSWORD_HASHING_QUEUE', default=32, cast=int)
+
+# Login/registration token buckets (users.rate_limits): "N/S" allows bursts of
+# N attempts and N more every S seconds. Without RATE_LIMIT_URL every process
+# keeps its own buckets. AUTH_RATE_LIMIT_IP_HEADER is the header carrying the
+# client address when running behind the reverse proxy
+RATE_LIMIT_URL = config('RATE_LIMIT_URL', default='')
+AUTH_RATE_LIMIT_IP = config('AUTH_RATE_LIMIT_IP', default='30/60')
+AUTH_RATE_LIMIT_USERNAME = config('AUTH_RATE_LIMIT_USERNAME', default='10/60')
+AUTH_RATE_LIMIT_IP_HEADER = config('AUTH_RATE_LIMIT_IP_HEADER', default='')
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -265,7 +347,10 @@ LOGGING = {
 }
 
 # Session configuration
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Сессии в БД
+# Сессии читаются из кэша sessions и записываются в кэш и в БД (cached_db);
+# 'django.contrib.sessions.backends.cache' хранит их только в Redis
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = 'sessions'
 SESSION_COOKIE_AGE = 1209600  # 2 недели
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 SESSION_COOKIE_NAME = 'sessionid'
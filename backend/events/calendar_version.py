@@ -0,0 +1,35 @@
+"""
+Calendar data version
+A counter in the shared cache that changes whenever time slots or bookings
+change. Cached calendar payloads are keyed by it, so bumping the version
+invalidates all of them at once.
+"""
+import time
+
+from django.core.cache import cache
+
+CALENDAR_VERSION_KEY = 'calendar:version'
+
+
+def _seed_version():
+    # Seeded from the clock so a counter lost to eviction or a cache restart
+    # never goes back to a value that was already handed out
+    return time.time_ns() // 1000
+
+
+def get_calendar_version():
+    """Return the current calendar version"""
+    version = cache.get(CALENDAR_VERSION_KEY)
+    if version is None:
+        cache.add(CALENDAR_VERSION_KEY, _seed_version(), timeout=None)
+        version = cache.get(CALENDAR_VERSION_KEY)
+    return version
+
+
+def bump_calendar_version():
+    """Invalidate cached calendar data; returns the new version"""
+    try:
+        return cache.incr(CALENDAR_VERSION_KEY)
+    except ValueError:
+        cache.add(CALENDAR_VERSION_KEY, _seed_version(), timeout=None)
+        return cache.incr(CALENDAR_VERSION_KEY)
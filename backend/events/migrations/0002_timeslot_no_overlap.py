@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:47
+
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+import events.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        # GiST support for the equality check on category_id
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name='timeslot',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[(events.models.TsTzRange('start_time', 'end_time'), '&&'), ('category', '=')], name='events_timeslot_no_overlap', violation_error_message='Time slot overlaps with existing slot in the same category'),
+        ),
+    ]
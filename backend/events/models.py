@@ -1,6 +1,27 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import User
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
 from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .calendar_version import bump_calendar_version
+
+
+OVERLAP_CONSTRAINT = 'events_timeslot_no_overlap'
+
+
+class TsTzRange(models.Func):
+    """tstzrange(start, end) with the default half-open '[)' bounds"""
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+def is_overlap_violation(error):
+    """Check if an IntegrityError was raised by the overlap exclusion constraint"""
+    diag = getattr(error.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == OVERLAP_CONSTRAINT
 
 
 class Category(models.Model):
@@ -52,6 +73,18 @@ class TimeSlot(models.Model):
             models.Index(fields=['start_time', 'end_time']),
             models.Index(fields=['category']),
         ]
+        constraints = [
+            # Slots of one category must not overlap; enforced by PostgreSQL
+            # so concurrent inserts cannot both pass an application check
+            ExclusionConstraint(
+                name=OVERLAP_CONSTRAINT,
+                expressions=[
+                    (TsTzRange('start_time', 'end_time'), RangeOperators.OVERLAPS),
+                    ('category', RangeOperators.EQUAL),
+                ],
+                violation_error_message="Time slot overlaps with existing slot in the same category",
+            ),
+        ]
     
     def clean(self):
         """Validate time slot data"""
@@ -66,16 +99,6 @@ class TimeSlot(models.Model):
             if not self.pk and self.start_time < timezone.now():
                 raise ValidationError("Cannot create time slots in the past")
             
-            # Check for overlapping slots in the same category
-            overlapping = TimeSlot.objects.filter(
-                category=self.category,
-                start_time__lt=self.end_time,
-                end_time__gt=self.start_time
-            ).exclude(pk=self.pk)
-            
-            if overlapping.exists():
-                raise ValidationError("Time slot overlaps with existing slot in the same category")
-            
             # Check minimum duration (15 minutes)
             duration = self.end_time - self.start_time
             if duration.total_seconds() < 900:  # 15 minutes
@@ -83,7 +106,18 @@ class TimeSlot(models.Model):
     
     def save(self, *args, **kwargs):
         self.clean()
-        super().save(*args, **kwargs)
+        # Overlaps are rejected by the exclusion constraint. Inside a transaction
+        # the insert needs a savepoint so a violation does not abort it; outside
+        # one, the transaction also covers the change event written on post_save
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError as e:
+            if is_overlap_violation(e):
+                raise ValidationError(
+                    "Time slot overlaps with existing slot in the same category", code='overlap'
+                ) from e
+            raise
     
     @property
     def is_available(self):
@@ -138,3 +172,10 @@ class TimeSlot(models.Model):
     
     def __str__(self):
         return f"{self.category.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')} to {self.end_time.strftime('%H:%M')}"
+
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+def bump_version_on_timeslot_change(sender, instance, **kwargs):
+    """Invalidate cached calendar data once the change is committed"""
+    transaction.on_commit(bump_calendar_version)
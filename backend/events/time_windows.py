@@ -0,0 +1,109 @@
+"""
+Time window filtering
+Converts date and instant query parameters into half-open ranges on the raw
+datetime column. Filtering with start_time__date wraps the column in a cast,
+which keeps Postgres from using the (start_time, end_time) index.
+"""
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+class TimeWindow:
+    """Half-open interval [start, end) of aware datetimes; either bound may be open"""
+
+    def __init__(self, start=None, end=None):
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_params(cls, params):
+        """
+        Build a window from query parameters:
+        - from / to: ISO 8601 instants, naive values are read in tz
+        - date: a single day
+        - start_date / end_date: inclusive range of days
+        - tz: IANA timezone used for day boundaries (defaults to the current timezone)
+        When several parameters are given the window is their intersection.
+        Raises ValueError with a user-facing message on malformed input.
+        """
+        tz = cls.parse_timezone(params.get('tz'))
+        window = cls()
+
+        date_param = params.get('date')
+        if date_param:
+            day = cls.parse_date(date_param)
+            window = window.intersect(cls(cls.day_start(day, tz), cls.day_start(day + timedelta(days=1), tz)))
+
+        start_date = params.get('start_date')
+        if start_date:
+            window = window.intersect(cls(start=cls.day_start(cls.parse_date(start_date), tz)))
+
+        end_date = params.get('end_date')
+        if end_date:
+            day = cls.parse_date(end_date)
+            window = window.intersect(cls(end=cls.day_start(day + timedelta(days=1), tz)))
+
+        from_param = params.get('from')
+        if from_param:
+            window = window.intersect(cls(start=cls.parse_instant(from_param, tz)))
+
+        to_param = params.get('to')
+        if to_param:
+            window = window.intersect(cls(end=cls.parse_instant(to_param, tz)))
+
+        return window
+
+    @staticmethod
+    def parse_timezone(value):
+        if not value:
+            return timezone.get_current_timezone()
+        try:
+            return ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f'Unknown timezone: {value}')
+
+    @staticmethod
+    def parse_date(value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('Invalid date format. Use YYYY-MM-DD')
+
+    @staticmethod
+    def parse_instant(value, tz):
+        try:
+            instant = parse_datetime(value)
+        except ValueError:
+            instant = None
+        if instant is None:
+            raise ValueError('Invalid datetime format. Use ISO 8601')
+        if timezone.is_naive(instant):
+            instant = timezone.make_aware(instant, tz)
+        return instant
+
+    @staticmethod
+    def day_start(day, tz):
+        """First instant of a calendar day in the given timezone"""
+        return timezone.make_aware(datetime.combine(day, time.min), tz)
+
+    def intersect(self, other):
+        starts = [value for value in (self.start, other.start) if value is not None]
+        ends = [value for value in (self.end, other.end) if value is not None]
+        return TimeWindow(max(starts) if starts else None, min(ends) if ends else None)
+
+    def apply(self, queryset, field='start_time'):
+        """Filter queryset with field >= start and field < end"""
+        if self.start is not None:
+            queryset = queryset.filter(**{f'{field}__gte': self.start})
+        if self.end is not None:
+            queryset = queryset.filter(**{f'{field}__lt': self.end})
+        return queryset
+
+    def __bool__(self):
+        return self.start is not None or self.end is not None
+
+    def __repr__(self):
+        return f'TimeWindow({self.start!r}, {self.end!r})'
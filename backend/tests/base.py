@@ -3,12 +3,14 @@ Base test utilities and fixtures
 """
 from django.test import TestCase
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework.test import APITestCase, APIClient
 
 from events.models import Category, TimeSlot
-from bookings.models import Booking
+from bookings.models import Booking, ChangeEvent
+from users import rate_limits
 
 
 class BaseAPITestCase(APITestCase):
@@ -16,6 +18,10 @@ class BaseAPITestCase(APITestCase):
     
     def setUp(self):
         """Set up test data"""
+        # Cached calendar data and rate limit buckets must not leak between tests
+        cache.clear()
+        rate_limits._limiter = None
+        
         # Create test users
         self.regular_user = User.objects.create_user(
             username='testuser',
@@ -66,6 +72,9 @@ class BaseAPITestCase(APITestCase):
             category=self.category2,
             created_by=self.admin_user
         )
+        
+        # The fixtures' own change events are not part of any test
+        ChangeEvent.objects.all().delete()
     
     def authenticate_user(self, user=None):
         """Authenticate as regular user or specified user"""
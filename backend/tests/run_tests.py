@@ -26,7 +26,23 @@ def run_tests():
     # Run tests for both test modules
     test_modules = [
         'tests.test_user_endpoints',
-        'tests.test_admin_endpoints'
+        'tests.test_admin_endpoints',
+        'tests.test_time_windows',
+        'tests.test_week_snapshots',
+        'tests.test_etags',
+        'tests.test_fast_serializers',
+        'tests.test_streaming',
+        'tests.test_booking_service',
+        'tests.test_websocket_groups',
+        'tests.test_websocket_batching',
+        'tests.test_outbox',
+        'tests.test_delta_sync',
+        'tests.test_digests',
+        'tests.test_ws_tickets',
+        'tests.test_sessions',
+        'tests.test_token_auth',
+        'tests.test_password_hashing',
+        'tests.test_rate_limits',
     ]
     
     failures = test_runner.run_tests(test_modules)
@@ -2,9 +2,15 @@
 Unit tests for admin API endpoints
 Tests for admin-only endpoints including timeslots and bookings management
 """
+import threading
+
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from datetime import timedelta
 from rest_framework import status
 
@@ -26,6 +32,21 @@ class AdminTimeslotsListCreateTest(BaseAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
     
+    def test_get_timeslots_paginated(self):
+        """Test paginated admin timeslots list"""
+        self.authenticate_admin()
+        url = reverse('admin_timeslots_list_create')
+        
+        response = self.client.get(url, {'page_size': 1})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['id'], self.timeslot1.id)
+        
+        response = self.client.get(url, {'page_size': 1, 'cursor': response.data['next']})
+        
+        self.assertEqual(response.data['results'][0]['id'], self.timeslot2.id)
+        self.assertIsNone(response.data['next'])
+    
     def test_get_timeslots_as_regular_user(self):
         """Test getting timeslots as regular user (should fail)"""
         self.authenticate_user()
@@ -80,6 +101,49 @@ class AdminTimeslotsListCreateTest(BaseAPITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
     
+    def test_create_overlapping_timeslot(self):
+        """Test creating a timeslot overlapping one in the same category"""
+        self.authenticate_admin()
+        url = reverse('admin_timeslots_list_create')
+        data = {
+            'start_time': (self.timeslot1.start_time + timedelta(minutes=30)).isoformat(),
+            'end_time': (self.timeslot1.end_time + timedelta(minutes=30)).isoformat(),
+            'category': self.category1.id
+        }
+        
+        response = self.client.post(url, data)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'non_field_errors': ['Time slot overlaps with existing slot']})
+        
+        # Another category and back-to-back slots do not overlap
+        data['category'] = self.category3.id
+        self.assertEqual(self.client.post(url, data).status_code, status.HTTP_201_CREATED)
+        data = {
+            'start_time': self.timeslot1.end_time.isoformat(),
+            'end_time': (self.timeslot1.end_time + timedelta(hours=1)).isoformat(),
+            'category': self.category1.id
+        }
+        self.assertEqual(self.client.post(url, data).status_code, status.HTTP_201_CREATED)
+    
+    def test_create_timeslot_single_statement(self):
+        """Test overlap checking does not query time slots before the insert"""
+        self.authenticate_admin()
+        url = reverse('admin_timeslots_list_create')
+        future_time = timezone.now() + timedelta(days=2)
+        data = {
+            'start_time': future_time.isoformat(),
+            'end_time': (future_time + timedelta(hours=1)).isoformat(),
+            'category': self.category1.id
+        }
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        timeslot_queries = [q['sql'] for q in queries if 'FROM "events_timeslot"' in q['sql']]
+        self.assertEqual(timeslot_queries, [])
+    
     def test_filter_timeslots_by_date(self):
         """Test filtering timeslots by date"""
         self.authenticate_admin()
@@ -179,6 +243,23 @@ class AdminTimeslotDetailTest(BaseAPITestCase):
         self.timeslot1.refresh_from_db()
         self.assertEqual(self.timeslot1.category.id, self.category1.id)
     
+    def test_update_timeslot_into_overlap(self):
+        """Test moving a timeslot over another one in the same category"""
+        self.authenticate_admin()
+        url = reverse('admin_timeslot_detail', kwargs={'timeslot_id': self.timeslot2.id})
+        data = {
+            'start_time': self.timeslot1.start_time.isoformat(),
+            'end_time': self.timeslot1.end_time.isoformat(),
+            'category': self.category1.id
+        }
+        
+        response = self.client.put(url, data)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'non_field_errors': ['Time slot overlaps with existing slot']})
+        self.timeslot2.refresh_from_db()
+        self.assertEqual(self.timeslot2.category, self.category2)
+    
     def test_update_booked_timeslot_critical_fields(self):
         """Test updating critical fields of booked timeslot (should fail)"""
         # Book the timeslot
@@ -320,6 +401,29 @@ class AdminBookingsListTest(BaseAPITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
+    
+    def test_cursor_pagination_with_equal_booked_at(self):
+        """Test cursor pagination breaks booked_at ties by id"""
+        Booking.objects.update(booked_at=timezone.now())
+        self.authenticate_admin()
+        url = reverse('admin_bookings_list')
+        
+        first = self.client.get(url, {'page_size': 1})
+        second = self.client.get(url, {'page_size': 1, 'cursor': first.data['next']})
+        
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        ids = [first.data['results'][0]['id'], second.data['results'][0]['id']]
+        self.assertEqual(ids, sorted(Booking.objects.values_list('id', flat=True), reverse=True))
+        self.assertIsNone(second.data['next'])
+    
+    def test_invalid_page_size(self):
+        """Test invalid page size returns error"""
+        self.authenticate_admin()
+        url = reverse('admin_bookings_list')
+        
+        response = self.client.get(url, {'page_size': '0'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
 class AdminCancelBookingTest(BaseAPITestCase):
@@ -384,3 +488,43 @@ class AdminCancelBookingTest(BaseAPITestCase):
         
         # Verify booking is deleted
         self.assertFalse(Booking.objects.filter(id=self.booking.id).exists())
+
+
+class ConcurrentTimeslotCreateTest(TransactionTestCase):
+    """Test overlapping slots created at the same time by two admins"""
+    
+    def test_only_one_overlapping_slot_created(self):
+        """Test the exclusion constraint rejects the second of two concurrent inserts"""
+        admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        category = Category.objects.create(name='Cat 1')
+        start_time = timezone.now() + timedelta(days=1)
+        barrier = threading.Barrier(2)
+        results = []
+        
+        def create(offset):
+            try:
+                with transaction.atomic():
+                    barrier.wait()
+                    TimeSlot(
+                        category=category,
+                        start_time=start_time + offset,
+                        end_time=start_time + offset + timedelta(hours=1),
+                        created_by=admin
+                    ).save()
+                results.append('created')
+            except ValidationError as e:
+                results.append(e.code)
+            finally:
+                connection.close()
+        
+        threads = [
+            threading.Thread(target=create, args=(timedelta(minutes=minutes),))
+            for minutes in (0, 30)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(sorted(results), ['created', 'overlap'])
+        self.assertEqual(TimeSlot.objects.count(), 1)
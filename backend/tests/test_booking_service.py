@@ -0,0 +1,235 @@
+"""
+Unit tests for the booking service
+Covers the booking rules, the statement counts and concurrent bookings
+"""
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import BooleanField, Value
+from django.db.models.signals import post_delete
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from .base import BaseAPITestCase
+from bookings.models import Booking
+from bookings.services import book_time_slot, cancel_booking, BookingError, BookingConflict
+from bookings.websocket_utils import booking_cancelled_data
+from events.models import Category, TimeSlot
+
+
+class BookTimeSlotTest(BaseAPITestCase):
+    """Test book_time_slot rules and statements"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_user = User.objects.create_user(username='otheruser', password='testpass123')
+
+    def assertBookingError(self, message, time_slot_id, user=None):
+        with self.assertRaises(BookingError) as context:
+            book_time_slot(user or self.regular_user, time_slot_id)
+        self.assertEqual(context.exception.message, message)
+        self.assertEqual(context.exception.status_code, 400)
+
+    def test_books_slot(self):
+        booking = book_time_slot(self.regular_user, self.timeslot1.id)
+
+        self.assertEqual(booking.user, self.regular_user)
+        self.assertEqual(Booking.objects.get(time_slot=self.timeslot1).id, booking.id)
+
+    def test_fixed_statements(self):
+        """Test savepoint, lock, check query, insert, change event and release"""
+        with self.assertNumQueries(6):
+            booking = book_time_slot(self.regular_user, self.timeslot1.id)
+
+        # The response serializer needs no further queries
+        with self.assertNumQueries(0):
+            self.assertTrue(hasattr(booking.time_slot, 'booking'))
+            self.assertEqual(booking.time_slot.category.name, self.category1.name)
+
+    def test_rules(self):
+        """Test the messages match Booking.can_book_slot"""
+        self.assertBookingError('Invalid pk "99999" - object does not exist.', 99999)
+
+        Booking.objects.create(user=self.other_user, time_slot=self.timeslot2)
+        self.assertBookingError("Time slot is already booked", self.timeslot2.id)
+
+        overlapping = TimeSlot.objects.create(
+            start_time=self.timeslot2.start_time + timedelta(minutes=30),
+            end_time=self.timeslot2.end_time + timedelta(minutes=30),
+            category=self.category3,
+            created_by=self.admin_user
+        )
+        self.assertBookingError("You already have a booking at this time", overlapping.id, self.other_user)
+
+        TimeSlot.objects.filter(id=self.timeslot1.id).update(
+            start_time=timezone.now() - timedelta(hours=2),
+            end_time=timezone.now() - timedelta(hours=1)
+        )
+        self.assertBookingError("Time slot is in the past", self.timeslot1.id)
+
+    def test_lost_race_is_conflict(self):
+        """Test a unique violation on insert is reported as a conflict"""
+        Booking.objects.create(user=self.other_user, time_slot=self.timeslot1)
+
+        # Let the check miss the existing booking as if it was committed just after it
+        with patch('bookings.services.Exists', return_value=Value(False, output_field=BooleanField())):
+            with self.assertRaises(BookingConflict) as context:
+                book_time_slot(self.regular_user, self.timeslot1.id)
+
+        self.assertEqual(context.exception.status_code, 409)
+        self.assertEqual(Booking.objects.filter(time_slot=self.timeslot1).count(), 1)
+
+    def test_conflict_response(self):
+        """Test the endpoint returns 409 with the time_slot error"""
+        Booking.objects.create(user=self.other_user, time_slot=self.timeslot1)
+        self.authenticate_user()
+
+        with patch('bookings.services.Exists', return_value=Value(False, output_field=BooleanField())):
+            response = self.client.post(reverse('user_create_booking'), {'time_slot': self.timeslot1.id})
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data, {'time_slot': ['Time slot is already booked']})
+
+
+class CancelBookingServiceTest(BaseAPITestCase):
+    """Test cancel_booking statements, rules and event data"""
+
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+
+    def test_two_statements(self):
+        """Test one joined read, one DELETE and the change event, including signal receivers"""
+        deleted = []
+
+        def receiver(sender, instance, **kwargs):
+            deleted.append((instance.id, instance.user.username, str(instance.time_slot)))
+
+        post_delete.connect(receiver, sender=Booking)
+        try:
+            with self.assertNumQueries(3):
+                booking = cancel_booking(self.booking.id, user=self.regular_user)
+        finally:
+            post_delete.disconnect(receiver, sender=Booking)
+
+        # The event payload is built from the loaded row
+        with self.assertNumQueries(0):
+            data = booking_cancelled_data(booking)
+
+        self.assertFalse(Booking.objects.filter(id=self.booking.id).exists())
+        self.assertEqual(deleted, [(self.booking.id, self.regular_user.username, str(self.timeslot1))])
+        self.assertEqual(data, {
+            'id': self.booking.id,
+            'timeslot_id': self.timeslot1.id,
+            'user': {'id': self.regular_user.id, 'username': self.regular_user.username},
+            'timeslot': {
+                'id': self.timeslot1.id,
+                'date': self.timeslot1.start_time.date().isoformat(),
+                'start_time': self.timeslot1.start_time.strftime('%H:%M'),
+                'end_time': self.timeslot1.end_time.strftime('%H:%M'),
+                'category': self.category1.name,
+            },
+        })
+
+    def test_rules(self):
+        """Test ownership and the past booking rule"""
+        other_user = User.objects.create_user(username='otheruser', password='testpass123')
+        with self.assertRaises(Booking.DoesNotExist):
+            cancel_booking(self.booking.id, user=other_user)
+
+        TimeSlot.objects.filter(id=self.timeslot1.id).update(
+            start_time=timezone.now() - timedelta(hours=2),
+            end_time=timezone.now() - timedelta(hours=1)
+        )
+        with self.assertRaises(BookingError) as context:
+            cancel_booking(self.booking.id, user=self.regular_user)
+        self.assertEqual(context.exception.message, "Cannot cancel past bookings")
+
+        cancel_booking(self.booking.id, allow_past=True)
+        self.assertFalse(Booking.objects.filter(id=self.booking.id).exists())
+        with self.assertRaises(Booking.DoesNotExist):
+            cancel_booking(self.booking.id, allow_past=True)
+
+    def test_endpoints_touch_bookings_twice(self):
+        """Test both cancel endpoints run only the read and the DELETE on bookings"""
+        second = Booking.objects.create(user=self.regular_user, time_slot=self.timeslot2)
+        requests = [
+            (self.authenticate_user, reverse('user_cancel_booking', kwargs={'booking_id': self.booking.id})),
+            (self.authenticate_admin, reverse('admin_cancel_booking', kwargs={'booking_id': second.id})),
+        ]
+        for authenticate, url in requests:
+            authenticate()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.delete(url)
+            self.assertIn(response.status_code, (status.HTTP_200_OK, status.HTTP_204_NO_CONTENT))
+            booking_queries = [q['sql'] for q in queries if '"bookings_booking"' in q['sql']]
+            self.assertEqual(len(booking_queries), 2, booking_queries)
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    """Test bookings made at the same time from several threads"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.categories = [Category.objects.create(name=name) for name, _ in Category.CATEGORY_CHOICES]
+        self.start_time = timezone.now() + timedelta(days=1)
+
+    def create_slot(self, category, offset=timedelta(0)):
+        return TimeSlot.objects.create(
+            category=category,
+            start_time=self.start_time + offset,
+            end_time=self.start_time + offset + timedelta(hours=1),
+            created_by=self.admin
+        )
+
+    def run_concurrently(self, attempts):
+        """Run (user, time_slot_id) attempts at once, returns the status of each"""
+        barrier = threading.Barrier(len(attempts))
+        results = []
+
+        def attempt(user, time_slot_id):
+            try:
+                barrier.wait()
+                book_time_slot(user, time_slot_id)
+                results.append(201)
+            except BookingError as e:
+                results.append(e.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=args) for args in attempts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_one_booking_per_slot(self):
+        """Test many users racing for one slot"""
+        slot = self.create_slot(self.categories[0])
+        users = [User.objects.create_user(username=f'user{i}') for i in range(8)]
+
+        results = self.run_concurrently([(user, slot.id) for user in users])
+
+        self.assertEqual(results.count(201), 1)
+        self.assertTrue(set(results) <= {201, 400, 409})
+        self.assertEqual(Booking.objects.filter(time_slot=slot).count(), 1)
+
+    def test_no_overlapping_bookings_per_user(self):
+        """Test one user booking overlapping slots of different categories at once"""
+        user = User.objects.create_user(username='user')
+        slots = [
+            self.create_slot(category, timedelta(minutes=15 * i))
+            for i, category in enumerate(self.categories)
+        ]
+
+        results = self.run_concurrently([(user, slot.id) for slot in slots])
+
+        self.assertEqual(sorted(results), [201, 400, 400])
+        self.assertEqual(Booking.objects.filter(user=user).count(), 1)
@@ -0,0 +1,173 @@
+"""
+Unit tests for the delta-sync endpoint
+GET /api/timeslots/changes/ returns the slots changed after a version of the
+change log, with ids of deleted slots
+"""
+from unittest.mock import patch
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from .base import BaseAPITestCase
+from .test_outbox import RecordingLayer
+from bookings.models import Booking
+from bookings.outbox import relay_batch
+from events.models import TimeSlot
+
+
+class TimeslotChangesTest(BaseAPITestCase):
+    """Test GET /api/timeslots/changes/"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('user_timeslot_changes')
+        self.authenticate_user()
+
+    def relay(self):
+        with patch('bookings.outbox.get_channel_layer', return_value=RecordingLayer()):
+            relay_batch()
+
+    def changes(self, since, **params):
+        return self.client.get(self.url, {'since': since, **params})
+
+    def book(self, time_slot):
+        response = self.client.post(reverse('user_create_booking'), {'time_slot': time_slot.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        response = self.changes(0)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_since(self):
+        for since in ('', 'abc', '-1'):
+            response = self.changes(since)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_no_changes(self):
+        response = self.changes(0)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'version': 0, 'timeslots': [], 'deleted': []})
+
+    def test_booked_and_cancelled(self):
+        booking_id = self.book(self.timeslot1)
+        self.relay()
+
+        response = self.changes(0)
+        self.assertEqual(response.data['version'], 1)
+        self.assertEqual([slot['id'] for slot in response.data['timeslots']], [self.timeslot1.id])
+        self.assertTrue(response.data['timeslots'][0]['is_booked'])
+
+        self.client.delete(reverse('user_cancel_booking', kwargs={'booking_id': booking_id}))
+        self.relay()
+
+        response = self.changes(1)
+        self.assertEqual(response.data['version'], 2)
+        self.assertFalse(response.data['timeslots'][0]['is_booked'])
+        self.assertEqual(self.changes(2).data['timeslots'], [])
+
+    def test_deleted_slot_is_a_tombstone(self):
+        self.authenticate_admin()
+        self.client.delete(reverse('admin_timeslot_detail', kwargs={'timeslot_id': self.timeslot2.id}))
+        self.relay()
+
+        self.authenticate_user()
+        response = self.changes(0)
+        self.assertEqual(response.data['timeslots'], [])
+        self.assertEqual(response.data['deleted'], [self.timeslot2.id])
+
+    def test_cascade_deleted_slot_is_a_tombstone(self):
+        timeslot_id = self.timeslot2.id
+        self.category2.delete()
+        self.relay()
+
+        response = self.changes(0)
+        self.assertEqual(response.data['deleted'], [timeslot_id])
+
+    def test_full_load_version(self):
+        """Test the full list tells which version it corresponds to"""
+        self.book(self.timeslot1)
+        self.relay()
+        response = self.client.get(reverse('user_timeslots'))
+        self.assertEqual(response['X-Calendar-Version'], '1')
+
+        self.client.delete(reverse('user_cancel_booking', kwargs={'booking_id': self.book(self.timeslot2)}))
+        self.relay()
+        response = self.changes(response['X-Calendar-Version'])
+        self.assertEqual(response.data['version'], 3)
+        self.assertEqual([slot['id'] for slot in response.data['timeslots']], [self.timeslot2.id])
+
+    def test_window_and_categories(self):
+        self.book(self.timeslot1)
+        Booking.objects.create(user=self.admin_user, time_slot=self.timeslot2)
+        self.authenticate_admin()
+        start_time = self.timeslot1.start_time + timezone.timedelta(days=14)
+        self.client.post(reverse('admin_timeslots_list_create'), {
+            'category': self.category1.id,
+            'start_time': start_time.isoformat(),
+            'end_time': (start_time + timezone.timedelta(hours=1)).isoformat(),
+        })
+        self.relay()
+
+        self.authenticate_user()
+        day = self.timeslot1.start_time.date().isoformat()
+        response = self.changes(0, start_date=day, end_date=day, categories='Cat 1')
+        self.assertEqual([slot['id'] for slot in response.data['timeslots']], [self.timeslot1.id])
+        self.assertEqual(response.data['deleted'], [])
+
+    def test_slot_moved_out_of_window(self):
+        self.authenticate_admin()
+        start_time = self.timeslot2.start_time + timezone.timedelta(days=14)
+        response = self.client.put(
+            reverse('admin_timeslot_detail', kwargs={'timeslot_id': self.timeslot2.id}),
+            {
+                'category': self.category2.id,
+                'start_time': start_time.isoformat(),
+                'end_time': (start_time + timezone.timedelta(hours=1)).isoformat(),
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.relay()
+
+        self.authenticate_user()
+        day = self.timeslot1.start_time.date().isoformat()
+        response = self.changes(0, start_date=day, end_date=day)
+        self.assertEqual(response.data['deleted'], [self.timeslot2.id])
+
+    def test_own_booking_changes_overlapping_slots(self):
+        """Test a booking returns the overlapping slots whose can_book changed"""
+        overlapping = TimeSlot.objects.create(
+            start_time=self.timeslot1.start_time,
+            end_time=self.timeslot1.end_time,
+            category=self.category2,
+            created_by=self.admin_user
+        )
+        # Version 1 is the creation of the overlapping slot
+        self.book(self.timeslot1)
+        self.relay()
+
+        response = self.changes(1)
+        slots = {slot['id']: slot for slot in response.data['timeslots']}
+        self.assertEqual(set(slots), {self.timeslot1.id, overlapping.id})
+        self.assertFalse(slots[overlapping.id]['can_book'])
+
+        # Another user's booking does not change can_book of the others
+        self.authenticate_admin()
+        response = self.changes(1)
+        self.assertEqual([slot['id'] for slot in response.data['timeslots']], [self.timeslot1.id])
+
+    @override_settings(EVENT_REPLAY_SIZE=1)
+    def test_trimmed_version_is_gone(self):
+        self.book(self.timeslot1)
+        self.book(self.timeslot2)
+        self.relay()
+
+        response = self.changes(0)
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(self.changes(1).status_code, status.HTTP_200_OK)
+        # Ahead of the log, e.g. after the database was reset
+        self.assertEqual(self.changes(3).status_code, status.HTTP_410_GONE)
@@ -0,0 +1,187 @@
+"""
+Unit tests for per-day digest reconciliation
+Clients send a digest per (day, category) bucket and get back the slots of the
+buckets that differ, over REST and over the WebSocket
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from .base import BaseAPITestCase
+from .test_websocket_groups import UNBATCHED
+from bookings.consumers import CalendarConsumer
+from bookings.models import Booking
+from events.models import Category, TimeSlot
+from events.time_windows import TimeWindow
+from users.digests import EMPTY_DIGEST, bucket_digests, bucket_key, digest_slots
+
+
+class DigestTest(BaseAPITestCase):
+    """Test the aggregate digests match the documented client computation"""
+
+    def setUp(self):
+        super().setUp()
+        self.day = self.timeslot1.start_time.date()
+        self.window = TimeWindow(
+            TimeWindow.day_start(self.day, dt_timezone.utc),
+            TimeWindow.day_start(self.day + timedelta(days=1), dt_timezone.utc)
+        )
+        self.authenticate_user()
+
+    def client_digests(self):
+        """Digests a client computes from GET /api/timeslots/"""
+        response = self.client.get(reverse('user_timeslots'), {'date': self.day.isoformat(), 'tz': 'UTC'})
+        buckets = {}
+        for slot in response.data:
+            buckets.setdefault(bucket_key(self.day, slot['category']), []).append(slot)
+        return {key: digest_slots(slots) for key, slots in buckets.items()}
+
+    def test_matches_client_digest(self):
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+        TimeSlot.objects.create(
+            start_time=self.timeslot1.start_time - timedelta(hours=2),
+            end_time=self.timeslot1.start_time - timedelta(hours=1),
+            category=self.category1,
+            created_by=self.admin_user
+        )
+        server = bucket_digests(self.window, dt_timezone.utc)
+
+        self.assertEqual(set(server), {
+            bucket_key(self.day, self.category1.id), bucket_key(self.day, self.category2.id)
+        })
+        self.assertEqual(server, self.client_digests())
+
+    def test_fractional_seconds(self):
+        """Test times with fractions of a second digest like their truncated client values"""
+        TimeSlot.objects.create(
+            start_time=self.timeslot1.start_time - timedelta(hours=2, microseconds=-700000),
+            end_time=self.timeslot1.start_time - timedelta(hours=1, microseconds=-500000),
+            category=self.category1,
+            created_by=self.admin_user
+        )
+        self.assertEqual(bucket_digests(self.window, dt_timezone.utc), self.client_digests())
+
+    def test_digest_changes_with_booking(self):
+        before = bucket_digests(self.window, dt_timezone.utc)
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot2)
+        after = bucket_digests(self.window, dt_timezone.utc)
+
+        key = bucket_key(self.day, self.category2.id)
+        self.assertNotEqual(before[key], after[key])
+        self.assertEqual(after[bucket_key(self.day, self.category1.id)],
+                         before[bucket_key(self.day, self.category1.id)])
+
+    def test_days_in_timezone(self):
+        """Test buckets are days of the requested timezone"""
+        tz = TimeWindow.parse_timezone('Asia/Tokyo')
+        window = TimeWindow(
+            TimeWindow.day_start(self.day, tz), TimeWindow.day_start(self.day + timedelta(days=2), tz)
+        )
+        # 10:00 and 12:00 UTC are 19:00 and 21:00 in Tokyo
+        self.assertEqual(set(bucket_digests(window, tz)), {
+            bucket_key(self.day, self.category1.id), bucket_key(self.day, self.category2.id)
+        })
+
+
+class ReconcileEndpointTest(BaseAPITestCase):
+    """Test POST /api/timeslots/reconcile/"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('user_timeslots_reconcile')
+        self.day = self.timeslot1.start_time.date().isoformat()
+        self.authenticate_user()
+
+    def reconcile(self, digests, **params):
+        data = {'start_date': self.day, 'end_date': self.day, 'tz': 'UTC', 'digests': digests, **params}
+        return self.client.post(self.url, data, format='json')
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        self.assertEqual(self.reconcile({}).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_empty_client_gets_every_bucket(self):
+        response = self.reconcile({})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        buckets = response.data['buckets']
+        self.assertEqual([(bucket['category'], [slot['id'] for slot in bucket['timeslots']]) for bucket in buckets], [
+            (self.category1.id, [self.timeslot1.id]),
+            (self.category2.id, [self.timeslot2.id]),
+        ])
+        self.assertTrue(buckets[0]['timeslots'][0]['can_book'])
+
+        # Sending the returned digests back means nothing differs
+        digests = {f"{bucket['date']}/{bucket['category']}": bucket['digest'] for bucket in buckets}
+        self.assertEqual(self.reconcile(digests).data['buckets'], [])
+
+    def test_only_stale_buckets(self):
+        digests = {
+            f"{bucket['date']}/{bucket['category']}": bucket['digest']
+            for bucket in self.reconcile({}).data['buckets']
+        }
+        Booking.objects.create(user=self.admin_user, time_slot=self.timeslot2)
+        self.timeslot1.delete()
+
+        buckets = self.reconcile(digests).data['buckets']
+        self.assertEqual([(bucket['category'], len(bucket['timeslots'])) for bucket in buckets], [
+            (self.category1.id, 0),
+            (self.category2.id, 1),
+        ])
+        self.assertEqual(buckets[0]['digest'], EMPTY_DIGEST)
+        self.assertTrue(buckets[1]['timeslots'][0]['is_booked'])
+
+    def test_categories_filter(self):
+        buckets = self.reconcile({}, categories=['Cat 2']).data['buckets']
+        self.assertEqual([bucket['category'] for bucket in buckets], [self.category2.id])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.reconcile({'yesterday': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.reconcile([]).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {'digests': {}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.reconcile({}, start_date='2025-01-01', end_date='2025-12-31')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(**UNBATCHED)
+class ReconcileMessageTest(TransactionTestCase):
+    """Test the reconcile WebSocket message"""
+
+    def setUp(self):
+        self.regular_user = User.objects.create_user(username='testuser', password='testpass123')
+        self.category = Category.objects.create(name='Cat 1')
+        start_time = timezone.now() + timedelta(days=1)
+        self.timeslot = TimeSlot.objects.create(
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=1),
+            category=self.category,
+            created_by=self.regular_user
+        )
+        self.day = timezone.localtime(start_time).date().isoformat()
+
+    async def test_reconcile(self):
+        client = WebsocketCommunicator(CalendarConsumer.as_asgi(), '/ws/calendar/')
+        client.scope['user'] = self.regular_user
+        await client.connect()
+
+        await client.send_json_to({'type': 'reconcile', 'start_date': self.day, 'categories': ['Cat 1'], 'digests': {}})
+        frame = await client.receive_json_from()
+        self.assertEqual(frame['type'], 'reconcile')
+        bucket, = frame['data']['buckets']
+        self.assertEqual([slot['id'] for slot in bucket['timeslots']], [self.timeslot.id])
+
+        await client.send_json_to({
+            'type': 'reconcile', 'start_date': self.day,
+            'digests': {f"{self.day}/{self.category.id}": bucket['digest']}
+        })
+        self.assertEqual(await client.receive_json_from(), {'type': 'reconcile', 'data': {'buckets': []}})
+
+        await client.send_json_to({'type': 'reconcile', 'digests': {}})
+        frame = await client.receive_json_from()
+        self.assertEqual(frame['type'], 'error')
+        await client.disconnect()
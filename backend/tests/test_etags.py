@@ -0,0 +1,99 @@
+"""
+Unit tests for conditional GET on calendar endpoints
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from .base import BaseAPITestCase
+from bookings.models import Booking
+from events.models import TimeSlot
+
+
+class CalendarETagTest(BaseAPITestCase):
+    """Test ETag / If-None-Match on timeslots and user bookings"""
+
+    def test_timeslots_returns_etag(self):
+        """Test list response carries an ETag"""
+        self.authenticate_user()
+
+        response = self.client.get(reverse('user_timeslots'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_matching_etag_returns_304_without_data_queries(self):
+        """Test unchanged data is answered with 304 before touching slots or bookings"""
+        self.authenticate_user()
+        url = reverse('user_timeslots')
+        etag = self.client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        for query in queries:
+            self.assertNotIn('events_timeslot', query['sql'])
+            self.assertNotIn('bookings_booking', query['sql'])
+
+    def test_write_changes_etag(self):
+        """Test a booking write invalidates the previous ETag"""
+        self.authenticate_user()
+        url = reverse('user_bookings_list')
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_timeslot_delete_changes_etag(self):
+        """Test deleting a time slot outside the API still changes the ETag"""
+        self.authenticate_user()
+        url = reverse('user_timeslots')
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TimeSlot.objects.get(id=self.timeslot2.id).delete()
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_etag_is_per_user(self):
+        """Test another user's ETag does not match"""
+        self.authenticate_user()
+        url = reverse('user_timeslots')
+        etag = self.client.get(url)['ETag']
+
+        other_user = User.objects.create_user(username='otheruser', password='testpass123')
+        self.authenticate_user(other_user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_slot_start_changes_etag(self):
+        """Test the ETag changes once a slot starts, since can_book flips without a write"""
+        self.authenticate_user()
+        url = reverse('user_timeslots')
+        response = self.client.get(url)
+        etag = response['ETag']
+        slot = next(row for row in response.data if row['id'] == self.timeslot1.id)
+        self.assertTrue(slot['can_book'])
+
+        with patch('django.utils.timezone.now', return_value=self.timeslot1.start_time):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with patch('django.utils.timezone.now', return_value=self.timeslot1.start_time + timedelta(seconds=1)):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        slot = next(row for row in response.data if row['id'] == self.timeslot1.id)
+        self.assertFalse(slot['can_book'])
@@ -0,0 +1,119 @@
+"""
+Unit tests for fast-path list serialization
+The fast path must render to the same JSON bytes as the ModelSerializers
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+
+from .base import BaseAPITestCase
+from bookings.availability import BusyIntervals
+from bookings.models import Booking
+from events.models import TimeSlot
+from users.fast_serializers import (
+    timeslot_values, serialize_timeslots,
+    admin_timeslot_values, serialize_admin_timeslots,
+    user_booking_values, serialize_user_bookings,
+    admin_booking_values, serialize_admin_bookings,
+)
+from users.serializers import (
+    TimeSlotSerializer, AdminTimeSlotSerializer, UserBookingSerializer, AdminBookingSerializer
+)
+
+
+class FastSerializersTest(BaseAPITestCase):
+    """Test fast serializers against the ModelSerializers"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_user = User.objects.create_user(
+            username='otheruser', email='other@example.com', password='testpass123'
+        )
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+        Booking.objects.create(user=self.other_user, time_slot=self.timeslot2)
+        # A past booked slot and an unbooked overlapping slot
+        past_slot = TimeSlot.objects.create(
+            start_time=timezone.now() + timedelta(days=3),
+            end_time=timezone.now() + timedelta(days=3, hours=1),
+            category=self.category3,
+            created_by=self.admin_user
+        )
+        Booking.objects.create(user=self.regular_user, time_slot=past_slot)
+        TimeSlot.objects.filter(id=past_slot.id).update(
+            start_time=timezone.now() - timedelta(days=1, hours=1),
+            end_time=timezone.now() - timedelta(days=1)
+        )
+        TimeSlot.objects.create(
+            start_time=self.timeslot1.start_time + timedelta(minutes=30),
+            end_time=self.timeslot1.end_time + timedelta(minutes=30),
+            category=self.category3,
+            created_by=self.admin_user
+        )
+        self.renderer = JSONRenderer()
+
+    def assertSameJSON(self, fast_data, reference_data):
+        self.assertEqual(self.renderer.render(fast_data), self.renderer.render(reference_data))
+
+    def test_timeslots(self):
+        """Test TimeSlotSerializer equivalence including can_book"""
+        request = Request(APIRequestFactory().get('/'))
+        request.user = self.other_user
+        queryset = TimeSlot.objects.order_by('start_time', 'id')
+        slots = list(queryset)
+        busy_intervals = BusyIntervals.for_slots(self.other_user, slots)
+
+        reference = TimeSlotSerializer(
+            slots, many=True, context={'request': request, 'busy_intervals': busy_intervals}
+        ).data
+        fast = serialize_timeslots(list(timeslot_values(queryset)), busy_intervals)
+
+        self.assertSameJSON(fast, reference)
+        self.assertTrue(any(slot['can_book'] for slot in fast))
+
+    def test_admin_timeslots(self):
+        """Test AdminTimeSlotSerializer equivalence"""
+        queryset = TimeSlot.objects.order_by('start_time', 'id')
+
+        reference = AdminTimeSlotSerializer(queryset, many=True).data
+        fast = serialize_admin_timeslots(admin_timeslot_values(queryset))
+
+        self.assertSameJSON(fast, reference)
+
+    def test_user_bookings(self):
+        """Test UserBookingSerializer equivalence"""
+        queryset = Booking.objects.filter(user=self.regular_user).order_by('-booked_at')
+
+        reference = UserBookingSerializer(queryset, many=True).data
+        fast = serialize_user_bookings(user_booking_values(queryset))
+
+        self.assertSameJSON(fast, reference)
+
+    def test_admin_bookings(self):
+        """Test AdminBookingSerializer equivalence"""
+        queryset = Booking.objects.order_by('-booked_at')
+
+        reference = AdminBookingSerializer(queryset, many=True).data
+        fast = serialize_admin_bookings(admin_booking_values(queryset))
+
+        self.assertSameJSON(fast, reference)
+
+    def test_endpoints_match_serializer_path(self):
+        """Test list endpoints return the same bytes with the fast path switched off"""
+        self.authenticate_admin()
+        urls = [
+            reverse('user_timeslots'),
+            reverse('user_bookings_list'),
+            reverse('admin_timeslots_list_create'),
+            reverse('admin_bookings_list'),
+        ]
+        for url in urls:
+            fast = self.client.get(url).content
+            with override_settings(FAST_LIST_SERIALIZERS=False):
+                reference = self.client.get(url).content
+            self.assertEqual(fast, reference, url)
@@ -0,0 +1,299 @@
+"""
+Unit tests for the calendar change log (transactional outbox)
+Changes record their events in their own transaction, the relay numbers and
+publishes them in log order and keeps the last ones for replay
+"""
+import json
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from .base import BaseAPITestCase
+from bookings.models import Booking, ChangeEvent
+from bookings.groups import iso_week
+from bookings.outbox import (
+    RELAY_LOCK_NAMESPACE, relay_batch, replay_events, run_relay, take_over, wait_for_events
+)
+from bookings.websocket_utils import send_timeslot_created_event
+from events.models import Category, TimeSlot
+
+
+class RecordingLayer:
+    """Channel layer double that records group_send calls"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+        self.sequences = []
+
+    async def group_send(self, group, message):
+        if self.fail:
+            raise ConnectionError
+        self.sent.append((group, message['type'], message['slot_id']))
+        self.sequences.append((group, message['type'], message['seq']))
+
+
+class ChangeLogTest(BaseAPITestCase):
+    """Test every change of the calendar records its event"""
+
+    def events(self):
+        return list(ChangeEvent.objects.values_list('event_type', 'slot_id'))
+
+    def test_booking_lifecycle(self):
+        self.authenticate_user()
+        response = self.client.post(reverse('user_create_booking'), {'time_slot': self.timeslot1.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.delete(reverse('user_cancel_booking', kwargs={'booking_id': response.data['id']}))
+
+        self.assertEqual(self.events(), [
+            ('booking_created', self.timeslot1.id),
+            ('booking_cancelled', self.timeslot1.id),
+        ])
+        event = ChangeEvent.objects.first()
+        self.assertEqual(event.category_id, self.category1.id)
+        self.assertEqual(event.slot_start, self.timeslot1.start_time)
+        self.assertEqual(event.data['user']['id'], self.regular_user.id)
+        self.assertIsNone(event.published_at)
+
+    def test_admin_changes(self):
+        self.authenticate_admin()
+        start_time = self.timeslot1.start_time + timezone.timedelta(days=3)
+        response = self.client.post(reverse('admin_timeslots_list_create'), {
+            'category': self.category1.id,
+            'start_time': start_time.isoformat(),
+            'end_time': (start_time + timezone.timedelta(hours=1)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created_id = response.data['id']
+        url = reverse('admin_timeslot_detail', kwargs={'timeslot_id': created_id})
+        response = self.client.put(url, {
+            'category': self.category1.id,
+            'start_time': start_time.isoformat(),
+            'end_time': (start_time + timezone.timedelta(hours=2)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.delete(url)
+
+        booking = Booking.objects.create(user=self.regular_user, time_slot=self.timeslot2)
+        self.client.delete(reverse('admin_cancel_booking', kwargs={'booking_id': booking.id}))
+
+        self.assertEqual(self.events(), [
+            ('timeslot_created', created_id),
+            ('timeslot_updated', created_id),
+            ('timeslot_deleted', created_id),
+            ('booking_created', self.timeslot2.id),
+            ('booking_cancelled', self.timeslot2.id),
+        ])
+
+    def test_orm_and_cascade_changes(self):
+        """Test changes made outside the API views, cascades included, record their events"""
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+        category_id = self.category2.id
+        self.regular_user.delete()
+        self.category2.delete()
+
+        self.assertEqual(self.events(), [
+            ('booking_created', self.timeslot1.id),
+            ('booking_cancelled', self.timeslot1.id),
+            ('timeslot_deleted', self.timeslot2.id),
+        ])
+        event = ChangeEvent.objects.last()
+        self.assertEqual((event.category_id, event.data['category']), (category_id, 'Cat 2'))
+
+    def test_django_admin_changes(self):
+        """Test a slot moved and deleted in the Django admin records its events"""
+        self.client.force_login(self.admin_user)
+        start_time = timezone.localtime(self.timeslot1.start_time + timezone.timedelta(weeks=1))
+        end_time = start_time + timezone.timedelta(hours=1)
+        response = self.client.post(
+            reverse('admin:events_timeslot_change', args=[self.timeslot1.id]),
+            {
+                'category': self.category1.id,
+                'created_by': self.admin_user.id,
+                'start_time_0': start_time.date().isoformat(),
+                'start_time_1': start_time.strftime('%H:%M:%S'),
+                'end_time_0': end_time.date().isoformat(),
+                'end_time_1': end_time.strftime('%H:%M:%S'),
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        response = self.client.post(
+            reverse('admin:events_timeslot_delete', args=[self.timeslot2.id]), {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+        self.assertEqual(self.events(), [
+            ('timeslot_updated', self.timeslot1.id),
+            ('timeslot_deleted', self.timeslot2.id),
+        ])
+        event = ChangeEvent.objects.first()
+        self.assertEqual(event.slot_start, start_time)
+        self.assertEqual(event.previous_slot_start, self.timeslot1.start_time)
+
+    def test_failed_change_records_nothing(self):
+        """Test a rejected booking and a rolled back change leave no event"""
+        Booking.objects.create(user=self.admin_user, time_slot=self.timeslot1)
+        ChangeEvent.objects.all().delete()
+        self.authenticate_user()
+        response = self.client.post(reverse('user_create_booking'), {'time_slot': self.timeslot1.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                send_timeslot_created_event(self.timeslot2)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        self.assertEqual(self.events(), [])
+
+
+class RelayTest(BaseAPITestCase):
+    """Test the relay publishes pending events in order"""
+
+    def setUp(self):
+        super().setUp()
+        for time_slot in (self.timeslot2, self.timeslot1, self.timeslot2):
+            send_timeslot_created_event(time_slot)
+
+    def relay(self, layer, batch_size=100):
+        with patch('bookings.outbox.get_channel_layer', return_value=layer):
+            return relay_batch(batch_size)
+
+    def test_publishes_in_order(self):
+        layer = RecordingLayer()
+        self.assertEqual(self.relay(layer, batch_size=2), 2)
+        self.assertEqual(self.relay(layer, batch_size=2), 1)
+        self.assertEqual(self.relay(layer), 0)
+
+        # Each event goes to its partition and the legacy group
+        published = [slot_id for _, _, slot_id in layer.sent[::2]]
+        self.assertEqual(published, [self.timeslot2.id, self.timeslot1.id, self.timeslot2.id])
+        self.assertFalse(ChangeEvent.objects.filter(published_at__isnull=True).exists())
+
+    def test_failed_publish_is_retried(self):
+        with self.assertRaises(ConnectionError):
+            self.relay(RecordingLayer(fail=True))
+        self.assertEqual(ChangeEvent.objects.filter(published_at__isnull=True).count(), 3)
+
+        layer = RecordingLayer()
+        self.assertEqual(self.relay(layer), 3)
+        self.assertEqual(len(layer.sent), 6)
+
+    def test_sequences(self):
+        """Test events are numbered without gaps in publish order and keep numbers on retry"""
+        with self.assertRaises(ConnectionError):
+            self.relay(RecordingLayer(fail=True), batch_size=2)
+        send_timeslot_created_event(self.timeslot1)
+
+        layer = RecordingLayer()
+        self.relay(layer, batch_size=2)
+        self.relay(layer)
+
+        sequences = list(ChangeEvent.objects.order_by('id').values_list('sequence', flat=True))
+        self.assertEqual(sequences, [1, 2, 3, 4])
+        self.assertEqual([seq for _, _, seq in layer.sequences[::2]], [1, 2, 3, 4])
+
+    def test_replay(self):
+        self.relay(RecordingLayer())
+        year, week = iso_week(self.timeslot1.start_time)
+
+        frames, last = replay_events(1)
+        self.assertEqual(last, 3)
+        self.assertEqual([json.loads(frame)['seq'] for frame in frames], [2, 3])
+
+        frames, _ = replay_events(0, {(self.category1.id, year, week)})
+        self.assertEqual([json.loads(frame)['data']['id'] for frame in frames], [self.timeslot1.id])
+
+        self.assertEqual(replay_events(3), ([], 3))
+        # Ahead of the stream, e.g. after the database was reset
+        self.assertEqual(replay_events(4), (None, 3))
+
+    @override_settings(EVENT_REPLAY_SIZE=2)
+    def test_replay_buffer_is_trimmed(self):
+        self.relay(RecordingLayer())
+
+        self.assertEqual(list(ChangeEvent.objects.values_list('sequence', flat=True)), [2, 3])
+        self.assertEqual(replay_events(0), (None, 3))
+        frames, _ = replay_events(1)
+        self.assertEqual(len(frames), 2)
+
+    def test_once_command(self):
+        out = StringIO()
+        with patch('bookings.outbox.get_channel_layer', return_value=RecordingLayer()):
+            call_command('relay_events', '--once', '--batch-size', '2', stdout=out)
+        self.assertIn('Published 3 events', out.getvalue())
+
+    def test_once_command_skips_while_relay_runs(self):
+        """Test --once publishes nothing while another connection holds the relay lock"""
+        other = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            with other.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_lock(%s, 0)', [RELAY_LOCK_NAMESPACE])
+            out = StringIO()
+            layer = RecordingLayer()
+            with patch('bookings.outbox.get_channel_layer', return_value=layer):
+                call_command('relay_events', '--once', stdout=out)
+        finally:
+            other.close()
+
+        self.assertIn('Another relay is running', out.getvalue())
+        self.assertEqual(layer.sent, [])
+        self.assertFalse(ChangeEvent.objects.filter(sequence__isnull=False).exists())
+
+
+class RelayNotifyTest(TransactionTestCase):
+    """Test the relay wakes up on NOTIFY from committed events"""
+
+    def setUp(self):
+        admin_user = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        start_time = timezone.now() + timezone.timedelta(days=1)
+        self.timeslot = TimeSlot.objects.create(
+            start_time=start_time,
+            end_time=start_time + timezone.timedelta(hours=1),
+            category=Category.objects.create(name='Cat 1'),
+            created_by=admin_user
+        )
+        ChangeEvent.objects.all().delete()
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute('UNLISTEN *')
+            cursor.execute('SELECT pg_advisory_unlock_all()')
+
+    def insert_from_other_connection(self):
+        def insert():
+            try:
+                send_timeslot_created_event(self.timeslot)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=insert)
+        thread.start()
+        thread.join()
+
+    def test_notify_on_commit(self):
+        take_over()
+        self.assertFalse(wait_for_events(0.05))
+
+        self.insert_from_other_connection()
+        self.assertTrue(wait_for_events(1))
+
+    def test_run_relay(self):
+        layer = RecordingLayer()
+        self.insert_from_other_connection()
+        rounds = iter(range(2))
+
+        with patch('bookings.outbox.get_channel_layer', return_value=layer):
+            run_relay(interval=0.05, stop=lambda: next(rounds, None) is None)
+
+        self.assertEqual(len(layer.sent), 2)
+        self.assertFalse(ChangeEvent.objects.filter(published_at__isnull=True).exists())
@@ -0,0 +1,126 @@
+"""
+Unit tests for password hashing on the hashing executor
+Login and registration hash on a bounded pool and answer 503 when its queue
+is full
+"""
+import asyncio
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from .base import BaseAPITestCase
+from users.password_hashing import MODEL_BACKEND, HashingBusy, HashingExecutor
+
+
+class StaffOnlyBackend(ModelBackend):
+    """A backend authenticate_user() has no lookup for"""
+
+    def user_can_authenticate(self, user):
+        return super().user_can_authenticate(user) and user.is_staff
+
+
+class HashingLoginTest(BaseAPITestCase):
+    """Test login and registration through the async views"""
+
+    def login(self, username, password):
+        return self.client.post(
+            reverse('auth_login'), {'username': username, 'password': password}, format='json'
+        )
+
+    def test_login(self):
+        response = self.login('testuser', 'testpass123')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['user']['id'], self.regular_user.id)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.regular_user.id)
+
+    def test_login_case_insensitive(self):
+        # allauth's backend matches usernames case-insensitively
+        response = self.login('TestUser', 'testpass123')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.client.session['_auth_user_backend'], 'allauth.account.auth_backends.AuthenticationBackend'
+        )
+
+    @override_settings(AUTHENTICATION_BACKENDS=[MODEL_BACKEND])
+    def test_configured_backends(self):
+        self.assertEqual(self.login('TestUser', 'testpass123').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login('testuser', 'testpass123').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.session['_auth_user_backend'], MODEL_BACKEND)
+
+    @override_settings(AUTHENTICATION_BACKENDS=['tests.test_password_hashing.StaffOnlyBackend'])
+    def test_other_backend_falls_back(self):
+        with patch('users.password_hashing.get_executor') as get_executor:
+            self.assertEqual(self.login('testuser', 'testpass123').status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(self.login('admin', 'adminpass123').status_code, status.HTTP_200_OK)
+        get_executor.assert_not_called()
+        self.assertEqual(
+            self.client.session['_auth_user_backend'], 'tests.test_password_hashing.StaffOnlyBackend'
+        )
+
+    def test_inactive_user(self):
+        User.objects.filter(pk=self.regular_user.pk).update(is_active=False)
+        response = self.login('testuser', 'testpass123')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rehash_outdated_password(self):
+        encoded = PBKDF2PasswordHasher().encode('testpass123', 'somesalt', iterations=1000)
+        User.objects.filter(pk=self.regular_user.pk).update(password=encoded)
+
+        self.assertEqual(self.login('testuser', 'testpass123').status_code, status.HTTP_200_OK)
+        self.regular_user.refresh_from_db()
+        self.assertNotEqual(self.regular_user.password, encoded)
+        self.assertTrue(self.regular_user.check_password('testpass123'))
+
+    def test_register(self):
+        response = self.client.post(
+            reverse('auth_register'),
+            {'username': 'newuser', 'password': 'newpass123', 'email': 'New@EXAMPLE.com'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user = User.objects.get(username='newuser')
+        self.assertEqual(user.email, 'New@example.com')
+        self.assertTrue(user.check_password('newpass123'))
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.id)
+
+    def test_queue_full(self):
+        executor = HashingExecutor(workers=1, queue_size=0)
+        executor.pending = 1
+        with patch('users.password_hashing.get_executor', return_value=executor):
+            response = self.login('testuser', 'testpass123')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(executor.metrics()['rejected'], 1)
+
+    def test_metrics_endpoint(self):
+        self.authenticate_admin()
+        response = self.client.get(reverse('admin_metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('queue_time_max_ms', response.data['password_hashing'])
+
+
+class HashingExecutorTest(SimpleTestCase):
+    """Test the bounded executor without database access"""
+
+    async def test_bounded_queue(self):
+        executor = HashingExecutor(workers=1, queue_size=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: 'queued'))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(HashingBusy):
+            await executor.run(lambda: 'rejected')
+
+        release.set()
+        self.assertEqual(await queued, 'queued')
+        await running
+        metrics = executor.metrics()
+        self.assertEqual((metrics['completed'], metrics['rejected'], metrics['pending']), (2, 1, 0))
+        self.assertGreater(metrics['queue_time_max_ms'], 0)
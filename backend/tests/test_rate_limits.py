@@ -0,0 +1,126 @@
+"""
+Unit tests for authentication rate limits
+Login and registration attempts take tokens from per-IP and per-username
+buckets; empty buckets reject with 429 before any hashing or query
+"""
+import uuid
+from unittest.mock import patch
+
+import redis
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from .base import BaseAPITestCase
+from users.rate_limits import AuthRateLimiter, LocalBuckets, RedisBuckets
+
+TEST_REDIS_URL = 'redis://localhost:6379/15'
+
+
+class AuthRateLimitTest(BaseAPITestCase):
+    """Test the login and registration views reject over the limit"""
+
+    def login(self, username, password='wrong', **extra):
+        return self.client.post(
+            reverse('auth_login'), {'username': username, 'password': password}, format='json', **extra
+        )
+
+    @override_settings(AUTH_RATE_LIMIT_USERNAME='2/60')
+    def test_username_limit(self):
+        self.assertEqual(self.login('testuser').status_code, status.HTTP_401_UNAUTHORIZED)
+        # Usernames are case-insensitive on login, so is their bucket
+        self.assertEqual(self.login('TestUser').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with patch('users.auth_views.authenticate_user') as authenticate_user, self.assertNumQueries(0):
+            response = self.login('testuser', 'testpass123')
+        authenticate_user.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+        self.assertEqual(self.login('admin', 'adminpass123').status_code, status.HTTP_200_OK)
+
+    @override_settings(AUTH_RATE_LIMIT_IP='2/60')
+    def test_ip_limit(self):
+        self.login('user1')
+        self.login('user2')
+        self.assertEqual(self.login('user3').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login('user3', REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_RATE_LIMIT_IP='1/60', AUTH_RATE_LIMIT_IP_HEADER='X-Real-IP')
+    def test_proxy_header(self):
+        self.login('user1', HTTP_X_REAL_IP='203.0.113.1')
+        self.assertEqual(
+            self.login('user2', HTTP_X_REAL_IP='203.0.113.1').status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(self.login('user2', HTTP_X_REAL_IP='203.0.113.2').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_RATE_LIMIT_USERNAME='1/60')
+    def test_register_limit(self):
+        data = {'username': 'newuser', 'password': 'newpass123'}
+        self.client.post(reverse('auth_register'), dict(data, email='taken@example.com'), format='json')
+        response = self.client.post(reverse('auth_register'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(AUTH_RATE_LIMIT_USERNAME='1/60')
+    def test_metrics(self):
+        self.login('testuser')
+        self.login('testuser')
+        self.authenticate_admin()
+        response = self.client.get(reverse('admin_metrics'))
+        self.assertEqual(
+            response.data['rate_limits'],
+            {'backend': 'local', 'checked': 2, 'rejected': {'ip': 0, 'username': 1}, 'redis_errors': 0}
+        )
+
+
+class LocalBucketsTest(SimpleTestCase):
+    """Test in-process token buckets"""
+
+    def test_refill(self):
+        buckets = LocalBuckets()
+        limits = [('a', 2, 0.5)]
+        with patch('users.rate_limits.time.monotonic', return_value=100.0):
+            self.assertEqual(buckets.take(limits), (None, 0.0))
+            self.assertEqual(buckets.take(limits), (None, 0.0))
+            self.assertEqual(buckets.take(limits), (0, 2.0))
+        with patch('users.rate_limits.time.monotonic', return_value=102.0):
+            self.assertEqual(buckets.take(limits), (None, 0.0))
+
+    def test_all_or_nothing(self):
+        buckets = LocalBuckets()
+        buckets.take([('b', 1, 1.0)])
+        self.assertEqual(buckets.take([('a', 1, 1.0), ('b', 1, 1.0)])[0], 1)
+        # The rejected attempt left bucket a untouched
+        self.assertEqual(buckets.take([('a', 1, 1.0)])[0], None)
+
+
+class RedisBucketsTest(SimpleTestCase):
+    """Test token buckets in Redis"""
+
+    def setUp(self):
+        self.buckets = RedisBuckets(TEST_REDIS_URL)
+        try:
+            self.buckets.client.ping()
+        except redis.ConnectionError:
+            self.skipTest('Redis is not available')
+        self.prefix = uuid.uuid4().hex
+        self.addCleanup(lambda: self.buckets.client.delete(
+            *[f'ratelimit:{self.prefix}:{key}' for key in 'ab']
+        ))
+
+    def test_take(self):
+        a, b = f'{self.prefix}:a', f'{self.prefix}:b'
+        self.assertEqual(self.buckets.take([(a, 2, 0.1), (b, 1, 0.1)]), (None, 0.0))
+
+        index, retry_after = self.buckets.take([(a, 2, 0.1), (b, 1, 0.1)])
+        self.assertEqual(index, 1)
+        self.assertAlmostEqual(retry_after, 10, delta=1)
+        # The rejected attempt left bucket a untouched
+        self.assertEqual(self.buckets.take([(a, 2, 0.1)]), (None, 0.0))
+        self.assertEqual(self.buckets.take([(a, 2, 0.1)])[0], 0)
+
+    def test_unreachable_falls_back(self):
+        limiter = AuthRateLimiter('redis://localhost:1/0')
+        with self.assertLogs('users.rate_limits', 'WARNING'):
+            self.assertIsNone(limiter.check('10.0.0.1', 'user'))
+        self.assertEqual(limiter.metrics()['redis_errors'], 1)
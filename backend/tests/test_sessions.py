@@ -0,0 +1,60 @@
+"""
+Unit tests for session storage
+Sessions are read from the sessions cache; expired database rows are deleted
+in batches by clear_expired_sessions
+"""
+from importlib import import_module
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from .base import BaseAPITestCase
+
+
+class CachedSessionTest(BaseAPITestCase):
+    """Test an authenticated request reads its session from the cache"""
+
+    def setUp(self):
+        super().setUp()
+        caches['sessions'].clear()
+
+    def test_session_from_cache(self):
+        self.authenticate_user()
+        session_key = self.client.session.session_key
+        self.assertTrue(Session.objects.filter(session_key=session_key).exists())
+
+        store = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        with self.assertNumQueries(0):
+            self.assertEqual(int(store['_auth_user_id']), self.regular_user.id)
+
+    def test_logout_removes_cached_session(self):
+        self.authenticate_user()
+        session_key = self.client.session.session_key
+        self.client.post(reverse('auth_logout'))
+
+        store = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        self.assertNotIn('_auth_user_id', store)
+
+
+class ClearExpiredSessionsTest(BaseAPITestCase):
+    """Test the clear_expired_sessions command"""
+
+    def test_deletes_expired_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create([
+            Session(session_key=f'expired{i}', session_data='', expire_date=now - timezone.timedelta(days=1))
+            for i in range(5)
+        ] + [
+            Session(session_key='valid', session_data='', expire_date=now + timezone.timedelta(days=1))
+        ])
+
+        out = StringIO()
+        call_command('clear_expired_sessions', '--batch-size', '2', stdout=out)
+
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['valid'])
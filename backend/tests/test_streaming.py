@@ -0,0 +1,117 @@
+"""
+Unit tests for orjson rendering and streamed list responses
+"""
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from .base import BaseAPITestCase
+from bookings.models import Booking
+from calendar_project.renderers import ORJSONRenderer
+from events.models import TimeSlot
+
+
+class ORJSONRendererTest(BaseAPITestCase):
+    """Test ORJSONRenderer output against JSONRenderer"""
+
+    def test_same_bytes_as_json_renderer(self):
+        """Test datetimes, decimals, lazy strings and line separators"""
+        now = timezone.now()
+        data = {
+            'aware': now,
+            'naive': now.replace(tzinfo=None),
+            'date': now.date(),
+            'decimal': Decimal('1.50'),
+            'lazy': gettext_lazy('Category'),
+            'text': 'Zażółć gęślą',
+            'nested': [{'id': 1, 'none': None, 'flag': True}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_none_renders_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_indent_falls_back(self):
+        """Test indented output is still supported"""
+        content = ORJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(content, b'{\n  "a": 1\n}')
+
+
+class StreamingListTest(BaseAPITestCase):
+    """Test ?stream=true on the admin list endpoints"""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            slot = TimeSlot.objects.create(
+                start_time=timezone.now() + timedelta(days=10 + i),
+                end_time=timezone.now() + timedelta(days=10 + i, hours=1),
+                category=self.category1,
+                created_by=self.admin_user
+            )
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot2)
+        Booking.objects.create(user=self.admin_user, time_slot=slot)
+        self.authenticate_admin()
+
+    def get_streamed(self, url, params):
+        response = self.client.get(url, {**params, 'stream': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return b''.join(response.streaming_content)
+
+    def test_stream_matches_list(self):
+        """Test streamed lists have the same content as regular responses"""
+        urls = [reverse('admin_timeslots_list_create'), reverse('admin_bookings_list')]
+        for fast in (True, False):
+            for url in urls:
+                with override_settings(FAST_LIST_SERIALIZERS=fast), \
+                        patch('users.streaming.STREAM_CHUNK_SIZE', 2):
+                    regular = self.client.get(url).content
+                    streamed = self.get_streamed(url, {})
+                self.assertEqual(streamed, regular, url)
+                self.assertGreater(len(json.loads(streamed)), 2)
+
+    def test_stream_filters_and_limit(self):
+        """Test filters and the legacy limit apply to streamed lists"""
+        content = self.get_streamed(reverse('admin_timeslots_list_create'), {'status': 'booked'})
+        self.assertEqual(len(json.loads(content)), 3)
+
+        content = self.get_streamed(reverse('admin_bookings_list'), {'limit': 1})
+        self.assertEqual(len(json.loads(content)), 1)
+
+    def test_stream_empty(self):
+        content = self.get_streamed(reverse('admin_bookings_list'), {'user': 'nobody'})
+        self.assertEqual(content, b'[]')
+
+    def test_pagination_takes_precedence(self):
+        """Test a paginated request is not streamed"""
+        response = self.client.get(
+            reverse('admin_timeslots_list_create'), {'stream': 'true', 'page_size': 2}
+        )
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.data['results']), 2)
+
+    async def test_stream_under_asgi(self):
+        """Test ASGI requests get an async iterator, sent chunk by chunk"""
+        url = reverse('admin_bookings_list')
+        regular = await sync_to_async(lambda: self.client.get(url).content)()
+
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.admin_user)
+        with patch('users.streaming.STREAM_CHUNK_SIZE', 1):
+            response = await client.get(url, {'stream': 'true'})
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b''.join(chunks), regular)
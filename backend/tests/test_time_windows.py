@@ -0,0 +1,155 @@
+"""
+Unit tests for time window filtering
+Tests for parameter parsing and for index usage of the generated predicates
+"""
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from .base import BaseAPITestCase
+from bookings.models import Booking
+from events.models import TimeSlot
+from events.time_windows import TimeWindow
+
+
+class TimeWindowParamsTest(TestCase):
+    """Test building windows from query parameters"""
+
+    def test_date_uses_timezone_day_boundaries(self):
+        """Test a single date becomes [midnight, next midnight) in tz"""
+        window = TimeWindow.from_params({'date': '2030-03-10', 'tz': 'America/New_York'})
+
+        tz = ZoneInfo('America/New_York')
+        self.assertEqual(window.start, datetime(2030, 3, 10, tzinfo=tz))
+        self.assertEqual(window.end, datetime(2030, 3, 11, tzinfo=tz))
+
+    def test_date_range_is_inclusive_of_end_date(self):
+        """Test end_date covers the whole last day"""
+        window = TimeWindow.from_params({
+            'start_date': '2030-01-07', 'end_date': '2030-01-13', 'tz': 'UTC'
+        })
+
+        self.assertEqual(window.start, datetime(2030, 1, 7, tzinfo=ZoneInfo('UTC')))
+        self.assertEqual(window.end, datetime(2030, 1, 14, tzinfo=ZoneInfo('UTC')))
+
+    def test_instants_and_dates_intersect(self):
+        """Test combining parameters narrows the window"""
+        window = TimeWindow.from_params({
+            'date': '2030-01-07', 'from': '2030-01-07T12:00:00Z', 'tz': 'UTC'
+        })
+
+        self.assertEqual(window.start, datetime(2030, 1, 7, 12, tzinfo=timezone.utc))
+        self.assertEqual(window.end, datetime(2030, 1, 8, tzinfo=ZoneInfo('UTC')))
+
+    def test_defaults_to_current_timezone(self):
+        """Test day boundaries default to the active timezone"""
+        window = TimeWindow.from_params({'date': '2030-01-07'})
+
+        self.assertEqual(window.start, timezone.make_aware(datetime(2030, 1, 7)))
+
+    def test_empty_params(self):
+        """Test no parameters yield an unbounded window"""
+        self.assertFalse(TimeWindow.from_params({}))
+
+    def test_invalid_values(self):
+        """Test malformed parameters raise ValueError"""
+        for params in ({'date': '07.01.2030'}, {'from': 'yesterday'}, {'tz': 'Mars/Olympus'}):
+            with self.assertRaises(ValueError):
+                TimeWindow.from_params(params)
+
+
+class TimeWindowIndexUsageTest(BaseAPITestCase):
+    """Test window predicates are answered from the (start_time, end_time) index"""
+
+    def setUp(self):
+        super().setUp()
+        self.index_name = TimeSlot._meta.indexes[0].name
+        # A booked slot per day of 2030, so a one-week window is selective
+        # whatever statistics earlier tests left behind
+        start = datetime(2030, 1, 1, 10, tzinfo=ZoneInfo('UTC'))
+        time_slots = TimeSlot.objects.bulk_create([
+            TimeSlot(
+                start_time=start + timedelta(days=day),
+                end_time=start + timedelta(days=day, hours=1),
+                category=self.category1,
+                created_by=self.admin_user
+            )
+            for day in range(365)
+        ])
+        Booking.objects.bulk_create([
+            Booking(user=self.regular_user, time_slot=time_slot) for time_slot in time_slots
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE events_timeslot, bookings_booking')
+            # Sequential scans are still cheaper than anything on small tables;
+            # disabling them shows whether an index path exists at all
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.window = TimeWindow.from_params({'start_date': '2030-01-07', 'end_date': '2030-01-13'})
+
+    def test_timeslot_window_uses_index(self):
+        """Test range predicate on start_time uses the index"""
+        plan = self.window.apply(TimeSlot.objects.all(), 'start_time').explain()
+
+        self.assertIn(self.index_name, plan)
+        self.assertIn('Index Cond: ((start_time >=', plan)
+
+    def test_date_cast_has_no_index_condition(self):
+        """Test the previous start_time__date filter cannot be an index condition"""
+        plan = TimeSlot.objects.filter(
+            start_time__date__gte=date(2030, 1, 7),
+            start_time__date__lte=date(2030, 1, 13)
+        ).explain()
+
+        self.assertNotIn('Index Cond', plan)
+
+    def test_booking_window_uses_timeslot_index(self):
+        """Test admin bookings window filter uses the time slot index"""
+        queryset = Booking.objects.select_related('user', 'time_slot__category')
+        plan = self.window.apply(queryset, 'time_slot__start_time').explain()
+
+        self.assertIn(self.index_name, plan)
+        self.assertIn('Index Cond: ((start_time >=', plan)
+
+
+class TimeWindowEndpointsTest(BaseAPITestCase):
+    """Test window parameters on list endpoints"""
+
+    def test_timeslots_from_to(self):
+        """Test from/to instants select slots by start time"""
+        self.authenticate_user()
+        url = reverse('user_timeslots')
+
+        response = self.client.get(url, {
+            'from': self.timeslot1.start_time.isoformat(),
+            'to': self.timeslot2.start_time.isoformat(),
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([slot['id'] for slot in response.data], [self.timeslot1.id])
+
+    def test_admin_timeslots_invalid_date(self):
+        """Test admin timeslots rejects malformed dates"""
+        self.authenticate_admin()
+        url = reverse('admin_timeslots_list_create')
+
+        response = self.client.get(url, {'date': 'tomorrow'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_bookings_date_range(self):
+        """Test admin bookings filtered by a day range around the slots"""
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+        self.authenticate_admin()
+        url = reverse('admin_bookings_list')
+        day = self.timeslot1.start_time.date()
+
+        inside = self.client.get(url, {'start_date': str(day), 'end_date': str(day), 'tz': 'UTC'})
+        outside = self.client.get(url, {'start_date': str(day + timedelta(days=1)), 'tz': 'UTC'})
+
+        self.assertEqual(len(inside.data), 1)
+        self.assertEqual(len(outside.data), 0)
@@ -0,0 +1,84 @@
+"""
+Unit tests for cached token authentication
+Token lookups are cached until the token is deleted or its user changes;
+token requests skip the session CSRF check
+"""
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .base import BaseAPITestCase
+from users.authentication import CachedTokenAuthentication, token_cache_key
+
+
+class CachedTokenAuthenticationTest(BaseAPITestCase):
+    """Test token requests and the token cache"""
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.regular_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_lookup(self):
+        authentication = CachedTokenAuthentication()
+        with self.assertNumQueries(1):
+            user, token = authentication.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = authentication.authenticate_credentials(self.token.key)
+        self.assertEqual((user, token), (self.regular_user, self.token))
+        self.assertEqual(user.username, 'testuser')
+
+    def test_cache_holds_no_secrets(self):
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        cached = cache.get(token_cache_key(self.token.key))
+        self.assertNotIn(self.regular_user.password, cached)
+        self.assertNotIn(self.token.key, cached)
+
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        # The password loads on access and saving the cached user keeps it
+        with self.assertNumQueries(1):
+            self.assertEqual(user.password, self.regular_user.password)
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        user.first_name = 'Test'
+        user.save()
+        self.regular_user.refresh_from_db()
+        self.assertEqual(self.regular_user.first_name, 'Test')
+        self.assertTrue(self.regular_user.check_password('testpass123'))
+
+    def test_token_request(self):
+        response = self.client.get(reverse('user_timeslots'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('user_bookings_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token(self):
+        self.assertEqual(self.client.get(reverse('user_timeslots')).status_code, status.HTTP_200_OK)
+        self.token.delete()
+        self.assertEqual(self.client.get(reverse('user_timeslots')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_deactivated_user(self):
+        self.assertEqual(self.client.get(reverse('user_timeslots')).status_code, status.HTTP_200_OK)
+        self.regular_user.is_active = False
+        self.regular_user.save()
+        self.assertEqual(self.client.get(reverse('user_timeslots')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_login_keeps_cache(self):
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.client.login(username='testuser', password='testpass123')
+        with self.assertNumQueries(0):
+            CachedTokenAuthentication().authenticate_credentials(self.token.key)
+
+    def test_token_request_skips_csrf(self):
+        client = APIClient(enforce_csrf_checks=True)
+        client.login(username='testuser', password='testpass123')
+        url = reverse('user_create_booking')
+
+        response = client.post(url, {'time_slot': self.timeslot1.id})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = client.post(url, {'time_slot': self.timeslot1.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
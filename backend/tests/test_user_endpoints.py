@@ -4,6 +4,8 @@ Tests for user-specific endpoints including categories, timeslots, and bookings
 """
 from django.urls import reverse
 from django.utils import timezone
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from datetime import timedelta, date
 from rest_framework import status
@@ -93,6 +95,100 @@ class TimeslotsListTest(BaseAPITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('Invalid date format', response.data['error'])
+    
+    def test_can_book_reflects_user_conflicts(self):
+        """Test can_book is false for booked and overlapping slots"""
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+        overlapping = TimeSlot.objects.create(
+            start_time=self.timeslot1.start_time + timedelta(minutes=30),
+            end_time=self.timeslot1.end_time + timedelta(minutes=30),
+            category=self.category3,
+            created_by=self.admin_user
+        )
+        
+        self.authenticate_user()
+        response = self.client.get(reverse('user_timeslots'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        can_book = {slot['id']: slot['can_book'] for slot in response.data}
+        self.assertFalse(can_book[self.timeslot1.id])
+        self.assertFalse(can_book[overlapping.id])
+        self.assertTrue(can_book[self.timeslot2.id])
+    
+    def test_query_count_independent_of_slot_count(self):
+        """Test timeslots list query count does not grow with the number of slots"""
+        other_user = User.objects.create_user(username='otheruser', password='testpass123')
+        Booking.objects.create(user=other_user, time_slot=self.timeslot2)
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+        
+        self.authenticate_user()
+        url = reverse('user_timeslots')
+        # Warm up the cached ETag lookup, it is shared by both requests
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        
+        base = self.timeslot2.end_time + timedelta(hours=1)
+        for i in range(10):
+            slot = TimeSlot.objects.create(
+                start_time=base + timedelta(hours=i),
+                end_time=base + timedelta(hours=i, minutes=30),
+                category=self.category1,
+                created_by=self.admin_user
+            )
+            if i % 2:
+                Booking.objects.create(user=other_user, time_slot=slot)
+        
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(len(many), len(few))
+    
+    def test_cursor_pagination_walks_all_slots(self):
+        """Test following next cursors returns every slot once in order"""
+        base = self.timeslot2.end_time + timedelta(hours=1)
+        for i in range(5):
+            TimeSlot.objects.create(
+                start_time=base + timedelta(hours=i),
+                end_time=base + timedelta(hours=i, minutes=30),
+                category=self.category1,
+                created_by=self.admin_user
+            )
+        # Two slots sharing a start time exercise the id tie-breaker
+        TimeSlot.objects.create(
+            start_time=base,
+            end_time=base + timedelta(minutes=30),
+            category=self.category2,
+            created_by=self.admin_user
+        )
+        
+        self.authenticate_user()
+        url = reverse('user_timeslots')
+        expected = list(TimeSlot.objects.order_by('start_time', 'id').values_list('id', flat=True))
+        
+        seen = []
+        params = {'page_size': 3}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend(slot['id'] for slot in response.data['results'])
+            if not response.data['next']:
+                break
+            params = {'page_size': 3, 'cursor': response.data['next']}
+        
+        self.assertEqual(seen, expected)
+    
+    def test_invalid_cursor(self):
+        """Test malformed cursor returns error"""
+        self.authenticate_user()
+        url = reverse('user_timeslots')
+        
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'Invalid cursor')
 
 
 class CreateBookingTest(BaseAPITestCase):
@@ -232,6 +328,22 @@ class UserBookingsListTest(BaseAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
     
+    def test_user_bookings_cursor_pagination(self):
+        """Test paginating user bookings newest first"""
+        self.authenticate_user()
+        url = reverse('user_bookings_list')
+        
+        response = self.client.get(url, {'page_size': 1})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([b['id'] for b in response.data['results']], [self.booking2.id])
+        self.assertIsNotNone(response.data['next'])
+        
+        response = self.client.get(url, {'page_size': 1, 'cursor': response.data['next']})
+        
+        self.assertEqual([b['id'] for b in response.data['results']], [self.booking1.id])
+        self.assertIsNone(response.data['next'])
+    
     def test_get_user_bookings_unauthenticated(self):
         """Test getting user bookings without authentication"""
         url = reverse('user_bookings_list')
@@ -0,0 +1,189 @@
+"""
+Unit tests for WebSocket event batching and encoding
+Events are encoded once by the publisher, events of one window are sent as
+one frame and events that cancel out are dropped
+"""
+import json
+from datetime import timedelta
+from unittest.mock import AsyncMock, Mock, patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from bookings.batching import EventBuffer, batch_frame
+from bookings.consumers import CalendarConsumer
+from bookings.models import Booking
+from bookings.outbox import relay_batch
+from bookings.websocket_utils import event_message
+from calendar_project.renderers import dumps
+from events.models import Category, TimeSlot
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+class EventBufferTest(TestCase):
+    """Test coalescing of pending events"""
+
+    def add(self, buffer, event_type, slot_id, event_id):
+        buffer.add(event_type, slot_id, event_id, f'{event_type}:{event_id}')
+
+    def test_keeps_order(self):
+        buffer = EventBuffer()
+        self.add(buffer, 'timeslot_created', 1, 1)
+        self.add(buffer, 'booking_created', 2, 7)
+        self.add(buffer, 'timeslot_created', 3, 3)
+
+        self.assertEqual(buffer.drain(), ['timeslot_created:1', 'booking_created:7', 'timeslot_created:3'])
+        self.assertEqual(len(buffer), 0)
+
+    def test_created_and_deleted_slot(self):
+        """Test a slot created, booked and deleted within the window leaves nothing"""
+        buffer = EventBuffer()
+        self.add(buffer, 'timeslot_created', 1, 1)
+        self.add(buffer, 'booking_created', 1, 7)
+        self.add(buffer, 'timeslot_created', 2, 2)
+        self.add(buffer, 'timeslot_deleted', 1, 1)
+
+        self.assertEqual(buffer.drain(), ['timeslot_created:2'])
+
+    def test_deleting_known_slot_is_kept(self):
+        buffer = EventBuffer()
+        self.add(buffer, 'booking_cancelled', 1, 7)
+        self.add(buffer, 'timeslot_deleted', 1, 1)
+
+        self.assertEqual(buffer.drain(), ['booking_cancelled:7', 'timeslot_deleted:1'])
+
+    def test_booking_made_and_cancelled(self):
+        buffer = EventBuffer()
+        self.add(buffer, 'booking_created', 1, 7)
+        self.add(buffer, 'booking_cancelled', 1, 7)
+        self.assertEqual(buffer.drain(), [])
+
+        # Cancelling one booking and booking the slot again is a real change
+        self.add(buffer, 'booking_cancelled', 1, 7)
+        self.add(buffer, 'booking_created', 1, 8)
+        self.assertEqual(len(buffer.drain()), 2)
+
+    def test_batch_frame(self):
+        frame = '{"type":"timeslot_created","data":{"id":1}}'
+        self.assertEqual(batch_frame([frame]), frame)
+        self.assertEqual(json.loads(batch_frame([frame, frame])), {
+            'type': 'batch',
+            'data': [{'type': 'timeslot_created', 'data': {'id': 1}}] * 2
+        })
+
+
+class EventMessageTest(TestCase):
+    """Test events are encoded once by the publisher"""
+
+    def setUp(self):
+        admin_user = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        start_time = timezone.now() + timedelta(days=1)
+        self.timeslot = TimeSlot.objects.create(
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=1),
+            category=Category.objects.create(name='Cat 1'),
+            created_by=admin_user
+        )
+
+    def test_frame_encoded_once(self):
+        """Test every group gets the same encoded frame and nothing else is encoded"""
+        layer = Mock()
+        layer.group_send = AsyncMock()
+
+        # The event was recorded by the creation of the slot
+        with patch('bookings.outbox.get_channel_layer', return_value=layer), \
+                patch('bookings.websocket_utils.dumps', wraps=dumps) as encode:
+            relay_batch()
+
+        self.assertEqual(encode.call_count, 1)
+        messages = [call.args[1] for call in layer.group_send.call_args_list]
+        self.assertEqual(len(messages), 2)
+        self.assertIs(messages[0], messages[1])
+        self.assertEqual(messages[0]['slot_id'], self.timeslot.id)
+        frame = json.loads(messages[0]['frame'])
+        self.assertEqual(frame['type'], 'timeslot_created')
+        self.assertEqual(frame['data']['id'], self.timeslot.id)
+
+    def test_consumer_forwards_frame(self):
+        """Test the consumer sends the frame without encoding it"""
+        consumer = CalendarConsumer()
+        consumer.batch_window = 0
+        consumer.last_seq = None
+        consumer.send = AsyncMock()
+        message = event_message(self.timeslot, 'timeslot_created', {'id': self.timeslot.id}, 1)
+
+        with patch('bookings.consumers.json.dumps') as encode:
+            async_to_sync(consumer.timeslot_created)(message)
+
+        encode.assert_not_called()
+        consumer.send.assert_awaited_once_with(text_data=message['frame'])
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, WEBSOCKET_BATCH_WINDOW=0.05)
+class BatchedConsumerTest(TransactionTestCase):
+    """Test a connection sends one frame per window"""
+
+    def setUp(self):
+        self.regular_user = User.objects.create_user(username='testuser', password='testpass123')
+        self.admin_user = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.category = Category.objects.create(name='Cat 1')
+        self.start_time = timezone.now() + timedelta(days=1)
+
+    def create_slot(self, offset):
+        return TimeSlot.objects.create(
+            start_time=self.start_time + offset,
+            end_time=self.start_time + offset + timedelta(minutes=30),
+            category=self.category,
+            created_by=self.admin_user
+        )
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(CalendarConsumer.as_asgi(), '/ws/calendar/')
+        communicator.scope['user'] = self.regular_user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_burst_is_one_frame(self):
+        """Test a burst of slot creations arrives as a single batch frame"""
+        slots = await sync_to_async(lambda: [self.create_slot(timedelta(hours=i)) for i in range(20)])()
+        client = await self.connect()
+
+        await sync_to_async(relay_batch)()
+
+        frame = await client.receive_json_from()
+        self.assertEqual(frame['type'], 'batch')
+        self.assertEqual([m['data']['id'] for m in frame['data']], [slot.id for slot in slots])
+        self.assertTrue(await client.receive_nothing(timeout=0.2))
+        await client.disconnect()
+
+    async def test_single_event_frame(self):
+        """Test a lone event keeps its usual frame"""
+        slot = await sync_to_async(self.create_slot)(timedelta(0))
+        client = await self.connect()
+
+        await sync_to_async(relay_batch)()
+
+        frame = await client.receive_json_from()
+        self.assertEqual(frame['type'], 'timeslot_created')
+        self.assertEqual(frame['data']['id'], slot.id)
+        await client.disconnect()
+
+    async def test_cancelled_out_events_send_nothing(self):
+        booked = await sync_to_async(self.create_slot)(timedelta(0))
+        await sync_to_async(relay_batch)()
+
+        def book_and_delete():
+            Booking.objects.create(user=self.regular_user, time_slot=booked).delete()
+            self.create_slot(timedelta(hours=1)).delete()
+            relay_batch()
+
+        client = await self.connect()
+        await sync_to_async(book_and_delete)()
+
+        self.assertTrue(await client.receive_nothing(timeout=0.3))
+        await client.disconnect()
@@ -0,0 +1,454 @@
+"""
+Unit tests for partitioned WebSocket groups
+Events go to the category/week partition of their slot and to the legacy group,
+clients move between partitions with subscribe/unsubscribe messages
+"""
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .base import BaseAPITestCase
+from bookings.consumers import CalendarConsumer
+from bookings.groups import (
+    LEGACY_GROUP, event_groups, iso_week, parse_week, view_partitions, window_weeks
+)
+from bookings.models import ChangeEvent
+from bookings.outbox import relay_batch, sequence_pending
+from bookings.websocket_utils import send_timeslot_created_event
+from events.models import Category, TimeSlot
+from events.time_windows import TimeWindow
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+# Routing tests look at single events, batching is covered in test_websocket_batching
+UNBATCHED = {'CHANNEL_LAYERS': IN_MEMORY_LAYERS, 'WEBSOCKET_BATCH_WINDOW': 0}
+
+
+def publish_created(time_slot):
+    """Record a timeslot_created event and relay it at once"""
+    send_timeslot_created_event(time_slot)
+    relay_batch()
+
+
+class GroupNamesTest(BaseAPITestCase):
+    """Test group name helpers"""
+
+    def test_event_groups(self):
+        year, week = iso_week(self.timeslot1.start_time)
+        self.assertEqual(
+            event_groups(self.timeslot1),
+            [f'cal.{self.category1.id}.{year}-{week:02d}', LEGACY_GROUP]
+        )
+
+    def test_event_groups_of_moved_slot(self):
+        previous = TimeSlot(category_id=self.category2.id, start_time=self.timeslot1.start_time)
+        groups = event_groups(self.timeslot1, previous)
+        self.assertEqual(groups[1:], [event_groups(previous)[0], LEGACY_GROUP])
+        # Moved within its partition: no extra group
+        self.assertEqual(event_groups(self.timeslot1, self.timeslot1), event_groups(self.timeslot1))
+
+    def test_parse_week(self):
+        self.assertEqual(parse_week('2025-W01'), (2025, 1))
+        for value in ('2025-W54', '2025-01-01', 'W28', ''):
+            with self.assertRaises(ValueError):
+                parse_week(value)
+
+    def test_view_partitions(self):
+        partitions = view_partitions([1, 2], [(2025, 27), (2025, 28)])
+        self.assertEqual(partitions, {(1, 2025, 27), (1, 2025, 28), (2, 2025, 27), (2, 2025, 28)})
+
+        with self.assertRaises(ValueError):
+            view_partitions(range(10), [(2025, week) for week in range(1, 10)])
+
+    def test_window_weeks(self):
+        def weeks(start_date, end_date):
+            return window_weeks(TimeWindow.from_params({'start_date': start_date, 'end_date': end_date}))
+
+        self.assertEqual(weeks('2025-07-14', '2025-07-20'), [(2025, 29)])
+        self.assertEqual(weeks('2025-07-16', '2025-07-22'), [(2025, 29), (2025, 30)])
+        self.assertEqual(weeks('2024-12-30', '2025-01-12'), [(2025, 1), (2025, 2)])
+        # A week plus one day still ends in the next week
+        self.assertEqual(weeks('2025-07-14', '2025-07-21'), [(2025, 29), (2025, 30)])
+
+        with self.assertRaises(ValueError):
+            weeks('2025-01-01', '2025-12-31')
+
+
+@override_settings(**UNBATCHED)
+class PartitionedConsumerTest(TransactionTestCase):
+    """
+    Test consumers receive only the partitions they view.
+    A TransactionTestCase because database_sync_to_async in the consumer
+    closes the connection a TestCase transaction would run on.
+    """
+
+    def setUp(self):
+        self.regular_user = User.objects.create_user(username='testuser', password='testpass123')
+        admin_user = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.category1 = Category.objects.create(name='Cat 1')
+        self.category2 = Category.objects.create(name='Cat 2')
+        start_time = timezone.now() + timedelta(days=1)
+        self.timeslot1, self.timeslot2 = [
+            TimeSlot.objects.create(
+                start_time=start_time,
+                end_time=start_time + timedelta(hours=1),
+                category=category,
+                created_by=admin_user
+            )
+            for category in (self.category1, self.category2)
+        ]
+        self.admin_user = admin_user
+        year, week = iso_week(self.timeslot1.start_time)
+        self.week = f'{year}-W{week:02d}'
+        # Tests publish the events they look at
+        ChangeEvent.objects.all().delete()
+
+    async def connect(self, query=''):
+        communicator = WebsocketCommunicator(CalendarConsumer.as_asgi(), f'/ws/calendar/?{query}')
+        communicator.scope['user'] = self.regular_user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def publish(self, time_slot):
+        await sync_to_async(publish_created)(time_slot)
+
+    def move_slot(self, time_slot, delta):
+        """Move time_slot by delta through the admin API and relay the update"""
+        client = APIClient()
+        client.force_login(self.admin_user)
+        response = client.put(
+            reverse('admin_timeslot_detail', kwargs={'timeslot_id': time_slot.id}),
+            {
+                'category': time_slot.category_id,
+                'start_time': time_slot.start_time + delta,
+                'end_time': time_slot.end_time + delta,
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        relay_batch()
+
+    async def test_partition_and_legacy(self):
+        """Test a category/week client gets its events and a legacy client gets all"""
+        viewer, connected = await self.connect(f'weeks={self.week}&categories={self.category1.id}')
+        self.assertTrue(connected)
+        legacy, connected = await self.connect()
+        self.assertTrue(connected)
+
+        await self.publish(self.timeslot1)
+        await self.publish(self.timeslot2)
+
+        message = await viewer.receive_json_from()
+        self.assertEqual(message['data']['id'], self.timeslot1.id)
+        self.assertTrue(await viewer.receive_nothing())
+
+        received = {(await legacy.receive_json_from())['data']['id'] for _ in range(2)}
+        self.assertEqual(received, {self.timeslot1.id, self.timeslot2.id})
+
+        await viewer.disconnect()
+        await legacy.disconnect()
+
+    async def test_other_week(self):
+        """Test a client viewing another week gets nothing"""
+        year, week = iso_week(self.timeslot1.start_time + timedelta(weeks=1))
+        other_week = f'{year}-W{week:02d}'
+        viewer, connected = await self.connect(f'weeks={other_week}')
+        self.assertTrue(connected)
+
+        await self.publish(self.timeslot1)
+
+        self.assertTrue(await viewer.receive_nothing())
+        await viewer.disconnect()
+
+    async def test_moved_to_other_week(self):
+        """Test viewers of the week a slot leaves and of the week it moves to both get the update"""
+        year, week = iso_week(self.timeslot1.start_time + timedelta(weeks=1))
+        old_viewer, _ = await self.connect(f'weeks={self.week}&categories={self.category1.id}')
+        new_viewer, _ = await self.connect(f'weeks={year}-W{week:02d}&categories={self.category1.id}')
+
+        await sync_to_async(self.move_slot)(self.timeslot1, timedelta(weeks=1))
+
+        for viewer in (old_viewer, new_viewer):
+            message = await viewer.receive_json_from()
+            self.assertEqual((message['type'], message['data']['id']), ('timeslot_updated', self.timeslot1.id))
+            self.assertTrue(await viewer.receive_nothing())
+            await viewer.disconnect()
+
+        # A viewer of the old week resuming after the move gets it replayed
+        resumed, _ = await self.connect(f'weeks={self.week}&categories={self.category1.id}&resume_from=0')
+        frame = await resumed.receive_json_from()
+        self.assertEqual(frame['type'], 'replay')
+        self.assertEqual([m['data']['id'] for m in frame['data']], [self.timeslot1.id])
+        await resumed.disconnect()
+
+    async def test_all_categories_by_default(self):
+        """Test weeks without categories covers every category"""
+        viewer, connected = await self.connect(f'weeks={self.week}')
+        self.assertTrue(connected)
+
+        await self.publish(self.timeslot1)
+        await self.publish(self.timeslot2)
+
+        received = {(await viewer.receive_json_from())['data']['id'] for _ in range(2)}
+        self.assertEqual(received, {self.timeslot1.id, self.timeslot2.id})
+        await viewer.disconnect()
+
+    async def test_invalid_view_rejected(self):
+        for query in ('weeks=2025-28', f'weeks={self.week}&categories=abc'):
+            _, connected = await self.connect(query)
+            self.assertFalse(connected, query)
+
+
+@override_settings(**UNBATCHED)
+class SubscriptionProtocolTest(TransactionTestCase):
+    """Test subscribe/unsubscribe/ping messages move the connection between groups"""
+
+    def setUp(self):
+        self.regular_user = User.objects.create_user(username='testuser', password='testpass123')
+        admin_user = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.category1 = Category.objects.create(name='Cat 1')
+        self.category2 = Category.objects.create(name='Cat 2')
+        start_time = timezone.now() + timedelta(days=1)
+        self.timeslot1, self.timeslot2, self.next_week_slot = [
+            TimeSlot.objects.create(
+                start_time=start_time + offset,
+                end_time=start_time + offset + timedelta(hours=1),
+                category=category,
+                created_by=admin_user
+            )
+            for category, offset in (
+                (self.category1, timedelta(0)),
+                (self.category2, timedelta(0)),
+                (self.category1, timedelta(weeks=1)),
+            )
+        ]
+        self.day = timezone.localtime(self.timeslot1.start_time).date()
+        year, week = iso_week(self.timeslot1.start_time)
+        self.week = f'{year}-W{week:02d}'
+        year, week = iso_week(self.next_week_slot.start_time)
+        self.next_week = f'{year}-W{week:02d}'
+
+    def week_range(self, day):
+        monday = day - timedelta(days=day.weekday())
+        return {'start_date': monday.isoformat(), 'end_date': (monday + timedelta(days=6)).isoformat()}
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(CalendarConsumer.as_asgi(), '/ws/calendar/')
+        communicator.scope['user'] = self.regular_user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def request(self, communicator, message):
+        await communicator.send_json_to(message)
+        return await communicator.receive_json_from()
+
+    async def publish(self, time_slot):
+        await sync_to_async(publish_created)(time_slot)
+
+    async def received_ids(self, communicator):
+        ids = set()
+        while not await communicator.receive_nothing():
+            ids.add((await communicator.receive_json_from())['data']['id'])
+        return ids
+
+    async def test_subscribe_leaves_legacy_group(self):
+        client = await self.connect()
+        reply = await self.request(client, {
+            'type': 'subscribe', 'categories': ['Cat 1'], **self.week_range(self.day)
+        })
+        self.assertEqual(reply, {
+            'type': 'subscribed',
+            'data': {'weeks': [self.week], 'categories': [self.category1.id]}
+        })
+
+        for time_slot in (self.timeslot1, self.timeslot2, self.next_week_slot):
+            await self.publish(time_slot)
+        self.assertEqual(await self.received_ids(client), {self.timeslot1.id})
+        await client.disconnect()
+
+    async def test_move_to_next_week(self):
+        """Test replace moves the subscription the way the calendar does on week change"""
+        client = await self.connect()
+        await self.request(client, {'type': 'subscribe', 'replace': True, **self.week_range(self.day)})
+        reply = await self.request(client, {
+            'type': 'subscribe', 'replace': True, **self.week_range(self.day + timedelta(weeks=1))
+        })
+        self.assertEqual(reply['data'], {
+            'weeks': [self.next_week], 'categories': [self.category1.id, self.category2.id]
+        })
+
+        for time_slot in (self.timeslot1, self.timeslot2, self.next_week_slot):
+            await self.publish(time_slot)
+        self.assertEqual(await self.received_ids(client), {self.next_week_slot.id})
+        await client.disconnect()
+
+    async def test_subscribe_adds_and_unsubscribe_removes(self):
+        client = await self.connect()
+        await self.request(client, {
+            'type': 'subscribe', 'categories': [self.category1.id], 'start_date': self.day.isoformat()
+        })
+        reply = await self.request(client, {
+            'type': 'subscribe', 'categories': [self.category2.id], 'start_date': self.day.isoformat()
+        })
+        self.assertEqual(reply['data']['categories'], [self.category1.id, self.category2.id])
+
+        reply = await self.request(client, {'type': 'unsubscribe', 'categories': ['Cat 2']})
+        self.assertEqual(reply['data'], {'weeks': [self.week], 'categories': [self.category1.id]})
+        await self.publish(self.timeslot1)
+        await self.publish(self.timeslot2)
+        self.assertEqual(await self.received_ids(client), {self.timeslot1.id})
+
+        reply = await self.request(client, {'type': 'unsubscribe'})
+        self.assertEqual(reply['data'], {'weeks': [], 'categories': []})
+        await self.publish(self.timeslot1)
+        self.assertEqual(await self.received_ids(client), set())
+        await client.disconnect()
+
+    async def test_ping(self):
+        client = await self.connect()
+        reply = await self.request(client, {'type': 'ping', 'data': 42})
+        self.assertEqual(reply, {'type': 'pong', 'data': 42})
+        await client.disconnect()
+
+    async def test_errors_keep_subscription(self):
+        client = await self.connect()
+        await self.request(client, {'type': 'subscribe', 'categories': ['Cat 1'], **self.week_range(self.day)})
+
+        invalid = [
+            'not json',
+            [],
+            {'type': 'shout'},
+            {'type': 'subscribe', 'categories': ['Cat 9'], 'start_date': self.day.isoformat()},
+            {'type': 'subscribe', 'categories': 'Cat 1', 'start_date': self.day.isoformat()},
+            {'type': 'subscribe', 'start_date': '14.07.2025'},
+            {'type': 'subscribe', 'start_date': '2025-01-01', 'end_date': '2025-12-31'},
+        ]
+        for message in invalid:
+            if isinstance(message, str):
+                await client.send_to(text_data=message)
+                reply = await client.receive_json_from()
+            else:
+                reply = await self.request(client, message)
+            self.assertEqual(reply['type'], 'error', message)
+            self.assertIn('error', reply['data'])
+
+        await self.publish(self.timeslot1)
+        self.assertEqual(await self.received_ids(client), {self.timeslot1.id})
+        await client.disconnect()
+
+
+@override_settings(**UNBATCHED)
+class ResumeTest(TransactionTestCase):
+    """Test reconnecting clients get the events they missed"""
+
+    def setUp(self):
+        self.regular_user = User.objects.create_user(username='testuser', password='testpass123')
+        admin_user = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.category1 = Category.objects.create(name='Cat 1')
+        self.category2 = Category.objects.create(name='Cat 2')
+        start_time = timezone.now() + timedelta(days=1)
+        self.timeslots = [
+            TimeSlot.objects.create(
+                start_time=start_time + timedelta(hours=i),
+                end_time=start_time + timedelta(hours=i, minutes=30),
+                category=category,
+                created_by=admin_user
+            )
+            for i, category in enumerate((self.category1, self.category2, self.category1))
+        ]
+        # Sequences 1, 2 and 3
+        relay_batch()
+        self.day = timezone.localtime(start_time).date()
+        year, week = iso_week(start_time)
+        self.week = f'{year}-W{week:02d}'
+
+    async def connect(self, query=''):
+        communicator = WebsocketCommunicator(CalendarConsumer.as_asgi(), f'/ws/calendar/?{query}')
+        communicator.scope['user'] = self.regular_user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_resume_in_query(self):
+        client, connected = await self.connect(
+            f'weeks={self.week}&categories={self.category1.id}&resume_from=1'
+        )
+        self.assertTrue(connected)
+
+        frame = await client.receive_json_from()
+        self.assertEqual(frame['type'], 'replay')
+        self.assertEqual([(m['seq'], m['data']['id']) for m in frame['data']], [(3, self.timeslots[2].id)])
+
+        # Live events continue the sequence
+        await sync_to_async(publish_created)(self.timeslots[0])
+        frame = await client.receive_json_from()
+        self.assertEqual((frame['type'], frame['seq']), ('timeslot_created', 4))
+        await client.disconnect()
+
+    async def test_resume_with_subscribe(self):
+        client, _ = await self.connect()
+        await client.send_json_to({
+            'type': 'subscribe', 'replace': True, 'start_date': self.day.isoformat(), 'resume_from': 1
+        })
+
+        self.assertEqual((await client.receive_json_from())['type'], 'subscribed')
+        frame = await client.receive_json_from()
+        self.assertEqual(frame['type'], 'replay')
+        self.assertEqual([m['seq'] for m in frame['data']], [2, 3])
+        self.assertTrue(await client.receive_nothing())
+
+        # Nothing missed, nothing sent
+        await client.send_json_to({'type': 'subscribe', 'start_date': self.day.isoformat(), 'resume_from': 3})
+        self.assertEqual((await client.receive_json_from())['type'], 'subscribed')
+        self.assertTrue(await client.receive_nothing())
+        await client.disconnect()
+
+    async def test_resume_during_publish(self):
+        """Test an event numbered but not yet marked published is replayed, and not sent twice"""
+        def create_and_number():
+            TimeSlot.objects.create(
+                start_time=self.timeslots[2].end_time,
+                end_time=self.timeslots[2].end_time + timedelta(minutes=30),
+                category=self.category1,
+                created_by=self.regular_user
+            )
+            sequence_pending(100)
+
+        await sync_to_async(create_and_number)()
+        client, _ = await self.connect(f'weeks={self.week}&resume_from=3')
+        frame = await client.receive_json_from()
+        self.assertEqual((frame['type'], [m['seq'] for m in frame['data']]), ('replay', [4]))
+
+        # The relay sends the batch after the client joined its groups
+        await sync_to_async(relay_batch)()
+        self.assertTrue(await client.receive_nothing())
+        await client.disconnect()
+
+        # A client that got seq 4 live resumes without a resync
+        client, _ = await self.connect(f'weeks={self.week}&resume_from=4')
+        self.assertTrue(await client.receive_nothing())
+        await client.disconnect()
+
+    @override_settings(EVENT_REPLAY_SIZE=1)
+    async def test_resync_after_trim(self):
+        await sync_to_async(publish_created)(self.timeslots[0])
+
+        client, connected = await self.connect('resume_from=1')
+        self.assertTrue(connected)
+        self.assertEqual(await client.receive_json_from(), {'type': 'resync', 'data': {'seq': 4}})
+        await client.disconnect()
+
+    async def test_invalid_resume_from(self):
+        _, connected = await self.connect('resume_from=abc')
+        self.assertFalse(connected)
+
+        client, _ = await self.connect()
+        await client.send_json_to({'type': 'subscribe', 'start_date': self.day.isoformat(), 'resume_from': -1})
+        self.assertEqual((await client.receive_json_from())['type'], 'error')
+        await client.disconnect()
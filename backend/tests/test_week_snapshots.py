@@ -0,0 +1,102 @@
+"""
+Unit tests for cached week snapshots on the timeslots list
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from .base import BaseAPITestCase
+from bookings.models import Booking
+from events.calendar_version import get_calendar_version
+from users.week_snapshots import week_monday
+
+
+class WeekSnapshotTest(BaseAPITestCase):
+    """Test timeslots list served from week snapshots"""
+
+    def setUp(self):
+        super().setUp()
+        monday = week_monday(self.timeslot1.start_time)
+        self.params = {
+            'start_date': monday.isoformat(),
+            'end_date': (monday + timedelta(days=6)).isoformat(),
+        }
+        self.url = reverse('user_timeslots')
+
+    def test_hot_week_served_without_slot_query(self):
+        """Test a cached week does not query the time slots table"""
+        self.authenticate_user()
+        first = self.client.get(self.url, self.params)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url, self.params)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.json(), first.json())
+        self.assertFalse(any('FROM "events_timeslot"' in q['sql'] for q in queries))
+
+    def test_snapshot_matches_database_path(self):
+        """Test snapshot payload equals the uncached serializer output"""
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+        self.authenticate_user()
+
+        cached = self.client.get(self.url, self.params)
+        # Paginated requests always go to the database
+        direct = self.client.get(self.url, {**self.params, 'page_size': 100})
+
+        self.assertEqual(cached.json(), direct.json()['results'])
+
+    def test_can_book_is_per_user(self):
+        """Test users sharing a snapshot get their own can_book"""
+        Booking.objects.create(user=self.regular_user, time_slot=self.timeslot1)
+        other_user = User.objects.create_user(username='otheruser', password='testpass123')
+
+        self.authenticate_user()
+        own = {slot['id']: slot['can_book'] for slot in self.client.get(self.url, self.params).data}
+        self.authenticate_user(other_user)
+        other = {slot['id']: slot['can_book'] for slot in self.client.get(self.url, self.params).data}
+
+        self.assertFalse(own[self.timeslot1.id])
+        self.assertFalse(other[self.timeslot1.id])
+        self.assertTrue(own[self.timeslot2.id])
+        self.assertTrue(other[self.timeslot2.id])
+
+    def test_booking_invalidates_snapshot(self):
+        """Test booking through the API bumps the version and refreshes the week"""
+        self.authenticate_user()
+        self.client.get(self.url, self.params)
+        version = get_calendar_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('user_create_booking'), {'time_slot': self.timeslot2.id})
+        response = self.client.get(self.url, self.params)
+
+        self.assertGreater(get_calendar_version(), version)
+        booked = {slot['id']: slot['is_booked'] for slot in response.data}
+        self.assertTrue(booked[self.timeslot2.id])
+
+    def test_admin_delete_invalidates_snapshot(self):
+        """Test deleting a slot removes it from the cached week"""
+        self.authenticate_admin()
+        self.client.get(self.url, self.params)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('admin_timeslot_detail', kwargs={'timeslot_id': self.timeslot2.id}))
+        response = self.client.get(self.url, self.params)
+
+        self.assertEqual([slot['id'] for slot in response.data], [self.timeslot1.id])
+
+    def test_window_inside_week_is_trimmed(self):
+        """Test a single date inside a cached week returns only that day"""
+        self.authenticate_user()
+        self.client.get(self.url, self.params)
+
+        day = timezone.localtime(self.timeslot1.start_time).date() + timedelta(days=1)
+        response = self.client.get(self.url, {'date': day.isoformat()})
+
+        self.assertEqual(response.data, [])
@@ -0,0 +1,99 @@
+"""
+Unit tests for signed WebSocket tickets
+A valid ticket authenticates the connection without a session lookup, other
+connections fall back to the session cookie
+"""
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser, User
+from django.core import signing
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from .base import BaseAPITestCase
+from .test_websocket_groups import UNBATCHED
+from bookings.consumers import CalendarConsumer
+from users.ws_tickets import TicketAuthMiddleware, TicketAuthMiddlewareStack, issue_ticket, ticket_user
+
+
+class TicketEndpointTest(BaseAPITestCase):
+    """Test POST /api/auth/ws-ticket/"""
+
+    def test_requires_authentication(self):
+        response = self.client.post(reverse('ws_ticket'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_issue(self):
+        self.authenticate_admin()
+        response = self.client.post(reverse('ws_ticket'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        self.assertEqual(response.data['expires_in'], 300)
+
+        user = ticket_user(response.data['ticket'])
+        self.assertEqual(user.pk, self.admin_user.pk)
+        self.assertTrue(user.is_staff)
+
+
+class TicketTest(SimpleTestCase):
+    """Test ticket checks, without database access"""
+
+    def setUp(self):
+        self.user = User(pk=7, is_staff=False)
+
+    def test_round_trip(self):
+        ticket, _ = issue_ticket(self.user)
+        user = ticket_user(ticket)
+        self.assertEqual((user.pk, user.is_staff, user.is_authenticated), (7, False, True))
+
+    def test_tampered(self):
+        ticket, _ = issue_ticket(self.user)
+        self.assertIsNone(ticket_user(ticket[:-1]))
+        forged = signing.dumps({'id': 1, 'staff': True, 'exp': 2 ** 40}, salt='other')
+        self.assertIsNone(ticket_user(forged))
+
+    def test_expired(self):
+        with override_settings(WS_TICKET_MAX_AGE=60):
+            ticket, expires = issue_ticket(self.user)
+        with patch('users.ws_tickets.time.time', return_value=expires + 1):
+            self.assertIsNone(ticket_user(ticket))
+        with patch('users.ws_tickets.time.time', return_value=expires):
+            self.assertIsNotNone(ticket_user(ticket))
+
+    def test_middleware(self):
+        scopes = []
+
+        async def app(scope, receive, send):
+            scopes.append(scope)
+
+        async def fallback(scope, receive, send):
+            scopes.append(dict(scope, user=AnonymousUser()))
+
+        middleware = TicketAuthMiddleware(app, fallback)
+        ticket, _ = issue_ticket(self.user)
+        for query in (f'ticket={ticket}', 'ticket=invalid', ''):
+            async_to_sync(middleware)({'type': 'websocket', 'query_string': query.encode()}, None, None)
+
+        self.assertEqual([scope['user'].pk for scope in scopes], [7, None, None])
+
+
+@override_settings(**UNBATCHED)
+class TicketConnectTest(SimpleTestCase):
+    """Test the calendar consumer accepts ticket connections"""
+
+    async def connect(self, query):
+        application = TicketAuthMiddlewareStack(CalendarConsumer.as_asgi())
+        communicator = WebsocketCommunicator(application, f'/ws/calendar/?{query}')
+        connected, _ = await communicator.connect()
+        await communicator.disconnect()
+        return connected
+
+    async def test_connect(self):
+        ticket, _ = issue_ticket(User(pk=7))
+        self.assertTrue(await self.connect(f'ticket={ticket}'))
+
+    async def test_invalid_ticket_without_session(self):
+        self.assertFalse(await self.connect('ticket=invalid'))
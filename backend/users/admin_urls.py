@@ -13,4 +13,7 @@ urlpatterns = [
     # Bookings management  
     path('bookings/', admin_views.admin_bookings_list, name='admin_bookings_list'),
     path('bookings/<int:booking_id>/', admin_views.admin_cancel_booking, name='admin_cancel_booking'),
+
+    # Auth protection counters
+    path('metrics/', admin_views.admin_metrics, name='admin_metrics'),
 ]
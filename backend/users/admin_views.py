@@ -6,11 +6,21 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.db.models import Prefetch
 from events.models import TimeSlot, Category
+from events.time_windows import TimeWindow
 from bookings.models import Booking
-from bookings.websocket_utils import send_timeslot_created_event, send_booking_cancelled_event, send_timeslot_deleted_event
+from bookings.services import cancel_booking
+from .fast_serializers import (
+    admin_timeslot_values, serialize_admin_timeslots, admin_booking_values, serialize_admin_bookings
+)
+from .pagination import KeysetPagination
+from .password_hashing import get_executor as get_hashing_executor
+from .rate_limits import get_limiter as get_rate_limiter
+from .streaming import is_stream_requested, streaming_list_response
 from .serializers import (
     TimeSlotSerializer, 
     BookingSerializer,
@@ -34,9 +44,11 @@ def admin_timeslots_list_create(request):
         ).order_by('start_time')
         
         # Filtering
-        date_filter = request.GET.get('date')
-        if date_filter:
-            queryset = queryset.filter(start_time__date=date_filter)
+        try:
+            window = TimeWindow.from_params(request.GET)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = window.apply(queryset, 'start_time')
         
         category_filter = request.GET.get('category')
         if category_filter:
@@ -48,17 +60,42 @@ def admin_timeslots_list_create(request):
         elif status_filter == 'available':
             queryset = queryset.filter(booking__isnull=True)
         
-        serializer = AdminTimeSlotSerializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data)
+        # Fast path: plain rows from .values() instead of model instances
+        fast = settings.FAST_LIST_SERIALIZERS
+        if fast:
+            queryset = admin_timeslot_values(queryset)
+        
+        # Keyset-пагинация по (start_time, id)
+        paginator = KeysetPagination('start_time')
+        if paginator.is_requested(request):
+            try:
+                queryset = paginator.paginate_queryset(queryset, request)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        elif is_stream_requested(request):
+            # Потоковая выдача всего списка без загрузки в память
+            if fast:
+                return streaming_list_response(request, queryset, serialize_admin_timeslots)
+            return streaming_list_response(
+                request, queryset,
+                lambda chunk: AdminTimeSlotSerializer(chunk, many=True, context={'request': request}).data
+            )
+        
+        if fast:
+            data = serialize_admin_timeslots(queryset)
+        else:
+            data = AdminTimeSlotSerializer(queryset, many=True, context={'request': request}).data
+        if paginator.is_requested(request):
+            return paginator.get_paginated_response(data)
+        return Response(data)
     
     elif request.method == 'POST':
         # Create a new time slot
         serializer = AdminTimeSlotCreateSerializer(data=request.data, context={'request': request})
         
         if serializer.is_valid():
+            # Событие в журнал изменений пишет сигнал post_save (см. bookings.models)
             timeslot = serializer.save(created_by=request.user)
-            # Отправляем WebSocket событие о новом временном слоте
-            send_timeslot_created_event(timeslot)
             
             return Response(
                 AdminTimeSlotSerializer(timeslot, context={'request': request}).data,
@@ -117,7 +154,6 @@ def admin_timeslot_detail(request, timeslot_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        send_timeslot_deleted_event(timeslot)
         timeslot.delete()
         
         return Response(
@@ -139,9 +175,11 @@ def admin_bookings_list(request):
     ).order_by('-booked_at')
     
     # Filtering
-    date_filter = request.GET.get('date')
-    if date_filter:
-        queryset = queryset.filter(time_slot__start_time__date=date_filter)
+    try:
+        window = TimeWindow.from_params(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    queryset = window.apply(queryset, 'time_slot__start_time')
     
     user_filter = request.GET.get('user')
     if user_filter:
@@ -151,17 +189,44 @@ def admin_bookings_list(request):
     if category_filter:
         queryset = queryset.filter(time_slot__category_id=category_filter)
     
-    # Pagination support
-    limit = request.GET.get('limit')
-    if limit:
+    # Fast path: plain rows from .values() instead of model instances
+    fast = settings.FAST_LIST_SERIALIZERS
+    if fast:
+        queryset = admin_booking_values(queryset)
+    
+    # Keyset-пагинация по (booked_at, id) с курсором на следующую страницу
+    paginator = KeysetPagination('booked_at', descending=True)
+    if paginator.is_requested(request):
         try:
-            limit = int(limit)
-            queryset = queryset[:limit]
-        except ValueError:
-            pass
+            queryset = paginator.paginate_queryset(queryset, request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        # Legacy limit without a next page
+        limit = request.GET.get('limit')
+        if limit:
+            try:
+                limit = int(limit)
+                queryset = queryset[:limit]
+            except ValueError:
+                pass
+        
+        if is_stream_requested(request):
+            # Потоковая выдача всего списка без загрузки в память
+            if fast:
+                return streaming_list_response(request, queryset, serialize_admin_bookings)
+            return streaming_list_response(
+                request, queryset,
+                lambda chunk: AdminBookingSerializer(chunk, many=True, context={'request': request}).data
+            )
     
-    serializer = AdminBookingSerializer(queryset, many=True, context={'request': request})
-    return Response(serializer.data)
+    if fast:
+        data = serialize_admin_bookings(queryset)
+    else:
+        data = AdminBookingSerializer(queryset, many=True, context={'request': request}).data
+    if paginator.is_requested(request):
+        return paginator.get_paginated_response(data)
+    return Response(data)
 
 
 @api_view(['DELETE'])
@@ -171,35 +236,26 @@ def admin_cancel_booking(request, booking_id):
     DELETE /api/admin/bookings/{id}/
     Cancel a specific booking (admin only)
     """
-    booking = get_object_or_404(
-        Booking.objects.select_related('user', 'time_slot__category'),
-        id=booking_id
-    )
-    
-    # Подготавливаем данные для WebSocket события перед удалением
-    booking_data = {
-        'id': booking.id,
-        'timeslot_id': booking.time_slot.id,
-        'user': {
-            'id': booking.user.id,
-            'username': booking.user.username,
-        },
-        'timeslot': {
-            'id': booking.time_slot.id,
-            'date': booking.time_slot.start_time.date().isoformat(),
-            'start_time': booking.time_slot.start_time.strftime('%H:%M'),
-            'end_time': booking.time_slot.end_time.strftime('%H:%M'),
-            'category': booking.time_slot.category.name,
-        },
-    }
-    
     # Admins can cancel any booking regardless of timing rules
-    booking.delete()
-    
-    # Отправляем WebSocket событие об отмене бронирования
-    send_booking_cancelled_event(booking_data)
+    try:
+        cancel_booking(booking_id, allow_past=True)
+    except Booking.DoesNotExist:
+        raise Http404
     
     return Response(
         {"message": f"Booking {booking_id} cancelled successfully"},
         status=status.HTTP_204_NO_CONTENT
     )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_metrics(request):
+    """
+    GET /api/admin/metrics/
+    Auth protection counters of the process serving the request (admin only)
+    """
+    return Response({
+        'password_hashing': get_hashing_executor().metrics(),
+        'rate_limits': get_rate_limiter().metrics(),
+    })
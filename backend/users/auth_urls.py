@@ -14,4 +14,7 @@ urlpatterns = [
     path('logout/', auth_views.logout_view, name='auth_logout'),
     path('register/', auth_views.register_view, name='auth_register'),
     path('user/', auth_views.user_info_view, name='auth_user_info'),
+    
+    # Signed ticket for the WebSocket connection
+    path('ws-ticket/', auth_views.ws_ticket_view, name='ws_ticket'),
 ]
@@ -2,19 +2,24 @@
 Authentication views
 Views for login, logout, registration, and user info
 """
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import HttpResponseNotAllowed, JsonResponse
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.models import User
 from django.middleware.csrf import get_token
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
 from allauth.socialaccount.models import SocialAccount
+from users.password_hashing import HashingBusy, authenticate_user, hash_password
+from users.rate_limits import check_auth_rate_limit
+from users.ws_tickets import issue_ticket
+from asgiref.sync import sync_to_async
 import json
+import math
+import time
 
 
 @api_view(['GET'])
@@ -29,12 +34,71 @@ def csrf_token_view(request):
     })
 
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def login_view(request):
+def user_payload(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'is_staff': user.is_staff,
+        'is_authenticated': True
+    }
+
+
+def hashing_busy_response():
+    """503 when the password hashing queue is full (users.password_hashing)"""
+    response = JsonResponse({
+        'success': False,
+        'error': 'Too many sign-in attempts in progress, please retry shortly'
+    }, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+def rate_limited_response(retry_after):
+    """429, когда исчерпан лимит попыток для IP или username (users.rate_limits)"""
+    response = JsonResponse({
+        'success': False,
+        'error': 'Too many attempts, please try again later'
+    }, status=429)
+    response['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+def oauth_only_response(username):
+    """
+    401 для email, зарегистрированного через OAuth, иначе None
+    """
+    # Проверяем, может ли это быть email вместо username
+    try:
+        if '@' in username:  # Пользователь ввел email
+            user_by_email = User.objects.get(email=username)
+
+            # Проверяем, есть ли у пользователя social accounts
+            social_accounts = SocialAccount.objects.filter(user=user_by_email)
+
+            if social_accounts.exists():
+                # У пользователя есть OAuth аккаунт - направляем на OAuth
+                providers = list(social_accounts.values_list('provider', flat=True))
+                return JsonResponse({
+                    'success': False,
+                    'error_type': 'oauth_only_account',
+                    'error': f'This account was created with {", ".join(providers).title()}. Please sign in using OAuth.',
+                    'email': username,
+                    'available_providers': providers
+                }, status=401)
+
+    except User.DoesNotExist:
+        pass
+    return None
+
+
+async def login_view(request):
     """
     User login endpoint with OAuth account detection
+    Async: the password check runs on the hashing executor, not on a request thread
     """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
     try:
         data = json.loads(request.body)
         username = data.get('username')
@@ -46,43 +110,24 @@ def login_view(request):
                 'error': 'Username and password are required'
             }, status=400)
         
+        # Лимит попыток проверяем до хеширования и запросов к базе
+        retry_after = await sync_to_async(check_auth_rate_limit)(request, username)
+        if retry_after is not None:
+            return rate_limited_response(retry_after)
+        
         # Попытка аутентификации
-        user = authenticate(request, username=username, password=password)
+        user = await authenticate_user(request, username, password)
         
         if user is not None:
-            login(request, user)
+            await sync_to_async(login)(request, user)
             return JsonResponse({
                 'success': True,
-                'user': {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'is_staff': user.is_staff,
-                    'is_authenticated': True
-                }
+                'user': user_payload(user)
             })
         else:
-            # Проверяем, может ли это быть email вместо username
-            try:
-                if '@' in username:  # Пользователь ввел email
-                    user_by_email = User.objects.get(email=username)
-                    
-                    # Проверяем, есть ли у пользователя social accounts
-                    social_accounts = SocialAccount.objects.filter(user=user_by_email)
-                    
-                    if social_accounts.exists():
-                        # У пользователя есть OAuth аккаунт - направляем на OAuth
-                        providers = list(social_accounts.values_list('provider', flat=True))
-                        return JsonResponse({
-                            'success': False,
-                            'error_type': 'oauth_only_account',
-                            'error': f'This account was created with {", ".join(providers).title()}. Please sign in using OAuth.',
-                            'email': username,
-                            'available_providers': providers
-                        }, status=401)
-                
-            except User.DoesNotExist:
-                pass
+            response = await sync_to_async(oauth_only_response)(username)
+            if response is not None:
+                return response
             
             return JsonResponse({
                 'success': False,
@@ -94,6 +139,8 @@ def login_view(request):
             'success': False,
             'error': 'Invalid JSON data'
         }, status=400)
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -101,6 +148,10 @@ def login_view(request):
         }, status=500)
 
 
+# Асинхронные view: декораторы Django 4.2 оборачивают их в синхронные функции
+login_view.csrf_exempt = True
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def logout_view(request):
@@ -141,81 +192,125 @@ def user_info_view(request):
         })
 
 
-@csrf_exempt
 @api_view(['POST'])
-@permission_classes([AllowAny])
-def register_view(request):
+@permission_classes([IsAuthenticated])
+def ws_ticket_view(request):
+    """
+    Issue a signed ticket for the WebSocket connection (see users.ws_tickets)
+    """
+    ticket, expires = issue_ticket(request.user)
+    response = Response({
+        'ticket': ticket,
+        'expires_in': expires - int(time.time()),
+    })
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def registration_conflict(username, email):
+    """
+    Ответ с ошибкой, если username или email уже заняты, иначе None
+    """
+    # Проверяем существование пользователя по username
+    if User.objects.filter(username=username).exists():
+        return JsonResponse({
+            'success': False,
+            'error': 'Username already exists'
+        }, status=400)
+    
+    # Проверяем существование пользователя по email
+    if email and User.objects.filter(email=email).exists():
+        existing_user = User.objects.get(email=email)
+        
+        # Проверяем, есть ли у этого пользователя social accounts
+        social_accounts = SocialAccount.objects.filter(user=existing_user)
+        
+        if social_accounts.exists():
+            # Пользователь зарегистрирован через OAuth - НЕ разрешаем обычную регистрацию
+            providers = list(social_accounts.values_list('provider', flat=True))
+            return JsonResponse({
+                'success': False,
+                'error_type': 'oauth_account_exists',
+                'error': f'Account with this email already exists and was created via {", ".join(providers).title()}. Please sign in using OAuth.',
+                'email': email,
+                'available_providers': providers
+            }, status=409)
+        else:
+            # Пользователь уже зарегистрирован обычным способом
+            return JsonResponse({
+                'success': False,
+                'error_type': 'regular_account_exists', 
+                'error': 'User with this email already exists. Please sign in with your password.',
+                'email': email
+            }, status=409)
+    return None
+
+
+def create_registered_user(username, email, encoded_password):
+    """
+    create_user() с уже посчитанным хешем пароля
+    """
+    user = User(
+        username=User.normalize_username(username),
+        email=User.objects.normalize_email(email),
+        password=encoded_password
+    )
+    user.save()
+    return user
+
+
+async def register_view(request):
     """
     User registration endpoint with OAuth account detection
+    Async: the password is hashed on the hashing executor, not on a request thread
     """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
     try:
-        username = request.data.get('username')
-        password = request.data.get('password')
-        email = request.data.get('email', '')
+        data = json.loads(request.body)
+        username = data.get('username')
+        password = data.get('password')
+        email = data.get('email', '')
         
         if not username or not password:
-            return Response({
+            return JsonResponse({
                 'success': False,
                 'error': 'Username and password are required'
-            }, status=status.HTTP_400_BAD_REQUEST)
+            }, status=400)
         
-        # Проверяем существование пользователя по username
-        if User.objects.filter(username=username).exists():
-            return Response({
-                'success': False,
-                'error': 'Username already exists'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        retry_after = await sync_to_async(check_auth_rate_limit)(request, username)
+        if retry_after is not None:
+            return rate_limited_response(retry_after)
         
-        # Проверяем существование пользователя по email
-        if email and User.objects.filter(email=email).exists():
-            existing_user = User.objects.get(email=email)
-            
-            # Проверяем, есть ли у этого пользователя social accounts
-            social_accounts = SocialAccount.objects.filter(user=existing_user)
-            
-            if social_accounts.exists():
-                # Пользователь зарегистрирован через OAuth - НЕ разрешаем обычную регистрацию
-                providers = list(social_accounts.values_list('provider', flat=True))
-                return Response({
-                    'success': False,
-                    'error_type': 'oauth_account_exists',
-                    'error': f'Account with this email already exists and was created via {", ".join(providers).title()}. Please sign in using OAuth.',
-                    'email': email,
-                    'available_providers': providers
-                }, status=status.HTTP_409_CONFLICT)
-            else:
-                # Пользователь уже зарегистрирован обычным способом
-                return Response({
-                    'success': False,
-                    'error_type': 'regular_account_exists', 
-                    'error': 'User with this email already exists. Please sign in with your password.',
-                    'email': email
-                }, status=status.HTTP_409_CONFLICT)
+        response = await sync_to_async(registration_conflict)(username, email)
+        if response is not None:
+            return response
         
         # Создаем нового пользователя
-        user = User.objects.create_user(
-            username=username,
-            password=password,
-            email=email
-        )
+        encoded_password = await hash_password(password)
+        user = await sync_to_async(create_registered_user)(username, email, encoded_password)
         
         # Auto-login after registration with explicit backend
         user.backend = 'django.contrib.auth.backends.ModelBackend'
-        login(request, user)
+        await sync_to_async(login)(request, user)
         
-        return Response({
+        return JsonResponse({
             'success': True,
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'is_staff': user.is_staff,
-                'is_authenticated': True
-            }
+            'user': user_payload(user)
         })
         
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON data'
+        }, status=400)
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
-        return Response({
+        return JsonResponse({
             'success': False,
             'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        }, status=500)
+
+
+register_view.csrf_exempt = True
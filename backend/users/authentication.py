@@ -0,0 +1,64 @@
+"""
+API authentication classes
+Token lookups are cached for TOKEN_CACHE_TIMEOUT seconds, so a client polling
+the API authenticates with a cache hit instead of a Token join User query.
+Only the user's columns without the password hash are cached: the user is
+rebuilt with the password deferred (it loads on access and save() leaves it
+alone), the token from the key of the request.
+Cached entries are dropped when the token is deleted or its user is saved
+(e.g. deactivated), see users.models; changes made with queryset.update()
+bypass the signals and take effect when the entry expires.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import authentication
+
+
+def token_cache_key(key):
+    # Tokens are credentials, the cache only sees their hash
+    return f'auth:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def cached_user_fields():
+    return [field.attname for field in get_user_model()._meta.concrete_fields if field.attname != 'password']
+
+
+def forget_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def is_token_request(request):
+    auth = authentication.get_authorization_header(request).split()
+    return bool(auth) and auth[0].lower() == CachedTokenAuthentication.keyword.lower().encode()
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    """TokenAuthentication with the token's user cached"""
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        field_names = cached_user_fields()
+        values = cache.get(cache_key)
+        if values is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, [getattr(user, name) for name in field_names], settings.TOKEN_CACHE_TIMEOUT)
+            return (user, token)
+        user = get_user_model().from_db(DEFAULT_DB_ALIAS, field_names, values)
+        return (user, self.get_model()(key=key, user=user))
+
+
+class SessionAuthentication(authentication.SessionAuthentication):
+    """
+    SessionAuthentication that leaves requests with a token Authorization
+    header to token authentication, so they skip the session and CSRF checks
+    even when the client also sends a session cookie
+    """
+
+    def authenticate(self, request):
+        if is_token_request(request):
+            return None
+        return super().authenticate(request)
@@ -0,0 +1,144 @@
+"""
+Per-day digests for calendar reconciliation
+A client sends one digest per (day, category) bucket it holds and gets back
+the slots of the buckets whose digest differs from the server's. A digest is
+the first DIGEST_LENGTH hex digits of the SHA-256 of the bucket's slots, one
+line per slot ordered by (start_time, id) and joined with newlines:
+
+    <id>|<start epoch seconds>|<end epoch seconds>|<booked_by or empty>
+
+An empty bucket has the digest of the empty string. Server digests come from
+one aggregate query over TimeSlot left-joined to Booking.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.db.models import BigIntegerField, CharField, Func, Q, Value
+from django.db.models.functions import Concat, TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from bookings.availability import BusyIntervals
+from events.models import TimeSlot
+from events.time_windows import TimeWindow
+from users.fast_serializers import timeslot_values, serialize_timeslots
+
+DIGEST_LENGTH = 16
+
+EMPTY_DIGEST = hashlib.sha256(b'').hexdigest()[:DIGEST_LENGTH]
+
+# Longer windows have to be reconciled in parts
+MAX_DIGEST_DAYS = getattr(settings, 'CALENDAR_DIGEST_MAX_DAYS', 62)
+
+
+class Epoch(Func):
+    # Whole seconds rounded down, like int(datetime.timestamp()) in digest_slots;
+    # a bare ::bigint cast would round
+    template = 'floor(EXTRACT(EPOCH FROM %(expressions)s))::bigint'
+    output_field = BigIntegerField()
+
+
+class Digest(Func):
+    template = f"left(encode(sha256(convert_to(%(expressions)s, 'UTF8')), 'hex'), {DIGEST_LENGTH})"
+    output_field = CharField()
+
+
+def bucket_key(day, category_id):
+    return f'{day.isoformat()}/{category_id}'
+
+
+def parse_bucket_key(key):
+    """(day, category_id) from a 'YYYY-MM-DD/<category id>' key"""
+    day, _, category_id = str(key).partition('/')
+    try:
+        return TimeWindow.parse_date(day), int(category_id)
+    except ValueError:
+        raise ValueError(f'Invalid digest key: {key}')
+
+
+def digest_slots(slots):
+    """Digest of serialized slots (start_time and end_time as ISO 8601 strings)"""
+    lines = sorted(
+        (int(parse_datetime(slot['start_time']).timestamp()), slot['id'],
+         int(parse_datetime(slot['end_time']).timestamp()), slot.get('booked_by') or '')
+        for slot in slots
+    )
+    text = '\n'.join(f'{slot_id}|{start}|{end}|{booked_by}' for start, slot_id, end, booked_by in lines)
+    return hashlib.sha256(text.encode()).hexdigest()[:DIGEST_LENGTH]
+
+
+def window_days(window, tz):
+    """Local days covered by a bounded window"""
+    if window.start is None or window.end is None:
+        raise ValueError('start_date and end_date are required')
+    first = timezone.localtime(window.start, tz).date()
+    last = timezone.localtime(window.end - timedelta(microseconds=1), tz).date()
+    if (last - first).days >= MAX_DIGEST_DAYS:
+        raise ValueError(f'At most {MAX_DIGEST_DAYS} days can be reconciled at once')
+    return {first + timedelta(days=offset) for offset in range((last - first).days + 1)}
+
+
+def bucket_digests(window, tz, category_ids=None):
+    """Digests of the non-empty buckets in window by bucket key, in one query"""
+    queryset = window.apply(TimeSlot.objects.all(), 'start_time')
+    if category_ids is not None:
+        queryset = queryset.filter(category_id__in=category_ids)
+
+    line = Concat(
+        'id', Value('|'), Epoch('start_time'), Value('|'), Epoch('end_time'),
+        Value('|'), 'booking__user__username',
+        output_field=CharField()
+    )
+    rows = (
+        queryset.annotate(day=TruncDate('start_time', tzinfo=tz))
+        .values('day', 'category_id')
+        .annotate(digest=Digest(StringAgg(line, delimiter='\n', ordering=('start_time', 'id'))))
+        .order_by()
+    )
+    return {bucket_key(row['day'], row['category_id']): row['digest'] for row in rows}
+
+
+def reconcile(window, tz, category_ids, client_digests, user):
+    """
+    Buckets of window whose digest differs from client_digests, as a list of
+    {date, category, digest, timeslots}. A bucket the client does not list
+    counts as empty; keys outside the window or the categories are ignored.
+    """
+    days = window_days(window, tz)
+    client = {}
+    for key, digest in client_digests.items():
+        day, category_id = parse_bucket_key(key)
+        if day in days and (category_ids is None or category_id in category_ids):
+            client[bucket_key(day, category_id)] = digest
+
+    server = bucket_digests(window, tz, category_ids)
+    stale = sorted(
+        parse_bucket_key(key) for key in server.keys() | client.keys()
+        if server.get(key, EMPTY_DIGEST) != client.get(key, EMPTY_DIGEST)
+    )
+    if not stale:
+        return []
+
+    buckets = {}
+    bucket_filter = Q()
+    for day, category_id in stale:
+        buckets[(day, category_id)] = {
+            'date': day.isoformat(),
+            'category': category_id,
+            'digest': server.get(bucket_key(day, category_id), EMPTY_DIGEST),
+            'timeslots': [],
+        }
+        bucket_filter |= Q(
+            category_id=category_id,
+            start_time__gte=TimeWindow.day_start(day, tz),
+            start_time__lt=TimeWindow.day_start(day + timedelta(days=1), tz),
+        )
+
+    rows = list(timeslot_values(TimeSlot.objects.filter(bucket_filter)).order_by('start_time', 'id'))
+    data = serialize_timeslots(rows, BusyIntervals.for_slots(user, rows))
+    for row, slot in zip(rows, data):
+        day = timezone.localtime(row['start_time'], tz).date()
+        buckets[(day, row['category_id'])]['timeslots'].append(slot)
+    return list(buckets.values())
@@ -0,0 +1,37 @@
+"""
+Conditional GET support for calendar endpoints
+The ETag combines the calendar version with the requesting user, so an
+unchanged refresh gets 304 Not Modified before any queryset is built.
+can_book and can_cancel also flip when a slot starts, so the ETag carries the
+start of the next slot to begin as well; it is cached per calendar version.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from events.calendar_version import get_calendar_version
+from events.models import TimeSlot
+
+
+def next_slot_start(version):
+    """Epoch of the next slot start not yet passed, '' when there is none"""
+    key = f'calendar:next_start:{version}'
+    now = timezone.now()
+    next_start = cache.get(key)
+    # A slot stays bookable at its start time and flips right after it
+    if next_start is None or (next_start and next_start < now.timestamp()):
+        start = TimeSlot.objects.filter(start_time__gte=now).aggregate(start=Min('start_time'))['start']
+        next_start = start.timestamp() if start else ''
+        cache.set(key, next_start, settings.CALENDAR_SNAPSHOT_TIMEOUT)
+    return next_start
+
+
+def calendar_etag(request, *args, **kwargs):
+    """ETag for per-user calendar data"""
+    version = get_calendar_version()
+    return f'{version}-{request.user.pk}-{next_slot_start(version)}'
+
+
+calendar_condition = condition(etag_func=calendar_etag)
@@ -0,0 +1,189 @@
+"""
+Fast-path list serialization
+Builds list payloads from .values() rows with plain dict assembly instead of
+model instances and per-field serializer dispatch. The output renders to the
+same JSON bytes as the ModelSerializers in users.serializers, which remain
+the reference implementation and are used for single objects.
+"""
+from django.utils import timezone
+
+TIMESLOT_VALUES = (
+    'id', 'category_id', 'category__name', 'start_time', 'end_time',
+    'booking__id', 'booking__user__username', 'created_by_id', 'created_at',
+)
+
+ADMIN_TIMESLOT_VALUES = (
+    'id', 'category_id', 'category__name', 'start_time', 'end_time',
+    'booking__id', 'booking__user_id', 'booking__user__username',
+    'booking__user__email', 'booking__booked_at',
+    'created_by_id', 'created_by__username', 'created_at',
+)
+
+USER_BOOKING_VALUES = (
+    'id', 'booked_at', 'user__username', 'time_slot_id',
+    'time_slot__category_id', 'time_slot__category__name',
+    'time_slot__start_time', 'time_slot__end_time',
+    'time_slot__created_by_id', 'time_slot__created_at',
+)
+
+ADMIN_BOOKING_VALUES = (
+    'id', 'booked_at', 'user_id', 'user__username', 'user__email', 'user__is_staff',
+    'time_slot_id', 'time_slot__category_id', 'time_slot__category__name',
+    'time_slot__start_time', 'time_slot__end_time',
+)
+
+
+def format_datetime(value, tz):
+    """Same output as DRF DateTimeField with the default ISO 8601 format"""
+    if not value:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _values(queryset, fields):
+    # Prefetches cannot be applied to dict rows; the joins replace them
+    return queryset.prefetch_related(None).values(*fields)
+
+
+def timeslot_values(queryset):
+    return _values(queryset, TIMESLOT_VALUES)
+
+
+def admin_timeslot_values(queryset):
+    return _values(queryset, ADMIN_TIMESLOT_VALUES)
+
+
+def user_booking_values(queryset):
+    return _values(queryset, USER_BOOKING_VALUES)
+
+
+def admin_booking_values(queryset):
+    return _values(queryset, ADMIN_BOOKING_VALUES)
+
+
+def serialize_timeslots(rows, busy_intervals=None):
+    """
+    Equivalent of TimeSlotSerializer(many=True).
+    can_book is computed from busy_intervals and is False without them,
+    as for a request without an authenticated user.
+    """
+    tz = timezone.get_current_timezone()
+    now = timezone.now()
+    data = []
+    for row in rows:
+        start_time = row['start_time']
+        end_time = row['end_time']
+        is_booked = row['booking__id'] is not None
+        can_book = (
+            busy_intervals is not None
+            and start_time >= now
+            and not is_booked
+            and not busy_intervals.overlaps(start_time, end_time)
+        )
+        data.append({
+            'id': row['id'],
+            'category': row['category_id'],
+            'category_name': row['category__name'],
+            'start_time': format_datetime(start_time, tz),
+            'end_time': format_datetime(end_time, tz),
+            'is_booked': is_booked,
+            'booked_by': row['booking__user__username'],
+            'can_book': can_book,
+            'created_by': row['created_by_id'],
+            'created_at': format_datetime(row['created_at'], tz),
+        })
+    return data
+
+
+def serialize_admin_timeslots(rows):
+    """Equivalent of AdminTimeSlotSerializer(many=True)"""
+    tz = timezone.get_current_timezone()
+    now = timezone.now()
+    data = []
+    for row in rows:
+        start_time = row['start_time']
+        booking_info = None
+        if row['booking__id'] is not None:
+            booking_info = {
+                'booking_id': row['booking__id'],
+                'user_id': row['booking__user_id'],
+                'username': row['booking__user__username'],
+                'user_email': row['booking__user__email'],
+                # Left as datetime like the serializer method field does
+                'booked_at': row['booking__booked_at'],
+                'can_cancel': start_time >= now,
+            }
+        data.append({
+            'id': row['id'],
+            'category': row['category_id'],
+            'category_name': row['category__name'],
+            'start_time': format_datetime(start_time, tz),
+            'end_time': format_datetime(row['end_time'], tz),
+            'is_booked': booking_info is not None,
+            'booking_info': booking_info,
+            'created_by': row['created_by_id'],
+            'created_by_username': row['created_by__username'],
+            'created_at': format_datetime(row['created_at'], tz),
+        })
+    return data
+
+
+def serialize_user_bookings(rows):
+    """
+    Equivalent of UserBookingSerializer(many=True) without context:
+    the nested slot is booked by the booking's user and can_book is False.
+    """
+    tz = timezone.get_current_timezone()
+    now = timezone.now()
+    data = []
+    for row in rows:
+        start_time = row['time_slot__start_time']
+        data.append({
+            'id': row['id'],
+            'time_slot': {
+                'id': row['time_slot_id'],
+                'category': row['time_slot__category_id'],
+                'category_name': row['time_slot__category__name'],
+                'start_time': format_datetime(start_time, tz),
+                'end_time': format_datetime(row['time_slot__end_time'], tz),
+                'is_booked': True,
+                'booked_by': row['user__username'],
+                'can_book': False,
+                'created_by': row['time_slot__created_by_id'],
+                'created_at': format_datetime(row['time_slot__created_at'], tz),
+            },
+            'booked_at': format_datetime(row['booked_at'], tz),
+            'can_cancel': start_time >= now,
+        })
+    return data
+
+
+def serialize_admin_bookings(rows):
+    """Equivalent of AdminBookingSerializer(many=True)"""
+    tz = timezone.get_current_timezone()
+    now = timezone.now()
+    data = []
+    for row in rows:
+        start_time = row['time_slot__start_time']
+        data.append({
+            'id': row['id'],
+            'user_info': {
+                'id': row['user_id'],
+                'username': row['user__username'],
+                'email': row['user__email'],
+                'is_staff': row['user__is_staff'],
+            },
+            'time_slot_info': {
+                'id': row['time_slot_id'],
+                'category_id': row['time_slot__category_id'],
+                'category_name': row['time_slot__category__name'],
+                'start_time': start_time,
+                'end_time': row['time_slot__end_time'],
+            },
+            'booked_at': format_datetime(row['booked_at'], tz),
+            'can_cancel': start_time >= now,
+        })
+    return data
@@ -0,0 +1,111 @@
+"""
+Keyset (cursor) pagination for list endpoints
+Pages are fetched with a range predicate on (value, id) instead of OFFSET,
+so the cost of a page does not depend on how deep into the list it is
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate a queryset ordered by a datetime field with the primary key
+    as tie-breaker. The cursor is an opaque token encoding the last row
+    of the previous page.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, field, descending=False):
+        self.field = field
+        self.descending = descending
+        self.next_cursor = None
+
+    def is_requested(self, request):
+        """Pagination is opt-in: enabled when the client sends a cursor or page size"""
+        return (
+            self.cursor_query_param in request.query_params
+            or self.page_size_query_param in request.query_params
+        )
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            page_size = int(value)
+        except ValueError:
+            raise ValueError('Invalid page size')
+        if page_size < 1:
+            raise ValueError('Invalid page size')
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, obj):
+        # Rows are model instances or dicts from a values() queryset
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj['id']
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        payload = json.dumps([value.isoformat(), pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw_value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            value = parse_datetime(raw_value)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise ValueError('Invalid cursor')
+        if value is None or not isinstance(pk, int):
+            raise ValueError('Invalid cursor')
+        return value, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return one page of results as a list.
+        Raises ValueError for a malformed cursor or page size.
+        """
+        page_size = self.get_page_size(request)
+
+        if self.descending:
+            queryset = queryset.order_by(f'-{self.field}', '-id')
+        else:
+            queryset = queryset.order_by(self.field, 'id')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            # The plain range condition lets the database use the index on
+            # the leading column; the OR only resolves ties on that value
+            if self.descending:
+                queryset = queryset.filter(
+                    Q(**{f'{self.field}__lt': value}) | Q(**{self.field: value, 'id__lt': pk}),
+                    **{f'{self.field}__lte': value}
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{self.field}__gt': value}) | Q(**{self.field: value, 'id__gt': pk}),
+                    **{f'{self.field}__gte': value}
+                )
+
+        page = list(queryset[:page_size + 1])
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        else:
+            self.next_cursor = None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_cursor,
+            'results': data,
+        })
@@ -0,0 +1,180 @@
+"""
+Password hashing off the request path
+PBKDF2 runs in a dedicated thread pool of PASSWORD_HASHING_WORKERS threads,
+so a login burst uses at most that many cores and never holds up the threads
+serving calendar requests. At most PASSWORD_HASHING_QUEUE hashes wait for a
+worker; beyond that callers get HashingBusy and the views answer 503.
+Queue and run times are kept per process, see HashingExecutor.metrics().
+authenticate_user() reproduces the username lookups of ModelBackend and of
+allauth's backend (username login) to hash off the database thread; with any
+other backend configured it calls Django's authenticate() instead.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from allauth.account import app_settings as account_settings
+from allauth.account.app_settings import AuthenticationMethod
+from allauth.account.utils import filter_users_by_username
+from django.conf import settings
+from django.contrib.auth import authenticate, load_backend, user_login_failed
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+ALLAUTH_BACKEND = 'allauth.account.auth_backends.AuthenticationBackend'
+
+
+class HashingBusy(Exception):
+    """The hashing queue is full"""
+
+
+class HashingExecutor:
+    """Bounded thread pool for password hashing, with queue-time metrics"""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+        self.run_time_total = 0.0
+
+    async def run(self, func, *args):
+        """Run func(*args) on a hashing worker, raise HashingBusy if the queue is full"""
+        with self.lock:
+            if self.pending >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise HashingBusy()
+            self.pending += 1
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                finished = time.perf_counter()
+                with self.lock:
+                    self.completed += 1
+                    self.queue_time_total += started - submitted
+                    self.queue_time_max = max(self.queue_time_max, started - submitted)
+                    self.run_time_total += finished - started
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, task)
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def metrics(self):
+        with self.lock:
+            completed = self.completed or 1
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'pending': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'queue_time_avg_ms': round(self.queue_time_total / completed * 1000, 3),
+                'queue_time_max_ms': round(self.queue_time_max * 1000, 3),
+                'run_time_avg_ms': round(self.run_time_total / completed * 1000, 3),
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = HashingExecutor(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE)
+        return _executor
+
+
+def verify_password(password, encoded):
+    """(is_correct, new_encoded or None) - new_encoded is set when the hasher or its iterations changed"""
+    updated = []
+    is_correct = check_password(password, encoded, setter=lambda raw: updated.append(make_password(raw)))
+    return is_correct, updated[0] if updated else None
+
+
+def user_lookups():
+    """
+    [(backend path, username lookup)] in AUTHENTICATION_BACKENDS order, or
+    None when a backend is configured whose lookup is not reproduced here
+    """
+    lookups = []
+    for path in settings.AUTHENTICATION_BACKENDS:
+        if path == MODEL_BACKEND:
+            lookups.append((path, User._default_manager.get_by_natural_key))
+        elif path == ALLAUTH_BACKEND and account_settings.AUTHENTICATION_METHOD == AuthenticationMethod.USERNAME:
+            # allauth matches usernames case-insensitively
+            lookups.append((path, lambda username: filter_users_by_username(username).get()))
+        else:
+            return None
+    return lookups
+
+
+def login_candidates(username, lookups):
+    """Users the backends would check, in order, each user once"""
+    candidates = []
+    for path, lookup in lookups:
+        try:
+            user = lookup(username)
+        except (User.DoesNotExist, User.MultipleObjectsReturned):
+            continue
+        if not any(candidate.pk == user.pk for candidate, _ in candidates):
+            candidates.append((user, path))
+    return candidates
+
+
+def save_password(user, encoded):
+    user.password = encoded
+    user.save(update_fields=['password'])
+
+
+async def authenticate_user(request, username, password):
+    """
+    Async authenticate(request, username=..., password=...) for the
+    username/password backends: user lookups run on the database thread,
+    password checks on the hashing executor. Raises HashingBusy.
+    """
+    lookups = user_lookups()
+    if lookups is None:
+        # Unknown backends authenticate as Django does, hashing on the database thread
+        return await sync_to_async(authenticate)(request, username=username, password=password)
+
+    executor = get_executor()
+    candidates = await sync_to_async(login_candidates)(username, lookups)
+    if not candidates:
+        # Same hashing cost as a wrong password, so response times don't reveal usernames
+        await executor.run(make_password, password)
+
+    for user, backend in candidates:
+        is_correct, encoded = await executor.run(verify_password, password, user.password)
+        if is_correct and load_backend(backend).user_can_authenticate(user):
+            if encoded:
+                await sync_to_async(save_password)(user, encoded)
+            user.backend = backend
+            return user
+
+    await sync_to_async(user_login_failed.send)(
+        sender=__name__,
+        credentials={'username': username, 'password': '********************'},
+        request=request,
+    )
+    return None
+
+
+async def hash_password(password):
+    """make_password on the hashing executor. Raises HashingBusy."""
+    return await get_executor().run(make_password, password)
@@ -0,0 +1,178 @@
+"""
+Token-bucket rate limits for the authentication endpoints
+Every login or registration attempt takes a token from the bucket of the
+client IP and from the bucket of the username. When either is empty the
+attempt is rejected with 429 before any password hashing or user query.
+A limit "N/S" holds N tokens and refills N tokens every S seconds.
+Buckets live in Redis (RATE_LIMIT_URL) and are shared by all backend
+processes; without it, or while Redis is unreachable, every process keeps
+its own buckets.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ('ip', 'username')
+
+# Takes a token from every bucket or from none. KEYS are the buckets, ARGV
+# their capacity and refill rate (tokens per second) in pairs. Returns the
+# 1-based index of the first empty bucket, or 0, and the seconds until it
+# holds a token again.
+TAKE_TOKENS = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    if tokens < 1 then
+        return {i, tostring((1 - tokens) / rate)}
+    end
+    levels[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', levels[i] - 1, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil((capacity - levels[i] + 1) / rate))
+end
+return {0, '0'}
+"""
+
+
+def parse_limit(value):
+    """'N/S' -> (capacity, tokens per second)"""
+    capacity, period = value.split('/')
+    return int(capacity), int(capacity) / float(period)
+
+
+def client_ip(request):
+    """
+    The client address; AUTH_RATE_LIMIT_IP_HEADER names the header the
+    reverse proxy sets (e.g. X-Real-IP), the last address in it is the one
+    the proxy saw
+    """
+    header = settings.AUTH_RATE_LIMIT_IP_HEADER
+    if header:
+        value = request.META.get('HTTP_' + header.upper().replace('-', '_'), '')
+        ip = value.split(',')[-1].strip()
+        if ip:
+            return ip
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class LocalBuckets:
+    """In-process token buckets"""
+
+    max_buckets = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (tokens, updated, full_at)
+        self.buckets = {}
+
+    def take(self, limits):
+        """limits: [(key, capacity, rate)] -> (index of the empty bucket or None, retry after)"""
+        now = time.monotonic()
+        with self.lock:
+            levels = []
+            for index, (key, capacity, rate) in enumerate(limits):
+                tokens, updated, _ = self.buckets.get(key, (capacity, now, now))
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                if tokens < 1:
+                    return index, (1 - tokens) / rate
+                levels.append(tokens)
+
+            if len(self.buckets) >= self.max_buckets:
+                # Full buckets are the same as missing ones
+                self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+            for (key, capacity, rate), tokens in zip(limits, levels):
+                self.buckets[key] = (tokens - 1, now, now + (capacity - tokens + 1) / rate)
+        return None, 0.0
+
+
+class RedisBuckets:
+    """Token buckets shared through Redis"""
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.script = self.client.register_script(TAKE_TOKENS)
+
+    def take(self, limits):
+        keys = [f'ratelimit:{key}' for key, _, _ in limits]
+        args = [value for _, capacity, rate in limits for value in (capacity, rate)]
+        index, retry_after = self.script(keys=keys, args=args)
+        return (int(index) - 1 if int(index) else None), float(retry_after)
+
+
+class AuthRateLimiter:
+    """IP and username limits for login and registration, with rejection counters"""
+
+    def __init__(self, url):
+        self.local = LocalBuckets()
+        self.redis = RedisBuckets(url) if url else None
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.rejected = dict.fromkeys(SCOPES, 0)
+        self.redis_errors = 0
+
+    def check(self, ip, username):
+        """Seconds to wait before retrying, or None when the attempt is allowed"""
+        # Usernames are matched case-insensitively on login; keys don't carry them in clear
+        username_key = hashlib.sha256(str(username).lower().encode()).hexdigest()
+        limits = [
+            (f'ip:{ip}', *parse_limit(settings.AUTH_RATE_LIMIT_IP)),
+            (f'username:{username_key}', *parse_limit(settings.AUTH_RATE_LIMIT_USERNAME)),
+        ]
+        index, retry_after = self.take(limits)
+        with self.lock:
+            self.checked += 1
+            if index is not None:
+                self.rejected[SCOPES[index]] += 1
+        return None if index is None else retry_after
+
+    def take(self, limits):
+        if self.redis is not None:
+            try:
+                return self.redis.take(limits)
+            except redis.RedisError:
+                logger.warning('Rate limit buckets unavailable in Redis, using in-process buckets', exc_info=True)
+                with self.lock:
+                    self.redis_errors += 1
+        return self.local.take(limits)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                'backend': 'redis' if self.redis is not None else 'local',
+                'checked': self.checked,
+                'rejected': dict(self.rejected),
+                'redis_errors': self.redis_errors,
+            }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AuthRateLimiter(settings.RATE_LIMIT_URL)
+        return _limiter
+
+
+def check_auth_rate_limit(request, username):
+    """Seconds to wait before retrying, or None when the attempt is allowed"""
+    return get_limiter().check(client_ip(request), username)
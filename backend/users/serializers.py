@@ -1,7 +1,10 @@
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError as DjangoValidationError
 from events.models import Category, TimeSlot
 from bookings.models import Booking
+from bookings.services import book_time_slot
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -43,34 +46,36 @@ class TimeSlotSerializer(serializers.ModelSerializer):
         if not request or not request.user.is_authenticated:
             return False
         
-        can_book, _ = Booking.can_book_slot(request.user, obj)
+        can_book, _ = Booking.can_book_slot(
+            request.user, obj, busy_intervals=self.context.get('busy_intervals')
+        )
         return can_book
 
 
 class BookingCreateSerializer(serializers.ModelSerializer):
-    """Serializer for creating bookings"""
+    """
+    Serializer for creating bookings.
+    The slot is looked up and checked by the booking service in the same
+    transaction as the insert, so only its id is validated here.
+    """
+    time_slot = serializers.IntegerField()
     
     class Meta:
         model = Booking
         fields = ['time_slot']
     
     def validate_time_slot(self, value):
-        """Validate time slot can be booked"""
+        """Validate the request can book"""
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             raise serializers.ValidationError("Authentication required")
         
-        can_book, message = Booking.can_book_slot(request.user, value)
-        if not can_book:
-            raise serializers.ValidationError(message)
-        
         return value
     
     def create(self, validated_data):
-        """Create booking with current user"""
+        """Create booking with current user, raises BookingError"""
         request = self.context.get('request')
-        validated_data['user'] = request.user
-        return super().create(validated_data)
+        return book_time_slot(request.user, validated_data['time_slot'])
 
 
 class BookingSerializer(serializers.ModelSerializer):
@@ -121,7 +126,6 @@ class AdminTimeSlotCreateSerializer(serializers.ModelSerializer):
         from django.utils import timezone
         start_time = data.get('start_time')
         end_time = data.get('end_time')
-        category = data.get('category')
         
         if start_time and end_time:
             if start_time >= end_time:
@@ -134,19 +138,19 @@ class AdminTimeSlotCreateSerializer(serializers.ModelSerializer):
             if not self.instance and start_time < timezone.now():
                 raise serializers.ValidationError("Cannot create time slots in the past")
 
-            queryset = TimeSlot.objects.filter(
-                start_time__lt=end_time,
-                end_time__gt=start_time,
-                category=category
-            )
-            if self.instance:
-                queryset = queryset.exclude(id=self.instance.id)
-
-            if queryset.exists():
-                raise serializers.ValidationError("Time slot overlaps with existing slot")
-
         return data
 
+    def save(self, **kwargs):
+        # Overlaps are checked by the database constraint on insert/update
+        try:
+            return super().save(**kwargs)
+        except DjangoValidationError as e:
+            if e.code != 'overlap':
+                raise
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: ["Time slot overlaps with existing slot"]}
+            ) from e
+
 class AdminTimeSlotSerializer(serializers.ModelSerializer):
     """Detailed serializer for time slots with booking info (admin view)"""
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -0,0 +1,68 @@
+"""
+Streamed JSON list responses
+Large lists are read with a server-side cursor and written out as a JSON
+array chunk by chunk, so memory use depends on the chunk size rather than
+on the number of rows. Under ASGI the chunks are produced by an async
+iterator; a sync one would be read into a list by Django before sending.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from calendar_project.renderers import dumps
+
+STREAM_CHUNK_SIZE = getattr(settings, 'LIST_STREAM_CHUNK_SIZE', 2000)
+
+
+def is_stream_requested(request):
+    return request.GET.get('stream', 'false').lower() == 'true'
+
+
+def iter_json_array(rows, serialize, chunk_size, tz):
+    """
+    Yield a JSON array of serialize(chunk) items as bytes.
+    serialize takes a list of rows and returns a list of dicts; it runs under
+    tz because the response is consumed after the view has returned.
+    """
+    rows = iter(rows)
+    separator = b'['
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        with timezone.override(tz):
+            data = serialize(chunk)
+        if data:
+            yield separator + b','.join(dumps(item) for item in data)
+            separator = b','
+    yield b']' if separator == b',' else b'[]'
+
+
+async def aiter_chunks(chunks):
+    """
+    Async iterator over a sync one. Every step runs on the request's sync
+    thread, where the server-side cursor and its connection live.
+    """
+    chunks = iter(chunks)
+    try:
+        while True:
+            chunk = await sync_to_async(next)(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+def streaming_list_response(request, queryset, serialize, chunk_size=None):
+    """Stream the serialized queryset as a JSON array"""
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    rows = queryset.iterator(chunk_size=chunk_size)
+    chunks = iter_json_array(rows, serialize, chunk_size, timezone.get_current_timezone())
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        chunks = aiter_chunks(chunks)
+    return StreamingHttpResponse(chunks, content_type='application/json')
@@ -9,6 +9,8 @@ urlpatterns = [
     # User API endpoints
     path('categories/', user_views.categories_list, name='user_categories'),
     path('timeslots/', user_views.timeslots_list, name='user_timeslots'),
+    path('timeslots/changes/', user_views.timeslot_changes, name='user_timeslot_changes'),
+    path('timeslots/reconcile/', user_views.timeslots_reconcile, name='user_timeslots_reconcile'),
     path('bookings/', user_views.create_booking, name='user_create_booking'),
     path('bookings/<int:booking_id>/', user_views.cancel_booking, name='user_cancel_booking'),
     path('user/bookings/', user_views.user_bookings, name='user_bookings_list'),
@@ -3,14 +3,24 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.conf import settings
+from django.http import Http404
+from django.db.models import Q, Prefetch
 from django.utils import timezone
-from datetime import datetime, timedelta
 
 from events.models import Category, TimeSlot
+from events.time_windows import TimeWindow
 from bookings.models import Booking
-from bookings.websocket_utils import send_booking_created_event, send_booking_cancelled_event
+from bookings.availability import BusyIntervals
+from bookings.outbox import changed_slots, last_sequence
+from bookings.services import BookingError, cancel_booking as cancel_booking_by_id
+from users.digests import reconcile
+from users.etags import calendar_condition
+from users.fast_serializers import (
+    timeslot_values, serialize_timeslots, user_booking_values, serialize_user_bookings
+)
+from users.pagination import KeysetPagination
+from users.week_snapshots import snapshot_timeslots
 from users.serializers import (
     CategorySerializer, TimeSlotSerializer,
     BookingCreateSerializer, BookingSerializer, UserBookingSerializer
@@ -26,40 +36,30 @@ def categories_list(request):
     return Response(serializer.data)
 
 
+def with_calendar_version(response, version):
+    """Заголовок X-Calendar-Version - since для первого запроса /api/timeslots/changes/"""
+    response['X-Calendar-Version'] = version
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@calendar_condition
 def timeslots_list(request):
     """GET /api/timeslots/ - слоты с фильтрацией по дате/категории"""
-    queryset = TimeSlot.objects.select_related('category', 'created_by').prefetch_related('booking')
+    # Версия журнала читается до слотов: изменения после неё клиент получит
+    # через /api/timeslots/changes/, повтор уже учтённых безвреден
+    version = last_sequence()
+    queryset = TimeSlot.objects.select_related('category', 'created_by').prefetch_related(
+        Prefetch('booking', queryset=Booking.objects.select_related('user'))
+    )
     
-    # Фильтрация по дате
-    date_param = request.GET.get('date')
-    if date_param:
-        try:
-            filter_date = datetime.strptime(date_param, '%Y-%m-%d').date()
-            queryset = queryset.filter(start_time__date=filter_date)
-        except ValueError:
-            return Response(
-                {'error': 'Invalid date format. Use YYYY-MM-DD'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-    
-    # Фильтрация по диапазону дат (неделя)
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    if start_date and end_date:
-        try:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
-            queryset = queryset.filter(
-                start_time__date__gte=start_dt,
-                start_time__date__lte=end_dt
-            )
-        except ValueError:
-            return Response(
-                {'error': 'Invalid date format. Use YYYY-MM-DD'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+    # Фильтрация по временному окну (date, start_date/end_date, from/to, tz)
+    try:
+        window = TimeWindow.from_params(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    queryset = window.apply(queryset, 'start_time')
     
     # Фильтрация по категориям
     categories = request.GET.getlist('categories')
@@ -71,11 +71,127 @@ def timeslots_list(request):
     if available_only:
         queryset = queryset.filter(booking__isnull=True)
     
-    # Сортировка по времени
-    queryset = queryset.order_by('start_time')
+    # Keyset-пагинация по (start_time, id) включается параметрами cursor/page_size
+    paginator = KeysetPagination('start_time')
+    paginated = paginator.is_requested(request)
     
-    serializer = TimeSlotSerializer(queryset, many=True, context={'request': request})
-    return Response(serializer.data)
+    # Ограниченное окно отдаётся из кэша недельных снапшотов без запроса слотов
+    if window.start and window.end and not paginated:
+        data = snapshot_timeslots(window, categories, request.user, available_only)
+        if data is not None:
+            return with_calendar_version(Response(data), version)
+    
+    # Быстрый путь: строки из .values() вместо экземпляров моделей
+    fast = settings.FAST_LIST_SERIALIZERS
+    if fast:
+        queryset = timeslot_values(queryset)
+    
+    if paginated:
+        try:
+            time_slots = paginator.paginate_queryset(queryset, request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        # Сортировка по времени
+        time_slots = list(queryset.order_by('start_time'))
+    
+    # Брони пользователя в видимом окне загружаются одним запросом,
+    # can_book считается в памяти для всех слотов
+    busy_intervals = BusyIntervals.for_slots(request.user, time_slots)
+    
+    if fast:
+        data = serialize_timeslots(time_slots, busy_intervals)
+    else:
+        data = TimeSlotSerializer(
+            time_slots, many=True,
+            context={'request': request, 'busy_intervals': busy_intervals}
+        ).data
+    if paginated:
+        return with_calendar_version(paginator.get_paginated_response(data), version)
+    return with_calendar_version(Response(data), version)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def timeslot_changes(request):
+    """GET /api/timeslots/changes/?since=<version> - слоты, изменившиеся после версии"""
+    try:
+        since = int(request.GET.get('since', ''))
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        return Response({'error': 'since must be a non-negative integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        window = TimeWindow.from_params(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    categories = request.GET.getlist('categories')
+    category_ids = None
+    if categories:
+        category_ids = list(Category.objects.filter(name__in=categories).values_list('id', flat=True))
+    
+    # Версия - номер события в журнале изменений, тот же seq, что в WebSocket
+    slot_ids, version = changed_slots(since, window, category_ids, user=request.user)
+    if slot_ids is None:
+        # События после since уже удалены из журнала - нужна полная загрузка
+        return Response(
+            {'error': 'Version is no longer available, reload the calendar', 'version': version},
+            status=status.HTTP_410_GONE
+        )
+    
+    queryset = window.apply(TimeSlot.objects.filter(id__in=slot_ids), 'start_time')
+    if categories:
+        queryset = queryset.filter(category__name__in=categories)
+    
+    fast = settings.FAST_LIST_SERIALIZERS
+    if fast:
+        time_slots = list(timeslot_values(queryset).order_by('start_time'))
+    else:
+        time_slots = list(queryset.select_related('category', 'created_by').prefetch_related(
+            Prefetch('booking', queryset=Booking.objects.select_related('user'))
+        ).order_by('start_time'))
+    busy_intervals = BusyIntervals.for_slots(request.user, time_slots)
+    
+    if fast:
+        data = serialize_timeslots(time_slots, busy_intervals)
+    else:
+        data = TimeSlotSerializer(
+            time_slots, many=True,
+            context={'request': request, 'busy_intervals': busy_intervals}
+        ).data
+    
+    # Удаленные слоты и слоты, ушедшие из окна, возвращаются только id
+    present = {item['id'] for item in data}
+    return Response({
+        'version': version,
+        'timeslots': data,
+        'deleted': sorted(slot_ids - present),
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def timeslots_reconcile(request):
+    """POST /api/timeslots/reconcile/ - слоты дней, дайджест которых отличается от клиентского"""
+    digests = request.data.get('digests', {})
+    categories = request.data.get('categories') or []
+    if not isinstance(digests, dict) or not isinstance(categories, list):
+        return Response({'error': 'digests must be an object and categories a list'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    params = {key: request.data[key] for key in ('start_date', 'end_date', 'tz') if key in request.data}
+    try:
+        tz = TimeWindow.parse_timezone(params.get('tz'))
+        window = TimeWindow.from_params(params)
+        category_ids = None
+        if categories:
+            category_ids = list(Category.objects.filter(name__in=categories).values_list('id', flat=True))
+        buckets = reconcile(window, tz, category_ids, digests, request.user)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'buckets': buckets})
 
 
 @api_view(['POST'])
@@ -84,10 +200,12 @@ def create_booking(request):
     """POST /api/bookings/ - создание бронирования"""
     serializer = BookingCreateSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
-        booking = serializer.save()
-        
-        # Отправляем WebSocket событие о новом бронировании
-        send_booking_created_event(booking)
+        try:
+            # Событие в журнал изменений пишет сигнал post_save (см. bookings.models)
+            booking = serializer.save()
+        except BookingError as e:
+            # 400 - нарушены правила бронирования, 409 - слот занят параллельным запросом
+            return Response({'time_slot': [e.message]}, status=e.status_code)
         
         response_serializer = UserBookingSerializer(booking)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
@@ -102,50 +220,23 @@ def cancel_booking(request, booking_id):
     if request.method == 'GET':
         return Response({'message': f'Test endpoint works for booking_id: {booking_id}'})
     
+    # Одно чтение с join и один DELETE; админ может отменить чужое бронирование
     try:
-        if request.user.is_staff:
-            booking = get_object_or_404(Booking, id=booking_id)
-        else:
-            booking = get_object_or_404(Booking, id=booking_id, user=request.user)
-        print(f"Found booking: {booking}")
-    except Exception as e:
-        print(f"Error finding booking: {e}")
-        raise
-    
-    can_cancel, message = booking.can_cancel()
-    if not can_cancel:
+        cancel_booking_by_id(booking_id, user=None if request.user.is_staff else request.user)
+    except Booking.DoesNotExist:
+        raise Http404
+    except BookingError as e:
         return Response(
-            {'error': message}, 
+            {'error': e.message}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Подготавливаем данные для WebSocket события перед удалением
-    booking_data = {
-        'id': booking.id,
-        'timeslot_id': booking.time_slot.id,
-        'user': {
-            'id': booking.user.id,
-            'username': booking.user.username,
-        },
-        'timeslot': {
-            'id': booking.time_slot.id,
-            'date': booking.time_slot.start_time.date().isoformat(),
-            'start_time': booking.time_slot.start_time.strftime('%H:%M'),
-            'end_time': booking.time_slot.end_time.strftime('%H:%M'),
-            'category': booking.time_slot.category.name,
-        },
-    }
-    
-    booking.delete()
-    
-    # Отправляем WebSocket событие об отмене бронирования
-    send_booking_cancelled_event(booking_data)
-    
     return Response({'message': 'Booking cancelled successfully'})
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@calendar_condition
 def user_bookings(request):
     """GET /api/user/bookings/ - мои бронирования"""
     bookings = Booking.objects.filter(user=request.user).select_related(
@@ -161,5 +252,22 @@ def user_bookings(request):
     elif status_filter == 'past':
         bookings = bookings.filter(time_slot__start_time__lt=now)
     
-    serializer = UserBookingSerializer(bookings, many=True)
-    return Response(serializer.data)
+    # Keyset-пагинация по (booked_at, id)
+    paginator = KeysetPagination('booked_at', descending=True)
+    fast = settings.FAST_LIST_SERIALIZERS
+    if fast:
+        bookings = user_booking_values(bookings)
+    
+    if paginator.is_requested(request):
+        try:
+            bookings = paginator.paginate_queryset(bookings, request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if fast:
+        data = serialize_user_bookings(bookings)
+    else:
+        data = UserBookingSerializer(bookings, many=True).data
+    if paginator.is_requested(request):
+        return paginator.get_paginated_response(data)
+    return Response(data)
@@ -0,0 +1,124 @@
+"""
+Week snapshots for the calendar read path
+The serialized time slots of one week and category set are cached under the
+current calendar version. Only the per-user can_book flag is computed per
+request, so a cached week is served without querying time slots.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from bookings.availability import BusyIntervals
+from events.calendar_version import get_calendar_version
+from events.models import TimeSlot
+from users.fast_serializers import timeslot_values, serialize_timeslots
+
+SNAPSHOT_TIMEOUT = getattr(settings, 'CALENDAR_SNAPSHOT_TIMEOUT', 60 * 60)
+
+# Wider windows go to the database directly instead of loading many weeks
+MAX_SNAPSHOT_WEEKS = getattr(settings, 'CALENDAR_SNAPSHOT_MAX_WEEKS', 6)
+
+
+def week_monday(value):
+    """Monday of the week containing value, in the current timezone"""
+    local_date = timezone.localtime(value).date()
+    return local_date - timedelta(days=local_date.weekday())
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def weeks_in_window(window):
+    """Mondays of all weeks overlapping the window"""
+    monday = week_monday(window.start)
+    mondays = []
+    while local_midnight(monday) < window.end:
+        mondays.append(monday)
+        monday += timedelta(days=7)
+    return mondays
+
+
+def snapshot_key(version, monday, categories):
+    category_part = ','.join(sorted(set(categories))).replace(' ', '_') or 'all'
+    return f'calendar:week:{version}:{monday.isoformat()}:{category_part}'
+
+
+def build_week_rows(monday, categories):
+    """
+    Serialize one week of slots.
+    Rows are (payload, start_time, end_time); can_book in the payload is a
+    placeholder that keeps the field order and is filled in per request.
+    """
+    queryset = TimeSlot.objects.filter(
+        start_time__gte=local_midnight(monday),
+        start_time__lt=local_midnight(monday + timedelta(days=7))
+    )
+    if categories:
+        queryset = queryset.filter(category__name__in=categories)
+
+    rows = list(timeslot_values(queryset.order_by('start_time', 'id')))
+    data = serialize_timeslots(rows)
+    return [
+        (payload, row['start_time'], row['end_time'])
+        for payload, row in zip(data, rows)
+    ]
+
+
+def get_week_rows(mondays, categories):
+    """Load week rows from the cache, building and storing the missing ones"""
+    version = get_calendar_version()
+    keys = {monday: snapshot_key(version, monday, categories) for monday in mondays}
+    cached = cache.get_many(keys.values())
+
+    weeks = []
+    for monday in mondays:
+        rows = cached.get(keys[monday])
+        if rows is None:
+            rows = build_week_rows(monday, categories)
+            cache.set(keys[monday], rows, SNAPSHOT_TIMEOUT)
+        weeks.append(rows)
+    return weeks
+
+
+def snapshot_timeslots(window, categories, user, available_only=False):
+    """
+    Serialized slots starting within a bounded window, with can_book for user.
+    Returns None when the window is too wide to be served from snapshots.
+    """
+    mondays = weeks_in_window(window)
+    if len(mondays) > MAX_SNAPSHOT_WEEKS:
+        return None
+
+    rows = []
+    for week_rows in get_week_rows(mondays, categories):
+        for row, start, end in week_rows:
+            if not window.start <= start < window.end:
+                continue
+            if available_only and row['is_booked']:
+                continue
+            rows.append((row, start, end))
+
+    if not rows:
+        return []
+
+    busy_intervals = BusyIntervals.for_user(
+        user,
+        min(start for _, start, _ in rows),
+        max(end for _, _, end in rows)
+    )
+
+    # Same rules as Booking.can_book_slot
+    now = timezone.now()
+    data = []
+    for row, start, end in rows:
+        row = dict(row)
+        row['can_book'] = (
+            start >= now
+            and not row['is_booked']
+            and not busy_intervals.overlaps(start, end)
+        )
+        data.append(row)
+    return data
@@ -0,0 +1,61 @@
+"""
+Signed WebSocket tickets
+An authenticated client gets a short-lived ticket from POST /api/auth/ws-ticket/
+and connects with ?ticket=<ticket>. The ticket carries the user id, is_staff
+and its expiry and is signed with SECRET_KEY, so the connection is
+authenticated without a session or user lookup. Without a valid ticket the
+connection falls back to the session cookie (AuthMiddlewareStack).
+
+A ticket stays valid until it expires, also after a logout; keep
+WS_TICKET_MAX_AGE short.
+"""
+import time
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+
+TICKET_SALT = 'users.ws_tickets'
+
+
+def issue_ticket(user):
+    """Signed ticket for user and its expiry as a Unix timestamp"""
+    expires = int(time.time()) + settings.WS_TICKET_MAX_AGE
+    ticket = signing.dumps({'id': user.pk, 'staff': user.is_staff, 'exp': expires}, salt=TICKET_SALT)
+    return ticket, expires
+
+
+def ticket_user(ticket):
+    """
+    Unsaved User with the id and is_staff of a valid ticket, None for an
+    invalid or expired one. Only the signature is checked, nothing is read
+    from the database.
+    """
+    try:
+        payload = signing.loads(ticket, salt=TICKET_SALT)
+    except signing.BadSignature:
+        return None
+    if payload['exp'] < time.time():
+        return None
+    return User(pk=payload['id'], is_staff=payload['staff'])
+
+
+class TicketAuthMiddleware:
+    """Set scope["user"] from the ticket query parameter or pass the connection to fallback"""
+
+    def __init__(self, inner, fallback):
+        self.inner = inner
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        params = parse_qs(scope.get('query_string', b'').decode())
+        user = ticket_user(params['ticket'][-1]) if 'ticket' in params else None
+        if user is None:
+            return await self.fallback(scope, receive, send)
+        return await self.inner(dict(scope, user=user), receive, send)
+
+
+def TicketAuthMiddlewareStack(inner):
+    return TicketAuthMiddleware(inner, AuthMiddlewareStack(inner))
@@ -4,7 +4,7 @@ import { MaterialModule } from '../../material.module';
 import { CategoryFilterComponent, CategorySelection, ErrorMessageService, ConfirmDialogService, AdminSlotFormComponent, CreateSlotData } from '../shared';
 import { Category, CATEGORIES } from '../../models/category.model';
 import { BookingService, TimeSlot } from '../../services/booking.service';
-import { WebSocketService } from '../../services/websocket.service';
+import { CalendarView, WebSocketService } from '../../services/websocket.service';
 import { AuthService } from '../../services/auth.service';
 import { ApiService } from '../../services/api.service';
 import { Subject, takeUntil } from 'rxjs';
@@ -59,6 +59,7 @@ export class CalendarComponent implements OnInit, OnDestroy {
     this.loadSelectionFromStorage();
     this.initializeWeek();
     this.setupWebSocketConnection();
+    this.updateSubscription();
     // Load user bookings first, then load time slots
     this.bookingService.loadUserBookings();
     this.loadTimeSlots();
@@ -80,6 +81,7 @@ export class CalendarComponent implements OnInit, OnDestroy {
   onCategorySelectionChange(selection: CategorySelection): void {
     this.categorySelection = { ...selection };
     this.saveSelectionToStorage();
+    this.updateSubscription();
     this.loadTimeSlots(); // Reload time slots when categories change
   }
 
@@ -87,12 +89,14 @@ export class CalendarComponent implements OnInit, OnDestroy {
   previousWeek(): void {
     this.currentWeekStart = new Date(this.currentWeekStart.getTime() - 7 * 24 * 60 * 60 * 1000);
     this.updateWeekDays();
+    this.updateSubscription();
     this.loadTimeSlots();
   }
 
   nextWeek(): void {
     this.currentWeekStart = new Date(this.currentWeekStart.getTime() + 7 * 24 * 60 * 60 * 1000);
     this.updateWeekDays();
+    this.updateSubscription();
     this.loadTimeSlots();
   }
 
@@ -603,20 +607,8 @@ export class CalendarComponent implements OnInit, OnDestroy {
     }
 
     this.isLoading = true;
-    
-    const selectedCategories = [];
-    if (this.categorySelection.cat1) selectedCategories.push('Cat 1');
-    if (this.categorySelection.cat2) selectedCategories.push('Cat 2');
-    if (this.categorySelection.cat3) selectedCategories.push('Cat 3');
-
-    const startDate = this.currentWeekStart.toISOString().split('T')[0];
-    const endDate = new Date(this.currentWeekStart.getTime() + 6 * 24 * 60 * 60 * 1000).toISOString().split('T')[0];
 
-    this.bookingService.getTimeSlots({
-      start_date: startDate,
-      end_date: endDate,
-      categories: selectedCategories
-    }).pipe(
+    this.bookingService.getTimeSlots(this.getCurrentView()).pipe(
       takeUntil(this.destroy$)
     ).subscribe({
       next: (slots) => {
@@ -643,11 +635,38 @@ export class CalendarComponent implements OnInit, OnDestroy {
     });
   }
 
+  private getCurrentView(): CalendarView {
+    const selectedCategories = [];
+    if (this.categorySelection.cat1) selectedCategories.push('Cat 1');
+    if (this.categorySelection.cat2) selectedCategories.push('Cat 2');
+    if (this.categorySelection.cat3) selectedCategories.push('Cat 3');
+
+    const startDate = this.currentWeekStart.toISOString().split('T')[0];
+    const endDate = new Date(this.currentWeekStart.getTime() + 6 * 24 * 60 * 60 * 1000).toISOString().split('T')[0];
+
+    return {
+      start_date: startDate,
+      end_date: endDate,
+      categories: selectedCategories
+    };
+  }
+
+  // Move the socket to the displayed week and categories
+  private updateSubscription(): void {
+    if (this.hasAnySelection) {
+      this.websocketService.subscribe(this.getCurrentView());
+    } else {
+      this.websocketService.unsubscribeAll();
+    }
+  }
+
   private setupWebSocketConnection(): void {
     this.websocketService.connect().pipe(
       takeUntil(this.destroy$)
     ).subscribe(message => {
-      if (message.type === 'booking_created' || message.type === 'booking_cancelled' || message.type === 'timeslot_created') {
+      if (message.type === 'booking_created' || message.type === 'booking_cancelled' ||
+          message.type === 'timeslot_created' || message.type === 'timeslot_updated' ||
+          message.type === 'resync') {
         // Refresh time slots when any booking-related event occurs
         this.loadTimeSlots();
       }
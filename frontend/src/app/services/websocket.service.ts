@@ -1,12 +1,32 @@
 import { Injectable } from '@angular/core';
-import { Observable, Subject } from 'rxjs';
+import { HttpClient } from '@angular/common/http';
+import { Observable, Subject, firstValueFrom } from 'rxjs';
 import { environment } from '../../environments/environment';
+import { CsrfService } from './csrf.service';
 
 export interface WebSocketMessage {
   type: string;
-  data: any;
+  data?: any;
+  [key: string]: any;
 }
 
+export interface CalendarView {
+  start_date: string;
+  end_date: string;
+  categories: string[];
+}
+
+interface WebSocketTicket {
+  ticket: string;
+  expires_in: number;
+}
+
+// Keeps idle connections from being dropped by proxies
+const PING_INTERVAL_MS = 30000;
+
+// A ticket expiring sooner than this is replaced before connecting
+const TICKET_MARGIN_MS = 30000;
+
 @Injectable({
   providedIn: 'root'
 })
@@ -14,22 +34,65 @@ export class WebSocketService {
   private socket!: WebSocket;
   private messageSubject = new Subject<WebSocketMessage>();
   public messages$ = this.messageSubject.asObservable();
+  // Current view, sent again after every reconnect
+  private view: CalendarView | null = null;
+  private pingTimer: ReturnType<typeof setInterval> | null = null;
+  // Sequence number of the last event received, to resume after a reconnect
+  private lastSeq: number | null = null;
+  // Signed ticket authenticating the connection without a session lookup,
+  // reused by reconnects until shortly before it expires
+  private ticket: string | null = null;
+  private ticketExpiresAt = 0;
+  private ticketTimer: ReturnType<typeof setTimeout> | null = null;
+  private connecting = false;
+
+  constructor(
+    private http: HttpClient,
+    private csrfService: CsrfService
+  ) {}
 
   connect(): Observable<WebSocketMessage> {
-    if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+    if (this.connecting || (this.socket && this.socket.readyState === WebSocket.OPEN)) {
       return this.messages$;
     }
+    this.connecting = true;
+    this.getTicket().then(ticket => {
+      this.connecting = false;
+      this.open(ticket);
+    });
+    return this.messages$;
+  }
 
-    this.socket = new WebSocket(`${environment.wsUrl}/ws/calendar/`);
+  private open(ticket: string | null): void {
+    const params = new URLSearchParams();
+    if (ticket) {
+      params.set('ticket', ticket);
+    }
+    // Without a view the server resumes the connection from the query string
+    if (!this.view && this.lastSeq !== null) {
+      params.set('resume_from', String(this.lastSeq));
+    }
+    const query = params.toString() ? `?${params}` : '';
+    this.socket = new WebSocket(`${environment.wsUrl}/ws/calendar/${query}`);
 
     this.socket.onopen = () => {
       console.log('WebSocket connected');
+      if (this.view) {
+        this.sendSubscription(this.view, this.lastSeq);
+      }
+      this.startPing();
     };
 
     this.socket.onmessage = (event) => {
       try {
         const message = JSON.parse(event.data);
-        this.messageSubject.next(message);
+        // Events of a short window arrive together as one batch frame,
+        // events missed while disconnected as one replay frame
+        if (message.type === 'batch' || message.type === 'replay') {
+          message.data.forEach((item: WebSocketMessage) => this.emit(item));
+        } else {
+          this.emit(message);
+        }
       } catch (error) {
         console.error('Failed to parse WebSocket message:', error);
       }
@@ -37,6 +100,7 @@ export class WebSocketService {
 
     this.socket.onclose = () => {
       console.log('WebSocket disconnected');
+      this.stopPing();
       // Auto-reconnect after 3 seconds
       setTimeout(() => this.connect(), 3000);
     };
@@ -44,8 +108,31 @@ export class WebSocketService {
     this.socket.onerror = (error) => {
       console.error('WebSocket error:', error);
     };
+  }
 
-    return this.messages$;
+  // Without a ticket the connection is authenticated by the session cookie
+  private async getTicket(): Promise<string | null> {
+    if (this.ticket && this.ticketExpiresAt - Date.now() > TICKET_MARGIN_MS) {
+      return this.ticket;
+    }
+    try {
+      const response = await firstValueFrom(this.http.post<WebSocketTicket>(
+        `${environment.apiUrl}/api/auth/ws-ticket/`, {},
+        { headers: this.csrfService.getHeaders(), withCredentials: true }
+      ));
+      this.ticket = response.ticket;
+      this.ticketExpiresAt = Date.now() + response.expires_in * 1000;
+      // Keep a valid ticket at hand, so a reconnect storm after a server
+      // restart does not turn into a burst of ticket requests
+      if (this.ticketTimer) {
+        clearTimeout(this.ticketTimer);
+      }
+      this.ticketTimer = setTimeout(() => this.getTicket(), response.expires_in * 1000 - TICKET_MARGIN_MS);
+      return this.ticket;
+    } catch (error) {
+      this.ticket = null;
+      return null;
+    }
   }
 
   disconnect(): void {
@@ -59,4 +146,50 @@ export class WebSocketService {
       this.socket.send(JSON.stringify(message));
     }
   }
+
+  // Receive events only for the given date range and categories.
+  // Moves the existing connection instead of reconnecting.
+  subscribe(view: CalendarView): void {
+    this.view = view;
+    this.sendSubscription(view);
+  }
+
+  unsubscribeAll(): void {
+    this.view = null;
+    this.sendMessage({ type: 'unsubscribe' });
+  }
+
+  private sendSubscription(view: CalendarView, resumeFrom: number | null = null): void {
+    const message: WebSocketMessage = { type: 'subscribe', replace: true, ...view };
+    if (resumeFrom !== null) {
+      message['resume_from'] = resumeFrom;
+    }
+    this.sendMessage(message);
+  }
+
+  private emit(message: WebSocketMessage): void {
+    if (typeof message['seq'] === 'number') {
+      // Already received before the replay
+      if (this.lastSeq !== null && message['seq'] <= this.lastSeq) {
+        return;
+      }
+      this.lastSeq = message['seq'];
+    } else if (message.type === 'resync') {
+      // Missed events are gone, listeners reload the calendar
+      this.lastSeq = message.data.seq;
+    }
+    this.messageSubject.next(message);
+  }
+
+  private startPing(): void {
+    this.stopPing();
+    this.pingTimer = setInterval(() => this.sendMessage({ type: 'ping' }), PING_INTERVAL_MS);
+  }
+
+  private stopPing(): void {
+    if (this.pingTimer) {
+      clearInterval(this.pingTimer);
+      this.pingTimer = null;
+    }
+  }
 }